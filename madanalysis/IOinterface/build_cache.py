@@ -0,0 +1,157 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+import logging
+import hashlib
+import shutil
+import glob
+import os
+
+
+class BuildCache():
+
+    # Maximum number of executables kept in the cache
+    MaxEntries  = 10
+
+    # Name of the executable produced by the job Makefile
+    ProductName = 'MadAnalysis5job'
+
+    def __init__(self,main,jobdir):
+        self.main   = main
+        self.path   = os.path.normpath(jobdir)
+        self.cache  = os.path.normpath(main.archi_info.ma5dir+'/tools/BuildCache')
+        self.logger = logging.getLogger('MA5')
+        self.key    = ''
+
+
+    def GetSources(self):
+
+        # Generated sources and Makefile of the job
+        build   = self.path+'/Build'
+        sources = [build+'/Makefile']
+        for pattern in ['Main/*.cpp','Main/*.h',\
+                        'SampleAnalyzer/User/*/*.cpp','SampleAnalyzer/User/*/*.h']:
+            sources.extend(sorted(glob.glob(build+'/'+pattern)))
+
+        # Architecture (compiler, flags, ROOT, Delphes, ...)
+        sources.append(self.main.archi_info.ma5dir+'/tools/architecture.ma5')
+        return sources
+
+
+    def ComputeKey(self):
+        sha = hashlib.sha1()
+
+        # Content of the generated sources
+        for filename in self.GetSources():
+            if not os.path.isfile(filename):
+                continue
+            sha.update(os.path.relpath(filename,self.path)+'\n')
+            try:
+                input = open(filename,'rb')
+                sha.update(input.read())
+                input.close()
+            except:
+                self.logger.debug('impossible to read the file '+filename)
+                return ''
+
+        # SampleAnalyzer libraries the executable is linked against:
+        # rebuilding them invalidates the cache
+        libdir = self.main.archi_info.ma5dir+'/tools/SampleAnalyzer/Lib'
+        for filename in sorted(glob.glob(libdir+'/*')):
+            try:
+                info = os.stat(filename)
+            except:
+                continue
+            sha.update(os.path.basename(filename)+' '+str(info.st_size)+' '+\
+                       str(int(info.st_mtime))+'\n')
+
+        self.key = sha.hexdigest()
+        return self.key
+
+
+    def Restore(self):
+
+        # Key of the current sources
+        if self.ComputeKey()=='':
+            return False
+        entry = self.cache+'/'+self.key+'/'+BuildCache.ProductName
+        if not os.path.isfile(entry):
+            self.logger.debug('build cache miss: '+self.key)
+            return False
+
+        # Copying the executable into the job
+        try:
+            shutil.copy2(entry,self.path+'/Build/'+BuildCache.ProductName)
+            os.utime(self.cache+'/'+self.key,None)
+        except:
+            self.logger.debug('impossible to restore the executable from '+entry)
+            return False
+        self.logger.debug('build cache hit: '+self.key)
+        return True
+
+
+    def Store(self):
+
+        # Key of the current sources
+        if self.key=='' and self.ComputeKey()=='':
+            return False
+        product = self.path+'/Build/'+BuildCache.ProductName
+        if not os.path.isfile(product):
+            return False
+
+        # Copying the executable into the cache
+        # (a temporary name is used so that concurrent jobs never see a partial file)
+        entry = self.cache+'/'+self.key
+        try:
+            if not os.path.isdir(entry):
+                os.makedirs(entry)
+            tmpname = entry+'/'+BuildCache.ProductName+'.'+str(os.getpid())
+            shutil.copy2(product,tmpname)
+            os.rename(tmpname,entry+'/'+BuildCache.ProductName)
+        except:
+            self.logger.debug('impossible to store the executable in the build cache '+entry)
+            return False
+
+        # Keeping the cache size bounded
+        self.Clean()
+        return True
+
+
+    def Clean(self):
+
+        # Least recently used entries are removed first
+        try:
+            entries = [ os.path.join(self.cache,x) for x in os.listdir(self.cache) ]
+        except:
+            return
+        entries = [ x for x in entries if os.path.isdir(x) ]
+        if len(entries)<=BuildCache.MaxEntries:
+            return
+        entries.sort(key=lambda x: os.path.getmtime(x))
+        for entry in entries[:len(entries)-BuildCache.MaxEntries]:
+            try:
+                shutil.rmtree(entry)
+            except:
+                self.logger.debug('impossible to remove the build cache entry '+entry)
@@ -0,0 +1,238 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+import logging
+import hashlib
+import shutil
+import glob
+import os
+
+
+class DelphesCache():
+
+    # Name of the event file stored in each cache entry
+    EventFile = 'events.root'
+
+    def __init__(self,main,maxsize):
+        self.main    = main
+        self.cache   = os.path.normpath(main.archi_info.ma5dir+'/tools/DelphesCache')
+        self.maxsize = maxsize
+        self.logger  = logging.getLogger('MA5')
+        self.hashes  = {}
+        self.ReadHashes()
+
+
+    def IsEnabled(self):
+        return self.maxsize>0
+
+
+    def ReadHashes(self):
+        # Content hashes of the input files, indexed by (path,size,mtime):
+        # large event files are not read again if they did not change
+        filename = self.cache+'/hashes.ma5'
+        if not os.path.isfile(filename):
+            return
+        try:
+            input = open(filename,'r')
+            for line in input:
+                words = line.rstrip('\n').split('\t')
+                if len(words)==2:
+                    self.hashes[words[0]]=words[1]
+            input.close()
+        except:
+            self.logger.debug('impossible to read the file '+filename)
+
+
+    def WriteHashes(self):
+        filename = self.cache+'/hashes.ma5'
+        try:
+            if not os.path.isdir(self.cache):
+                os.makedirs(self.cache)
+            output = open(filename,'w')
+            for item in sorted(self.hashes.keys()):
+                output.write(item+'\t'+self.hashes[item]+'\n')
+            output.close()
+        except:
+            self.logger.debug('impossible to write the file '+filename)
+
+
+    @staticmethod
+    def HashIndex(filename,info):
+        return filename+' '+str(info.st_size)+' '+str(int(info.st_mtime))
+
+
+    def PruneHashes(self):
+        # Hashes of files which were removed or modified are useless
+        pruned = False
+        for index in list(self.hashes.keys()):
+            filename = index.rsplit(' ',2)[0]
+            try:
+                info = os.stat(filename)
+            except:
+                info = None
+            if info is None or DelphesCache.HashIndex(filename,info)!=index:
+                del self.hashes[index]
+                pruned = True
+        return pruned
+
+
+    def HashFile(self,filename):
+        try:
+            info = os.stat(filename)
+        except:
+            return ''
+        index = DelphesCache.HashIndex(os.path.abspath(filename),info)
+        if index in self.hashes:
+            return self.hashes[index]
+        sha = hashlib.sha1()
+        try:
+            input = open(filename,'rb')
+            while True:
+                chunk = input.read(1048576)
+                if not chunk:
+                    break
+                sha.update(chunk)
+            input.close()
+        except:
+            self.logger.debug('impossible to read the file '+filename)
+            return ''
+        self.hashes[index] = sha.hexdigest()
+        self.WriteHashes()
+        return self.hashes[index]
+
+
+    def ComputeKey(self,dataset,card,package):
+        sha = hashlib.sha1()
+
+        # Delphes flavour and installed library
+        sha.update('package '+package+'\n')
+        if package=='delphesMA5tune':
+            library = self.main.archi_info.delphesMA5tune_lib
+        else:
+            library = self.main.archi_info.delphes_lib
+        try:
+            info = os.stat(library)
+            sha.update('library '+str(info.st_size)+' '+str(int(info.st_mtime))+'\n')
+        except:
+            sha.update('library '+str(library)+'\n')
+
+        # Detector card
+        cardhash = self.HashFile(card)
+        if cardhash=='':
+            return ''
+        sha.update('card '+cardhash+'\n')
+
+        # Input event files
+        for item in dataset.filenames:
+            filehash = self.HashFile(item)
+            if filehash=='':
+                return ''
+            sha.update('file '+filehash+'\n')
+        return sha.hexdigest()
+
+
+    @staticmethod
+    def LinkOrCopy(source,destination):
+        # Hard links avoid copying large files (same file system only)
+        if os.path.isfile(destination):
+            os.remove(destination)
+        try:
+            os.link(source,destination)
+        except:
+            shutil.copy2(source,destination)
+
+
+    def Restore(self,dataset,card,package,eventfile):
+        if not self.IsEnabled():
+            return False
+        key = self.ComputeKey(dataset,card,package)
+        if key=='':
+            return False
+        entry = self.cache+'/'+key
+        if not os.path.isfile(entry+'/'+DelphesCache.EventFile):
+            return False
+        try:
+            DelphesCache.LinkOrCopy(entry+'/'+DelphesCache.EventFile,eventfile)
+            os.utime(entry,None)
+        except:
+            self.logger.debug('impossible to restore the event file from '+entry)
+            return False
+        return True
+
+
+    def Store(self,dataset,card,package,eventfile):
+        if not self.IsEnabled():
+            return False
+        key = self.ComputeKey(dataset,card,package)
+        if key=='':
+            return False
+
+        # A temporary name is used so that a partial file is never reused
+        entry = self.cache+'/'+key
+        try:
+            if not os.path.isdir(entry):
+                os.makedirs(entry)
+            tmpname = entry+'/'+DelphesCache.EventFile+'.'+str(os.getpid())
+            DelphesCache.LinkOrCopy(eventfile,tmpname)
+            os.rename(tmpname,entry+'/'+DelphesCache.EventFile)
+        except:
+            self.logger.debug('impossible to store the event file in the Delphes cache '+entry)
+            return False
+
+        # Keeping the cache size bounded
+        self.Clean()
+        return True
+
+
+    def Clean(self):
+
+        # Size of each entry
+        entries = []
+        total   = 0
+        for entry in glob.glob(self.cache+'/*/'+DelphesCache.EventFile):
+            try:
+                size = os.path.getsize(entry)
+                date = os.path.getmtime(os.path.dirname(entry))
+            except:
+                continue
+            entries.append([date,size,os.path.dirname(entry)])
+            total += size
+
+        # Least recently used entries are removed first
+        entries.sort()
+        evicted = False
+        while total>self.maxsize and len(entries)!=0:
+            date, size, entry = entries.pop(0)
+            try:
+                shutil.rmtree(entry)
+                total -= size
+                evicted = True
+            except:
+                self.logger.debug('impossible to remove the Delphes cache entry '+entry)
+                break
+
+        # The index of the file hashes is rewritten without its stale lines
+        if self.PruneHashes() or evicted:
+            self.WriteHashes()
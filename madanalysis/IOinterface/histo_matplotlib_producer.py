@@ -32,11 +32,12 @@ import commands
 
 class HistoMatplotlibProducer():
 
-    def __init__(self,histo_path,filenames):
+    def __init__(self,histo_path,filenames,ncores=1):
         self.filenames  = []
         for filename in filenames:
             self.filenames.append(filename+'.py')
         self.histo_path = histo_path
+        self.ncores     = ncores
 
 
     def Execute(self):
@@ -49,24 +50,58 @@ class HistoMatplotlibProducer():
 
     def WriteMainFile(self):
         output = open(self.histo_path+'/all.py','w')
-        output.write('# Import all histograms\n')
-        for item in self.filenames:
-            output.write('import '+item.split('/')[-1][:-3]+'\n')
+        output.write('# Library import\n')
+        output.write('import sys\n')
+        output.write('import traceback\n')
+        output.write('import matplotlib\n')
+        output.write("matplotlib.use('Agg')\n")
         output.write('\n')
-        output.write('# Producing each histograms\n')
-        output.write('print "BEGIN-STAMP"\n')
+        output.write('# Histograms to produce\n')
+        output.write('histos = [\n')
         for item in self.filenames:
-            myname=item.split('/')[-1][:-3]
-            output.write('print "- Producing histo '+myname+'..."\n')
-            output.write(myname+'.'+myname+'()\n')
-        output.write('print "END-STAMP"\n')
+            output.write("  '"+item.split('/')[-1][:-3]+"',\n")
+        output.write(']\n')
+        output.write('\n')
+        output.write('# Producing one histogram (the errors are reported plot by plot)\n')
+        output.write('def produce(name):\n')
+        output.write('    try:\n')
+        output.write('        module = __import__(name)\n')
+        output.write('        getattr(module,name)()\n')
+        output.write('        import matplotlib.pyplot as plt\n')
+        output.write("        plt.close('all')\n")
+        output.write('    except:\n')
+        output.write('        return name, traceback.format_exc()\n')
+        output.write("    return name, ''\n")
+        output.write('\n')
+        output.write('# Producing all the histograms with a pool of processes\n')
+        output.write("if __name__ == '__main__':\n")
+        output.write('    ncores = 1\n')
+        output.write('    if len(sys.argv)>1:\n')
+        output.write('        ncores = int(sys.argv[1])\n')
+        output.write('    pool = None\n')
+        output.write('    if ncores>1 and len(histos)>1:\n')
+        output.write('        import multiprocessing\n')
+        output.write('        pool    = multiprocessing.Pool(min(ncores,len(histos)))\n')
+        output.write('        results = pool.imap_unordered(produce,histos)\n')
+        output.write('    else:\n')
+        output.write('        results = map(produce,histos)\n')
+        output.write('    for name, error in results:\n')
+        output.write("        if error=='':\n")
+        output.write("            print('PLOT-OK '+name)\n")
+        output.write('        else:\n')
+        output.write("            print('PLOT-FAILED '+name)\n")
+        output.write('            print(error)\n')
+        output.write('        sys.stdout.flush()\n')
+        output.write('    if pool!=None:\n')
+        output.write('        pool.close()\n')
+        output.write('        pool.join()\n')
         output.close()
         return True
 
 
     def LaunchInteractiveMatplotlib(self):
         # Commands
-        theCommands=[sys.executable,'all.py']
+        theCommands=[sys.executable,'all.py',str(self.ncores)]
 
         # Log file name
         logname=os.path.normpath(self.histo_path+'/matplotlib.log')
@@ -77,10 +112,28 @@ class HistoMatplotlibProducer():
                                              logname,\
                                              self.histo_path,\
                                              silent=False)
-        # return result
         if not ok:
             logging.getLogger('MA5').error('impossible to execute MatPlotLib. For more details, see the log file:')
             logging.getLogger('MA5').error(logname)
-        return ok
-
+            return ok
 
+        # Status of each plot
+        produced = []
+        failed   = []
+        if out!=None:
+            for line in out.split('\n'):
+                if line.startswith('PLOT-OK '):
+                    produced.append(line.split()[1])
+                elif line.startswith('PLOT-FAILED '):
+                    failed.append(line.split()[1])
+        for item in self.filenames:
+            name = item.split('/')[-1][:-3]
+            if name not in produced and name not in failed:
+                failed.append(name)
+        for name in failed:
+            logging.getLogger('MA5').error('the plot '+name+' has not been produced by MatPlotLib.')
+        if len(failed)!=0:
+            logging.getLogger('MA5').error('For more details, see the log file:')
+            logging.getLogger('MA5').error(logname)
+            return False
+        return True
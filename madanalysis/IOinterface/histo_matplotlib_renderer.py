@@ -0,0 +1,216 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+import itertools
+import logging
+import os
+import traceback
+
+
+## renderer of each process, keyed by the histo folder (the figures
+## are kept from one plot to the next one)
+Renderers = {}
+
+def RenderPlot(args):
+    ## entry point of the worker processes: [histo folder, plot description]
+    histo_path, plot = args
+    if histo_path not in Renderers:
+        Renderers[histo_path] = HistoMatplotlibRenderer(histo_path)
+    try:
+        Renderers[histo_path].Render(plot)
+    except:
+        return plot['name'], traceback.format_exc()
+    return plot['name'], ''
+
+
+class HistoMatplotlibRenderer():
+
+    def __init__(self,histo_path):
+        self.histo_path = histo_path
+        self.figures    = {}
+        self.modules    = None
+
+
+    def Initialize(self):
+        if self.modules!=None:
+            return True
+        try:
+            import numpy
+            import matplotlib
+            import matplotlib.gridspec
+            from matplotlib.figure               import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+        except:
+            logging.getLogger('MA5').error('impossible to load the MatPlotLib and NumPy modules')
+            return False
+        self.modules = { 'numpy'           : numpy,           \
+                         'matplotlib'      : matplotlib,      \
+                         'gridspec'        : matplotlib.gridspec, \
+                         'Figure'          : Figure,          \
+                         'FigureCanvasAgg' : FigureCanvasAgg }
+        return True
+
+
+    def Execute(self,plots,ncores=1):
+        if not self.Initialize():
+            return False
+        if len(plots)==0:
+            return True
+
+        # Rendering the plots (with a pool of processes if several cores)
+        jobs = [ [self.histo_path,plot] for plot in plots ]
+        if ncores>1 and len(jobs)>1:
+            import multiprocessing
+            pool    = multiprocessing.Pool(min(ncores,len(jobs)))
+            results = pool.imap_unordered(RenderPlot,jobs)
+        else:
+            pool    = None
+            results = itertools.imap(RenderPlot,jobs)
+
+        # Status of each plot
+        failed = False
+        try:
+            for name, error in results:
+                if error=='':
+                    continue
+                failed = True
+                logging.getLogger('MA5').error('the plot '+name+' has not been produced by MatPlotLib:')
+                for line in error.rstrip().split('\n'):
+                    logging.getLogger('MA5').debug(line)
+                logging.getLogger('MA5').error(error.rstrip().split('\n')[-1])
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        return not failed
+
+
+    def GetFigure(self,plot):
+        # One Agg figure per canvas size, cleared before each plot
+        key = (plot['width'],plot['height'],plot['dpi'])
+        if key not in self.figures:
+            figure = self.modules['Figure'](figsize=(plot['width']/plot['dpi'],\
+                                                     plot['height']/plot['dpi']),\
+                                            dpi=plot['dpi'])
+            self.modules['FigureCanvasAgg'](figure)
+            self.figures[key] = figure
+        figure = self.figures[key]
+        figure.clf()
+        return figure
+
+
+    def Render(self,plot):
+        if not self.Initialize():
+            raise ImportError('MatPlotLib and NumPy are required')
+        numpy      = self.modules['numpy']
+        matplotlib = self.modules['matplotlib']
+
+        with matplotlib.rc_context({'text.usetex':False}):
+
+            # Canvas
+            figure = self.GetFigure(plot)
+            if not plot['legend']:
+                frame = self.modules['gridspec'].GridSpec(1,1)
+            else:
+                frame = self.modules['gridspec'].GridSpec(1,1,right=0.7)
+            pad = figure.add_subplot(frame[0])
+
+            # Binning and data
+            if plot['binning']!=None:
+                xBinning = plot['binning']
+            else:
+                xBinning = numpy.linspace(plot['xmin'],plot['xmax'],plot['nbins']+1,endpoint=True)
+            xData   = numpy.array(plot['xdata'])
+            weights = [ numpy.array(x) for x in plot['weights'] ]
+
+            # Stack
+            for serie in plot['series']:
+                ind = serie['index']
+                if plot['stack']:
+                    myweights = sum(weights[:ind+1])
+                else:
+                    myweights = weights[ind]
+                options = {}
+                if plot['ntot']!=0:
+                    if serie['backcolor']==None:
+                        options['histtype'] = 'step'
+                    else:
+                        options['histtype'] = 'stepfilled'
+                pad.hist(x=xData, bins=xBinning, weights=myweights, label=serie['title'],
+                         rwidth=1., color=serie['backcolor'], edgecolor=serie['linecolor'],
+                         linewidth=serie['linewidth'], linestyle=serie['linestyle'],
+                         bottom=None, cumulative=False, align='mid', orientation='vertical',
+                         **options)
+
+            # Axis
+            pad.set_xlabel(plot['xtitle'],fontsize=16,color='black')
+            pad.set_ylabel(plot['ytitle'],fontsize=16,color='black')
+
+            # Boundary of y-axis
+            if plot['stack']:
+                ymax = sum(weights).max()*1.1
+                ylow = sum(weights)
+            else:
+                ymax = numpy.array([ x.max() for x in weights ]).max()*1.1
+                ylow = numpy.array([ x.min() for x in weights ])
+            ymin = 0
+            if plot['logy']:
+                nonzero = [ x for x in ylow if x ]
+                ymin = 1e-2
+                if len(nonzero)!=0:
+                    ymin = min(1e-2, min(nonzero)/100.)
+            pad.set_ylim(ymin,ymax)
+
+            # Log/Linear scale for the axes
+            if plot['logx']:
+                self.SetLogScale(pad.set_xscale,'nonposx')
+            else:
+                pad.set_xscale('linear')
+            if plot['logy']:
+                self.SetLogScale(pad.set_yscale,'nonposy')
+            else:
+                pad.set_yscale('linear')
+
+            # Labels for x-Axis
+            if plot['xlabels']!=None:
+                pad.set_xticks(xData)
+                pad.set_xticklabels(plot['xlabels'],rotation='vertical')
+
+            # Legend
+            if plot['legend']:
+                pad.legend(bbox_to_anchor=(1.05,1), loc=2, borderaxespad=0.)
+
+            # Saving the image in all the formats from the same drawing
+            for outputname in plot['outputs']:
+                figure.savefig(os.path.normpath(os.path.join(self.histo_path,outputname)))
+
+
+    @staticmethod
+    def SetLogScale(setter,keyword):
+        # The keyword has been renamed in recent versions of MatPlotLib
+        try:
+            setter('log',**{keyword:'clip'})
+        except TypeError:
+            setter('log',nonpositive='clip')
@@ -31,19 +31,69 @@ import commands
 
 class HistoRootProducer():
 
-    def __init__(self,histo_path,filenames):
+    def __init__(self,histo_path,filenames,plotter=''):
+        self.histo_path = histo_path
+
+        # Plots described by a data file are drawn by the prebuilt plotter,
+        # the other ones by compiling their macro
         self.filenames  = []
+        self.datafiles  = []
         for filename in filenames:
-            self.filenames.append((filename)+'.C')
-        self.histo_path = histo_path
+            if plotter!='' and os.path.isfile(plotter) and os.path.isfile(filename+'.dat'):
+                self.datafiles.append(filename+'.dat')
+            else:
+                self.filenames.append((filename)+'.C')
+        self.plotter = plotter
 
 
     def Execute(self):
+        ok = True
+        if len(self.datafiles)!=0:
+            if not self.LaunchPlotter():
+                ok = False
+        if len(self.filenames)==0:
+            return ok
         if not self.WriteMainFile():
             return False
 #       if not self.LaunchInteractiveRoot():
         if not self.LaunchCompileRoot():
             return False
+        return ok
+
+
+    def LaunchPlotter(self):
+        # Commands
+        theCommands=[self.plotter]
+        theCommands.extend([ x.split('/')[-1] for x in self.datafiles ])
+
+        # Log file name
+        logname=os.path.normpath(self.histo_path+'/plotter_root.log')
+
+        # Execute
+        logging.getLogger('MA5').debug('shell command: '+' '.join(theCommands))
+        ok, out= ShellCommand.ExecuteWithLog(theCommands,\
+                                             logname,\
+                                             self.histo_path,\
+                                             silent=False)
+
+        # Status of each plot
+        produced = []
+        if out!=None:
+            for line in out.split('\n'):
+                if line.startswith('PLOT-OK '):
+                    produced.append(line.split()[1])
+        failed = False
+        for item in self.datafiles:
+            name = item.split('/')[-1][:-4]
+            if name not in produced:
+                logging.getLogger('MA5').error('the plot '+name+' has not been produced by ROOT.')
+                failed = True
+
+        # return result
+        if failed or not ok:
+            logging.getLogger('MA5').error('wrong behaviour of the ROOT plotter. For more details, see the log file:')
+            logging.getLogger('MA5').error(logname)
+            return False
         return True
         
 
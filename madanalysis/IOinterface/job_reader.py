@@ -25,7 +25,7 @@
 from madanalysis.selection.instance_name      import InstanceName
 from madanalysis.dataset.sample_info          import SampleInfo
 from madanalysis.layout.cut_info              import CutInfo
-from madanalysis.IOinterface.saf_block_status import SafBlockStatus
+from madanalysis.IOinterface.saf_reader       import SafReader
 from madanalysis.layout.histogram             import Histogram
 from madanalysis.layout.histogram_logx        import HistogramLogX
 from madanalysis.layout.histogram_frequency   import HistogramFrequency
@@ -34,10 +34,53 @@ import shutil
 import os
 import commands
 import copy
+import hashlib
+import itertools
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+class ExtractionResult():
+
+    # Container filled in a worker process, in place of the dataset, the
+    # cutflow and the plots (only what Extract sets)
+    def __init__(self,name):
+        self.name            = name
+        self.measured_global = None
+        self.measured_detail = []
+        self.initial         = CutInfo()
+        self.cuts            = []
+        self.histos          = []
+
+
+def ExtractDataset(args):
+    ## entry point of the worker processes: [jobdir, dataset name, merging?]
+    path, name, domerging = args
+    jobber = JobReader(path)
+
+    ## results of a previous extraction of the same SAF files
+    key    = jobber.GetExtractionKey(name,domerging)
+    cached = jobber.ReadExtractionCache(name,key)
+    if cached!=None:
+        return cached
+
+    selection = ExtractionResult(name)
+    jobber.Extract(selection,selection,0,selection,False)
+    merging = None
+    if domerging:
+        merging = ExtractionResult(name)
+        jobber.Extract(merging,0,merging,0,True)
+    jobber.WriteExtractionCache(name,key,[selection,merging])
+    return selection, merging
 
 
 class JobReader():
 
+    # Version of the extracted objects stored in the extraction cache
+    ExtractionVersion = 3
+
     def __init__(self,jobdir):
         self.path       = jobdir
         self.safdir    = os.path.normpath(self.path+"/Output")
@@ -220,6 +263,116 @@ class JobReader():
         return [a,b,c]
 
 
+    def ExtractCounter(self,block,counter,filename):
+
+        # nentries, sum of weights and sum of squared weights (the name
+        # of the cut is skipped, even if it has two words)
+        attributes = ['nentries','sumw','sumw2']
+        lines = [ x for x in block.Lines(2) if x[1][0]!='"' ]
+        for i in range(len(lines)):
+            if i>=len(attributes):
+                logging.getLogger('MA5').warning('Extra line is found: '+lines[i][1])
+                continue
+            results = self.ExtractCutLine(lines[i][2],lines[i][0],filename)
+            setattr(counter,attributes[i]+'_pos',results[0])
+            setattr(counter,attributes[i]+'_neg',results[1])
+
+
+    def ExtractHistogram(self,block,filename):
+
+        # Histogram type
+        if block.tag=='histo':
+            histo = Histogram()
+        elif block.tag=='histologx':
+            histo = HistogramLogX()
+        else:
+            histo = HistogramFrequency()
+        frequency = (block.tag=='histofrequency')
+
+        # Description: name and binning
+        description = block.Find('description')
+        if description!=None:
+            lines = description.Lines()
+            for i in range(len(lines)):
+                numline, line, words = lines[i]
+                if i==0:
+                    if len(line)>1 and line[0]=='"' and line[-1]=='"':
+                        histo.name=line[1:-1]
+                    else:
+                        logging.getLogger('MA5').error('invalid name for histogram @ line=' + str(numline) +' : ')
+                        logging.getLogger('MA5').error(str(line))
+                elif i==1 and not frequency and len(words)==3:
+                    results = self.ExtractDescription(words,numline,filename)
+                    histo.nbins=results[0]
+                    histo.xmin=results[1]
+                    histo.xmax=results[2]
+                else:
+                    logging.getLogger('MA5').warning('Extra line is found: '+line)
+
+        # Statistics
+        statistics = block.Find('statistics')
+        if statistics!=None:
+            attributes = [ ['nevents',True], ['sumwentries',False], ['nentries',True], ['sumw',False] ]
+            if not frequency:
+                attributes += [ ['sumw2',False], ['sumwx',False], ['sumw2x',False] ]
+            table = SafReader.Table(statistics,2)
+            if table is not None and len(table)==len(attributes):
+                for i in range(len(attributes)):
+                    if attributes[i][1]:
+                        results = [ int(table[i][0]), int(table[i][1]) ]
+                        if results[0]!=table[i][0] or results[1]!=table[i][1] or min(results)<0:
+                            break
+                    else:
+                        results = [ float(table[i][0]), float(table[i][1]) ]
+                    setattr(histo.positive,attributes[i][0],results[0])
+                    setattr(histo.negative,attributes[i][0],results[1])
+                else:
+                    table = []
+            # line by line, with the diagnostics, if the block is unusual
+            lines = []
+            if table is None or len(table)!=0:
+                lines = statistics.Lines(2)
+            for i in range(len(lines)):
+                numline, line, words = lines[i]
+                if i>=len(attributes):
+                    logging.getLogger('MA5').warning('Extra line is found: '+line)
+                    continue
+                if attributes[i][1]:
+                    results = self.ExtractStatisticsInt(words,numline,filename)
+                else:
+                    results = self.ExtractStatisticsFloat(words,numline,filename)
+                setattr(histo.positive,attributes[i][0],results[0])
+                setattr(histo.negative,attributes[i][0],results[1])
+
+        # Data: the whole block is converted at once
+        data = block.Find('data')
+        if data==None:
+            return histo
+        if frequency:
+            table = SafReader.Table(data,3)
+            if table is None:
+                table = [ self.ExtractDataFreq(x[2],x[0],filename) for x in data.Lines(3) ]
+            histo.labels = [ int(row[0]) for row in table ]
+            histo.positive.array = SafReader.Column(table,1)
+            histo.negative.array = SafReader.Column(table,2)
+            return histo
+        table = SafReader.Table(data,2)
+        if table is None:
+            table = [ self.ExtractStatisticsFloat(x[2],x[0],filename) for x in data.Lines(2) ]
+        if len(table)>=1:
+            histo.positive.underflow = float(table[0][0])
+            histo.negative.underflow = float(table[0][1])
+        if len(table)>=histo.nbins+2:
+            histo.positive.overflow  = float(table[histo.nbins+1][0])
+            histo.negative.overflow  = float(table[histo.nbins+1][1])
+        if len(table)>histo.nbins+2:
+            for line in data.Lines(2)[histo.nbins+2:]:
+                logging.getLogger('MA5').warning('Extra line is found: '+line[1])
+        histo.positive.array = SafReader.Column(table[1:histo.nbins+1],0)
+        histo.negative.array = SafReader.Column(table[1:histo.nbins+1],1)
+        return histo
+
+
     # Extracting data from the SAF file
     # sample & file info -> dataset
     # cut counters       -> initial & cut
@@ -234,361 +387,144 @@ class JobReader():
         else:
             filename = self.safdir+"/"+name+"/MergingPlots.saf"
 
-        # Opening the file
-        try:
-            file = open(filename,'r')
-        except:
-            logging.getLogger('MA5').error("File called '"+filename+"' is not found")
+        # Reading the file: the blocks are dispatched according to their type
+        reader = SafReader(filename)
+        if not reader.Read():
             return
+        root = reader.root
 
-        # Initializing tags
-        beginTag       = SafBlockStatus()
-        endTag         = SafBlockStatus()
-        initialTag     = SafBlockStatus()
-        cutTag         = SafBlockStatus()
-        globalTag      = SafBlockStatus()
-        detailTag      = SafBlockStatus()
-        selectionTag   = SafBlockStatus()
-        mergingTag     = SafBlockStatus()
-        histoTag       = SafBlockStatus()
-        histoLogXTag   = SafBlockStatus()
-        histoFreqTag   = SafBlockStatus()
-        descriptionTag = SafBlockStatus()
-        statisticsTag  = SafBlockStatus()
-        dataTag        = SafBlockStatus()
-
-        # Initializing temporary containers
-        cutinfo       = CutInfo()
-        histoinfo     = Histogram() 
-        histologxinfo = HistogramLogX() 
-        histofreqinfo = HistogramFrequency()
-        data_positive = []
-        data_negative = []
-        labels        = []
-
-        # Loop over the lines
-        numline=0
-        for line in file:
-
-            # Incrementing line counter
-            numline+=1
-            
-            # Removing comments
-            index=line.find('#')
-            if index!=-1:
-                line=line[:index]
-
-            # Treating line
-            line=line.lstrip()
-            line=line.rstrip()
-            words=line.split()
-            if len(words)==0:
-                continue
-
-            # Looking for tag 'SampleGlobalInfo'
-            if len(words)==1 and words[0][0]=='<' and words[0][-1]=='>':
-                if words[0].lower()=='<safheader>':
-                    beginTag.activate()
-                elif words[0].lower()=='</safheader>':
-                    beginTag.desactivate()
-                if words[0].lower()=='<saffooter>':
-                    endTag.activate()
-                elif words[0].lower()=='</saffooter>':
-                    endTag.desactivate()
-                if words[0].lower()=='<sampleglobalinfo>':
-                    globalTag.activate()
-                elif words[0].lower()=='</sampleglobalinfo>':
-                    globalTag.desactivate()
-                elif words[0].lower()=='<sampledetailedinfo>':
-                    detailTag.activate()
-                elif words[0].lower()=='</sampledetailedinfo>':
-                    detailTag.desactivate()
-                elif words[0].lower()=='<initialcounter>':
-                    initialTag.activate()
-                elif words[0].lower()=='</initialcounter>':
-                    initialTag.desactivate()
-                elif words[0].lower()=='<selection>':
-                    selectionTag.activate()
-                elif words[0].lower()=='</selection>':
-                    selectionTag.desactivate()
-                elif words[0].lower()=='<mergingplots>':
-                    mergingTag.activate()
-                elif words[0].lower()=='</mergingplots>':
-                    mergingTag.desactivate()
-                elif words[0].lower()=='<counter>':
-                    cutTag.activate()
-                elif words[0].lower()=='</counter>':
-                    cutTag.desactivate()
-                    cut.cuts.append(copy.copy(cutinfo))
-                    cutinfo.Reset()
-                elif words[0].lower()=='<description>':
-                    descriptionTag.activate()
-                elif words[0].lower()=='</description>':
-                    descriptionTag.desactivate()
-                elif words[0].lower()=='<statistics>':
-                    statisticsTag.activate()
-                elif words[0].lower()=='</statistics>':
-                    statisticsTag.desactivate()
-                elif words[0].lower()=='<data>':
-                    dataTag.activate()
-                elif words[0].lower()=='</data>':
-                    dataTag.desactivate()
-                elif words[0].lower()=='<histo>':
-                    histoTag.activate()
-                elif words[0].lower()=='</histo>':
-                    histoTag.desactivate()
-                    if selectionTag.activated and not domerging:
-                        plot.histos.append(copy.copy(histoinfo))
-                        plot.histos[-1].positive.array = data_positive[:]
-                        plot.histos[-1].negative.array = data_negative[:]
-                    elif mergingTag.activated and domerging:
-                        merging.histos.append(copy.copy(histoinfo))
-                        merging.histos[-1].positive.array = data_positive[:]
-                        merging.histos[-1].negative.array = data_negative[:]
-                    histoinfo.Reset()
-                    data_positive = []
-                    data_negative = []
-                elif words[0].lower()=='<histofrequency>':
-                    histoFreqTag.activate()
-                elif words[0].lower()=='</histofrequency>':
-                    histoFreqTag.desactivate()
-                    if selectionTag.activated and not domerging:
-                        plot.histos.append(copy.copy(histofreqinfo))
-                        plot.histos[-1].labels = labels[:]
-                        plot.histos[-1].positive.array = data_positive[:]
-                        plot.histos[-1].negative.array = data_negative[:]
-                    histofreqinfo.Reset()
-                    data_positive = []
-                    data_negative = []
-                    labels        = []
-                elif words[0].lower()=='<histologx>':
-                    histoLogXTag.activate()
-                elif words[0].lower()=='</histologx>':
-                    histoLogXTag.desactivate()
-                    if selectionTag.activated and not domerging:
-                        plot.histos.append(copy.copy(histologxinfo))
-                        plot.histos[-1].positive.array = data_positive[:]
-                        plot.histos[-1].negative.array = data_negative[:]
-                    histologxinfo.Reset()
-                    data_positive = []
-                    data_negative = []
-
-            # Looking for summary sample info
-            elif globalTag.activated and not domerging and len(words)==5:
-                dataset.measured_global = self.ExtractSampleInfo(words,numline,filename)
-
-            # Looking for detail sample info (one line for each file)
-            elif detailTag.activated and not domerging and len(words)==5:
-                dataset.measured_detail.append(self.ExtractSampleInfo(words,numline,filename))
-
-            # Looking for initial counter
-            elif initialTag.activated and \
-                 selectionTag.activated and len(words)==2:
-                results = self.ExtractCutLine(words,numline,filename)
-                if initialTag.Nlines==0:
-                    cut.initial.nentries_pos = results[0]
-                    cut.initial.nentries_neg = results[1]
-                elif initialTag.Nlines==1:
-                    cut.initial.sumw_pos = results[0]
-                    cut.initial.sumw_neg = results[1]
-                elif initialTag.Nlines==2:
-                    cut.initial.sumw2_pos = results[0]
-                    cut.initial.sumw2_neg = results[1]
-                else:
-                    logging.getLogger('MA5').warning('Extra line is found: '+line)
-                initialTag.newline()
-
-            # Looking for cut counter
-            elif cutTag.activated and \
-                 selectionTag.activated and len(words)==2:
-                results = self.ExtractCutLine(words,numline,filename)
-                if cutTag.Nlines==0:
-                    cutinfo.nentries_pos = results[0]
-                    cutinfo.nentries_neg = results[1]
-                elif cutTag.Nlines==1:
-                    cutinfo.sumw_pos = results[0]
-                    cutinfo.sumw_neg = results[1]
-                elif cutTag.Nlines==2:
-                    cutinfo.sumw2_pos = results[0]
-                    cutinfo.sumw2_neg = results[1]
-                else:
-                    logging.getLogger('MA5').warning('Extra line is found: '+line)
-                cutTag.newline()    
-
-            # Looking from histogram description
-            elif descriptionTag.activated and \
-                 (selectionTag.activated or mergingTag.activated):
-                if descriptionTag.Nlines==0:
-                    if len(line)>1 and line[0]=='"' and line[-1]=='"':
-                        myname=line[1:-1]
-                        if histoTag.activated:
-                            histoinfo.name=myname
-                        elif histoLogXTag.activated:
-                            histologxinfo.name=myname
-                        elif histoFreqTag.activated:
-                            histofreqinfo.name=myname
-                    else:
-                        logging.getLogger('MA5').error('invalid name for histogram @ line=' + str(numline) +' : ')
-                        logging.getLogger('MA5').error(str(line))
-                elif descriptionTag.Nlines==1 and not histoFreqTag.activated and \
-                     len(words)==3:
-                    results = self.ExtractDescription(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.nbins=results[0]
-                        histoinfo.xmin=results[1]
-                        histoinfo.xmax=results[2]
-                    elif histoLogXTag.activated:
-                        histologxinfo.nbins=results[0]
-                        histologxinfo.xmin=results[1]
-                        histologxinfo.xmax=results[2]
-                else:
-                    logging.getLogger('MA5').warning('Extra line is found: '+line)
-                descriptionTag.newline()    
-
-            # Looking from histogram statistics
-            elif statisticsTag.activated and \
-                 (selectionTag.activated or mergingTag.activated) and \
-                 len(words)==2:
-                if statisticsTag.Nlines==0:
-                    results = self.ExtractStatisticsInt(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.nevents=results[0]
-                        histoinfo.negative.nevents=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.nevents=results[0]
-                        histologxinfo.negative.nevents=results[1]
-                    elif histoFreqTag.activated:
-                        histofreqinfo.positive.nevents=results[0]
-                        histofreqinfo.negative.nevents=results[1]
-
-                elif statisticsTag.Nlines==1:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumwentries=results[0]
-                        histoinfo.negative.sumwentries=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumwentries=results[0]
-                        histologxinfo.negative.sumwentries=results[1]
-                    elif histoFreqTag.activated:
-                        histofreqinfo.positive.sumwentries=results[0]
-                        histofreqinfo.negative.sumwentries=results[1]
-
-                elif statisticsTag.Nlines==2:
-                    results = self.ExtractStatisticsInt(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.nentries=results[0]
-                        histoinfo.negative.nentries=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.nentries=results[0]
-                        histologxinfo.negative.nentries=results[1]
-                    elif histoFreqTag.activated:
-                        histofreqinfo.positive.nentries=results[0]
-                        histofreqinfo.negative.nentries=results[1]
-
-                elif statisticsTag.Nlines==3:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumw=results[0]
-                        histoinfo.negative.sumw=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumw=results[0]
-                        histologxinfo.negative.sumw=results[1]
-                    elif histoFreqTag.activated:
-                        histofreqinfo.positive.sumw=results[0]
-                        histofreqinfo.negative.sumw=results[1]
-
-                elif statisticsTag.Nlines==4 and not histoFreqTag.activated:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumw2=results[0]
-                        histoinfo.negative.sumw2=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumw2=results[0]
-                        histologxinfo.negative.sumw2=results[1]
-
-                elif statisticsTag.Nlines==5 and not histoFreqTag.activated:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumwx=results[0]
-                        histoinfo.negative.sumwx=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumwx=results[0]
-                        histologxinfo.negative.sumwx=results[1]
-
-                elif statisticsTag.Nlines==6 and not histoFreqTag.activated:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumw2x=results[0]
-                        histoinfo.negative.sumw2x=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumw2x=results[0]
-                        histologxinfo.negative.sumw2x=results[1]
+        # Sample info (the last line of the block) and detailed sample
+        # info (one line for each file)
+        globalinfo = root.Find('sampleglobalinfo')
+        detailinfo = root.Find('sampledetailedinfo')
+        if not domerging:
+            if globalinfo!=None:
+                for line in globalinfo.Lines(5):
+                    dataset.measured_global = self.ExtractSampleInfo(line[2],line[0],filename)
+            if detailinfo!=None:
+                for line in detailinfo.Lines(5):
+                    dataset.measured_detail.append(self.ExtractSampleInfo(line[2],line[0],filename))
+
+        # Cut counters and selection plots
+        for selection in root.FindAll('selection'):
+            for block in selection.children:
+                if block.tag=='initialcounter':
+                    self.ExtractCounter(block,cut.initial,filename)
+                elif block.tag=='counter':
+                    cutinfo = CutInfo()
+                    self.ExtractCounter(block,cutinfo,filename)
+                    cut.cuts.append(cutinfo)
+                elif block.tag in ['histo','histologx','histofrequency'] and not domerging:
+                    plot.histos.append(self.ExtractHistogram(block,filename))
+
+        # Merging plots
+        if domerging:
+            for mergingplots in root.FindAll('mergingplots'):
+                for block in mergingplots.FindAll('histo'):
+                    merging.histos.append(self.ExtractHistogram(block,filename))
 
-                else:
-                    logging.getLogger('MA5').warning('Extra line is found: '+line)
-                statisticsTag.newline()    
-
-            # Looking from histogram data [ histo and histoLogX ]
-            elif dataTag.activated and \
-                 (selectionTag.activated or mergingTag.activated) and \
-                 len(words)==2 and (histoTag.activated or histoLogXTag.activated):
-                results = self.ExtractStatisticsFloat(words,numline,filename)
-                if dataTag.Nlines==0:
-                    if histoTag.activated:
-                        histoinfo.positive.underflow=results[0]
-                        histoinfo.negative.underflow=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.underflow=results[0]
-                        histologxinfo.negative.underflow=results[1]
-                elif dataTag.Nlines==(histoinfo.nbins+1):
-                    if histoTag.activated:
-                        histoinfo.positive.overflow=results[0]
-                        histoinfo.negative.overflow=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.overflow=results[0]
-                        histologxinfo.negative.overflow=results[1]
-                elif dataTag.Nlines>=1 and dataTag.Nlines<=histoinfo.nbins:
-                    if histoTag.activated or histoLogXTag.activated:
-                        data_positive.append(results[0])
-                        data_negative.append(results[1])
-                else:
-                    logging.getLogger('MA5').warning('Extra line is found: '+line)
-                dataTag.newline()    
-
-            # Looking from histogram data [ histoFreq ]
-            elif dataTag.activated and \
-                 (selectionTag.activated or mergingTag.activated) and \
-                 len(words)==3 and histoFreqTag.activated:
-                results = self.ExtractDataFreq(words,numline,filename)
-                labels.append(results[0])
-                data_positive.append(results[1])
-                data_negative.append(results[2])
-                dataTag.newline()    
-
-            
         # Information found ?
-        if beginTag.Nactivated==0 or beginTag.activated:
+        if root.Find('safheader')==None:
             logging.getLogger('MA5').error("SAF header <SAFheader> and </SAFheader> is not "+\
                           "found.")
-        if endTag.Nactivated==0 or endTag.activated:
+        if root.Find('saffooter')==None:
             logging.getLogger('MA5').error("SAF footer <SAFfooter> and </SAFfooter> is not "+\
                           "found.")
-        if globalTag.Nactivated==0 or globalTag.activated:
+        if globalinfo==None:
             logging.getLogger('MA5').error("Information corresponding to the block "+\
                           "<SampleGlobalInfo> is not found.")
             logging.getLogger('MA5').error("Information on the dataset '"+dataset.name+\
                           "' are not updated.")
-        if detailTag.Nactivated==0 or globalTag.activated:
+        if detailinfo==None:
             logging.getLogger('MA5').error("Information corresponding to the block "+\
                           "<SampleDetailInfo> is not found.")
             logging.getLogger('MA5').error("Information on the dataset '"+dataset.name+\
                           "' are not updated.")
-            
-        # Closing the file
-        file.close()
 
         # End
 
 
-        
-        
+    # Extracting the SAF files of all the datasets, in parallel; the
+    # results are attached in the order of the datasets
+    def ExtractDatasets(self,datasets,cuts,mergings,plots,domerging,ncores=1):
+        jobs = [ [self.path,dataset.name,domerging] for dataset in datasets ]
+        if ncores>1 and len(jobs)>1:
+            import multiprocessing
+            pool    = multiprocessing.Pool(min(ncores,len(jobs)))
+            results = pool.imap(ExtractDataset,jobs)
+        else:
+            pool    = None
+            results = itertools.imap(ExtractDataset,jobs)
+        try:
+            for i, [selection, merging] in enumerate(results):
+                if selection.measured_global!=None:
+                    datasets[i].measured_global = selection.measured_global
+                datasets[i].measured_detail.extend(selection.measured_detail)
+                cuts[i].initial.__dict__.update(selection.initial.__dict__)
+                cuts[i].cuts.extend(selection.cuts)
+                plots[i].histos.extend(selection.histos)
+                if merging!=None:
+                    mergings[i].histos.extend(merging.histos)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+
+    # Cache of the extracted results of a dataset (Output/<dataset>/
+    # Extraction.ma5), valid as long as the SAF files are unchanged
+    # (content hash: SAF files have fixed-width fields, so a rerun within
+    # the same second can keep both the size and the modification time)
+    def GetExtractionKey(self,name,domerging):
+        name = InstanceName.Get(name)
+        key  = [JobReader.ExtractionVersion]
+        saffiles = ['MadAnalysis5job.saf']
+        if domerging:
+            saffiles.append('MergingPlots.saf')
+        for saffile in saffiles:
+            filename = self.safdir+"/"+name+"/"+saffile
+            try:
+                md5   = hashlib.md5()
+                input = open(filename,'rb')
+                while True:
+                    data = input.read(1<<20)
+                    if not data:
+                        break
+                    md5.update(data)
+                input.close()
+            except:
+                return None
+            key.append([filename,md5.hexdigest()])
+        return key
+
+
+    def ReadExtractionCache(self,name,key):
+        filename = self.safdir+"/"+InstanceName.Get(name)+"/Extraction.ma5"
+        if key==None or not os.path.isfile(filename):
+            return None
+        try:
+            input = open(filename,'rb')
+            cached, results = pickle.load(input)
+            input.close()
+        except:
+            logging.getLogger('MA5').debug('the extraction cache '+filename+' cannot be read')
+            return None
+        if cached!=key:
+            return None
+        return results
+
+
+    def WriteExtractionCache(self,name,key,results):
+        if key==None:
+            return False
+        filename = self.safdir+"/"+InstanceName.Get(name)+"/Extraction.ma5"
+        try:
+            tmpname = filename+'.'+str(os.getpid())
+            output  = open(tmpname,'wb')
+            pickle.dump([key,results],output,pickle.HIGHEST_PROTOCOL)
+            output.close()
+            os.rename(tmpname,filename)
+        except:
+            logging.getLogger('MA5').debug('impossible to write the extraction cache '+filename)
+            return False
+        return True
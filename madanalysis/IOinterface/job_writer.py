@@ -31,6 +31,9 @@ import logging
 import shutil
 import os
 import commands
+import time
+import hashlib
+import glob
 
 class JobWriter():
 
@@ -597,7 +600,7 @@ class JobWriter():
             options.has_root_inc = True
             options.has_root_lib = True
         #options.has_userpackage = True
-        toRemove=['Log/compilation.log','Log/linking.log','Log/cleanup.log','Log/mrproper.log']
+        toRemove=['Log/compilation.log','Log/linking.log','Log/cleanup.log','Log/mrproper.log','Log/timing.log']
 
         # File to compile
         cppfiles = ['Main/*.cpp','SampleAnalyzer/User/*/*.cpp']
@@ -648,7 +651,20 @@ class JobWriter():
         # Return the string
         return ':'.join(newpaths)
 
-    def CompileJob(self):
+    def WriteBuildTiming(self,step,elapsed,ncores=1):
+
+        # Appending the timing of the step to the log folder
+        try:
+            file = open(self.path+'/Build/Log/timing.log','a')
+            file.write(step.ljust(15)+(("%.2f" % elapsed)+' s').ljust(15)+\
+                       'ncores='+str(ncores)+'\n')
+            file.close()
+        except:
+            logging.getLogger('MA5').debug('impossible to write the timing of the '+step)
+        logging.getLogger('MA5').debug(step+' time: '+("%.2f" % elapsed)+' s')
+
+
+    def CompileJob(self,ncores=1):
 
         # folder
         folder = self.path+'/Build'
@@ -658,9 +674,13 @@ class JobWriter():
         
         # shell command
         commands = ['make','compile']
+        if ncores>1:
+            commands.append('-j'+str(ncores))
 
         # call
+        start  = time.time()
         result, out = ShellCommand.ExecuteWithLog(commands,logfile,folder)
+        self.WriteBuildTiming('compilation',time.time()-start,ncores)
 
         # return result
         if not result:
@@ -726,7 +746,9 @@ class JobWriter():
         commands = ['make','link']
 
         # call
+        start  = time.time()
         result, out = ShellCommand.ExecuteWithLog(commands,logfile,folder)
+        self.WriteBuildTiming('linking',time.time()-start)
 
         # return result
         if not result:
@@ -756,7 +778,15 @@ class JobWriter():
                     file.write("\n")
         file.close()    
 
-    def WriteDatasetList(self,dataset):
+    def GetNumberOfShards(self,dataset,nshards):
+        # Only the SAF files can be merged: no splitting when other
+        # outputs (event files, detector simulation) are produced
+        if self.output!="" or self.main.fastsim.package in ["delphes","delphesMA5tune"]:
+            return 1
+        return max(1,min(nshards,len(dataset)))
+
+
+    def WriteDatasetList(self,dataset,nshards=1):
         name=InstanceName.Get(dataset.name)
         file = open(self.path+"/Input/"+name+".list","w")
         for item in dataset:
@@ -764,16 +794,31 @@ class JobWriter():
             file.write("\n")
         file.close()    
 
+        # Splitting the file list into shards of (almost) equal size
+        nshards = self.GetNumberOfShards(dataset,nshards)
+        if nshards==1:
+            return
+        for shard in range(nshards):
+            file = open(self.path+"/Input/"+name+".shard"+str(shard)+".list","w")
+            begin = (shard*len(dataset))/nshards
+            end   = ((shard+1)*len(dataset))/nshards
+            for item in dataset.filenames[begin:end]:
+                file.write(item)
+                file.write("\n")
+            file.close()
 
-    def RunJob(self,dataset):
 
-        # Getting the dataset name    
+    def GetRunCommands(self,dataset,shard=-1):
+
+        # Getting the dataset name
         name=InstanceName.Get(dataset.name)
+        if shard>=0:
+            name+=".shard"+str(shard)
 
         # Creating Output folder is not defined
         if not os.path.isdir(self.path+"/Output/"+name):
             os.mkdir(self.path+"/Output/"+name)
-            
+
         # folder where the program is launched
         folder = self.path+'/Output/'+name
 
@@ -784,6 +829,9 @@ class JobWriter():
         if not dataset.weighted_events:
             commands.append('--no_event_weight')
 
+        # Binary copy of the SAF files, read in place of the text by JobReader
+        commands.append('--saf_binary')
+
         # Release
         commands.append('--ma5_version="'+\
                         self.main.archi_info.ma5_version+';'+\
@@ -792,6 +840,92 @@ class JobWriter():
         # Inputs
         commands.append('../../Input/'+name+'.list')
 
+        return commands, folder
+
+
+    # A dataset is analyzed again when its fingerprint changes. The
+    # executable is part of it: all the histograms and cuts of the selection
+    # are filled in a single event loop and written in a single SAF file, so
+    # a new or modified plot needs a new pass over the events of every
+    # dataset, as a new cut does. The options only used to draw the plots
+    # (titles, scales, colors, stacking, normalization, ...) are not written
+    # in the generated sources: changing them reruns nothing.
+    def GetRunFingerprint(self,dataset,nshards,buildkey):
+        sha = hashlib.sha1()
+
+        # Executable (generated sources, flags and libraries)
+        sha.update('build '+buildkey+'\n')
+
+        # Run options
+        sha.update('weighted '+str(dataset.weighted_events)+'\n')
+        sha.update('version '+self.main.archi_info.ma5_version+';'+\
+                   self.main.archi_info.ma5_date+'\n')
+        sha.update('nshards '+str(self.GetNumberOfShards(dataset,nshards))+'\n')
+
+        # Input files: a modified sample gives a new fingerprint
+        for item in dataset.filenames:
+            try:
+                info = os.stat(item)
+                sha.update('file '+item+' '+str(info.st_size)+' '+str(int(info.st_mtime))+'\n')
+            except:
+                sha.update('file '+item+'\n')
+
+        # Runtime configuration files (detector cards, ...)
+        for item in sorted(glob.glob(self.path+'/Input/*')):
+            if item.endswith('.list') or not os.path.isfile(item):
+                continue
+            try:
+                input = open(item,'rb')
+                sha.update('card '+os.path.basename(item)+'\n')
+                sha.update(input.read())
+                input.close()
+            except:
+                pass
+
+        return sha.hexdigest()
+
+
+    # Entry of the fingerprint file holding the key of the executable
+    BuildEntry = '@build'
+
+    def ReadRunFingerprints(self):
+        fingerprints = {}
+        filename = self.path+'/Output/RunFingerprints.ma5'
+        if not os.path.isfile(filename):
+            return fingerprints
+        try:
+            input = open(filename,'r')
+            for line in input:
+                words = line.split()
+                if len(words)==2:
+                    fingerprints[words[0]]=words[1]
+            input.close()
+        except:
+            logging.getLogger('MA5').debug('impossible to read the file '+filename)
+        return fingerprints
+
+
+    def WriteRunFingerprints(self,fingerprints):
+        filename = self.path+'/Output/RunFingerprints.ma5'
+        try:
+            file = open(filename,'w')
+            for name in sorted(fingerprints.keys()):
+                file.write(name+' '+fingerprints[name]+'\n')
+            file.close()
+        except:
+            logging.getLogger('MA5').warning('impossible to write the file '+filename)
+
+
+    def HasRunOutput(self,dataset):
+        name=InstanceName.Get(dataset.name)
+        return os.path.isfile(self.path+'/Output/'+name+'/MadAnalysis5job.saf')
+
+
+    def RunJob(self,dataset):
+
+        # Getting the commands to launch
+        commands, folder = self.GetRunCommands(dataset)
+
         # Running SampleAnalyzer
         if self.main.redirectSAlogger:
             result = ShellCommand.ExecuteWithMA5Logging(commands,folder)
@@ -800,8 +934,172 @@ class JobWriter():
 
         return result
 
-        
-        
-        
-        
-        
+
+    def MergeShards(self,dataset,nshards):
+
+        # Getting the dataset name
+        name   = InstanceName.Get(dataset.name)
+        folder = self.path+'/Output/'+name
+        shards = [ folder+'.shard'+str(shard) for shard in range(nshards) ]
+        if not os.path.isdir(folder):
+            os.mkdir(folder)
+
+        # Merging the SAF files
+        from madanalysis.IOinterface.saf_merger import SafMerger
+        from madanalysis.IOinterface.saf_reader import SafReader
+        for saffile in ['MadAnalysis5job.saf','MergingPlots.saf']:
+            inputs = [ item+'/'+saffile for item in shards ]
+
+            # The selection output is compulsory, the merging plots are only
+            # produced if requested (by all the shards or by none of them)
+            found = [ os.path.isfile(item) for item in inputs ]
+            if saffile=='MergingPlots.saf' and not any(found):
+                continue
+            if not all(found):
+                shard = found.index(False)
+                logging.getLogger('MA5').error("the file '"+saffile+"' of the shard "+str(shard+1)+\
+                                               "/"+str(nshards)+" of the dataset '"+dataset.name+\
+                                               "' is not found: '"+inputs[shard]+"'")
+                return False
+            if not SafMerger.Merge(inputs,folder+'/'+saffile):
+                logging.getLogger('MA5').error("impossible to merge the outputs of the dataset '"+\
+                                               dataset.name+"'")
+                return False
+            SafReader(folder+'/'+saffile).WriteBinary()
+
+        # Keeping the logs and removing the shard folders
+        for shard in range(nshards):
+            if os.path.isfile(shards[shard]+'/SampleAnalyzer.log'):
+                shutil.move(shards[shard]+'/SampleAnalyzer.log',\
+                            folder+'/SampleAnalyzer.shard'+str(shard)+'.log')
+            try:
+                shutil.rmtree(shards[shard])
+            except:
+                logging.getLogger('MA5').warning("impossible to remove the folder '"+shards[shard]+"'")
+        return True
+
+
+    def RunJobs(self,datasets,ncores,callback=None,nshards=1):
+
+        # Sequential mode: same behaviour as for a single run
+        ntasks = sum([ self.GetNumberOfShards(item,nshards) for item in datasets ])
+        if ntasks==len(datasets) and (ncores<=1 or ntasks<=1):
+            results = []
+            for item in datasets:
+                logging.getLogger('MA5').info("   Running 'SampleAnalyzer' over dataset '"
+                                              +item.name+"'...")
+                logging.getLogger('MA5').info("    *******************************************************")
+                result = self.RunJob(item)
+                logging.getLogger('MA5').info("    *******************************************************")
+                if callback!=None:
+                    result = callback(item,result) and result
+                results.append([item,result])
+            return results
+        return JobWriter.RunSeveralJobs([[self,datasets,callback,'']],ncores,nshards)[0]
+
+
+    @staticmethod
+    def RunSeveralJobs(jobs,ncores,nshards=1):
+
+        # Parallel mode: one process per dataset (or per shard) of each job
+        # [jobber, datasets, callback, title], at most ncores at a time. Each
+        # process writes into its own log file, which is displayed as a whole
+        # when the process terminates (no interleaving)
+        tasks = []
+        for ijob in range(len(jobs)):
+            jobber, datasets = jobs[ijob][0], jobs[ijob][1]
+            for index in range(len(datasets)):
+                n = jobber.GetNumberOfShards(datasets[index],nshards)
+                if n==1:
+                    tasks.append([ijob,index,-1])
+                else:
+                    for shard in range(n):
+                        tasks.append([ijob,index,shard])
+        ncores    = max(1,ncores)
+        ndatasets = sum([ len(job[1]) for job in jobs ])
+        if len(jobs)>1:
+            logging.getLogger('MA5').info("   Running 'SampleAnalyzer' over "+str(ndatasets)+\
+                                          " datasets of "+str(len(jobs))+" jobs with "+\
+                                          str(ncores)+" parallel processes...")
+        elif len(tasks)==ndatasets:
+            logging.getLogger('MA5').info("   Running 'SampleAnalyzer' over "+str(ndatasets)+\
+                                          " datasets with "+str(ncores)+" parallel processes...")
+        else:
+            logging.getLogger('MA5').info("   Running 'SampleAnalyzer' over "+str(ndatasets)+\
+                                          " datasets split into "+str(len(tasks))+" runs with "+\
+                                          str(ncores)+" parallel processes...")
+        pending   = range(len(tasks))
+        running   = {}
+        status    = {}
+        remaining = {}
+        for ijob, index, shard in tasks:
+            remaining[ijob,index] = remaining.get((ijob,index),0)+1
+            status[ijob,index]    = True
+        nruns = dict(remaining)
+        while len(pending)!=0 or len(running)!=0:
+
+            # Launching new processes
+            while len(pending)!=0 and len(running)<ncores:
+                itask = pending.pop(0)
+                ijob, index, shard = tasks[itask]
+                jobber, datasets, callback, title = jobs[ijob]
+                label = "dataset '"+datasets[index].name+"'"
+                if title!='':
+                    label += " ("+title+")"
+                if shard>=0:
+                    label += " (shard "+str(shard+1)+"/"+str(nruns[ijob,index])+")"
+                commands, folder = jobber.GetRunCommands(datasets[index],shard)
+                logfile = folder+'/SampleAnalyzer.log'
+                process = ShellCommand.Launch(commands,logfile,folder)
+                if process is not None:
+                    logging.getLogger('MA5').info("     - "+label+" launched")
+                running[itask] = [process,logfile,time.time(),label]
+
+            # Checking the processes which are finished
+            finished = [ itask for itask in running.keys() \
+                         if running[itask][0] is None or \
+                            running[itask][0].poll() is not None ]
+            if len(finished)==0:
+                time.sleep(0.2)
+                continue
+
+            for itask in sorted(finished):
+                process, logfile, start, label = running.pop(itask)
+                ijob, index, shard = tasks[itask]
+                jobber, datasets, callback, title = jobs[ijob]
+                jobber.DumpRunLog(label,logfile,time.time()-start)
+                status[ijob,index] = status[ijob,index] and process is not None and \
+                                     (process.returncode==0)
+                remaining[ijob,index] -= 1
+                if remaining[ijob,index]!=0:
+                    continue
+
+                # All the runs of the dataset are done
+                if shard>=0 and status[ijob,index]:
+                    status[ijob,index] = jobber.MergeShards(datasets[index],nruns[ijob,index])
+                if callback!=None:
+                    status[ijob,index] = callback(datasets[index],status[ijob,index]) and \
+                                         status[ijob,index]
+
+        # Results of each job, in the dataset order
+        return [ [ [jobs[ijob][1][i],status[ijob,i]] for i in range(len(jobs[ijob][1])) ] \
+                 for ijob in range(len(jobs)) ]
+
+
+    def DumpRunLog(self,label,logfile,elapsed):
+        logging.getLogger('MA5').info("   Output of 'SampleAnalyzer' for the "+label+\
+                                      " ("+("%.1f" % elapsed)+" s):")
+        logging.getLogger('MA5').info("    *******************************************************")
+        try:
+            input = open(logfile,'r')
+            for line in input:
+                if 'progress' in line:
+                    continue
+                line = line.strip()
+                if line!='':
+                    logging.getLogger('MA5').info('    '+line)
+            input.close()
+        except:
+            logging.getLogger('MA5').warning('impossible to read the log file '+logfile)
+        logging.getLogger('MA5').info("    *******************************************************")
+
@@ -46,10 +46,15 @@ class LibraryWriter():
         # Number of cores
         import multiprocessing
         nmaxcores=multiprocessing.cpu_count()
+        if self.main.ncores>0:
+            ncores=min(self.main.ncores,nmaxcores)
+            self.logger.info("     Number of cores used for the compilation = " +\
+                         str(ncores))
+            return ncores
         self.logger.info("     => How many cores for the compiling? default = max = " +\
                      str(nmaxcores)+"")
         
-        if not self.main.forced:
+        if not self.main.forced and not self.main.script:
             test=False
             while(not test):
                 answer=raw_input("     Answer: ")
@@ -75,10 +80,15 @@ class LibraryWriter():
         # Number of cores
         import multiprocessing
         nmaxcores=multiprocessing.cpu_count()
+        if self.main.ncores>0:
+            ncores=min(self.main.ncores,nmaxcores)
+            self.logger.info("   => Number of cores used for the compilation = " +\
+                         str(ncores))
+            return ncores
         self.logger.info("   How many cores for the compiling? default = max = " +\
                      str(nmaxcores)+"")
         
-        if not self.main.forced:
+        if not self.main.forced and not self.main.script:
             test=False
             while(not test):
                 answer=raw_input("   Answer: ")
@@ -115,6 +125,8 @@ class LibraryWriter():
             filename = self.path+"/SampleAnalyzer/Commons/Makefile"
         elif package=='configuration':
             filename = self.path+"/SampleAnalyzer/Configuration/Makefile"
+        elif package=='plotter':
+            filename = self.path+"/SampleAnalyzer/Plotter/Makefile"
         elif package=='process':
             filename = self.path+"/SampleAnalyzer/Process/Makefile"
         elif package=='test_process':
@@ -138,6 +150,8 @@ class LibraryWriter():
             title='SampleAnalyzer commons'
         elif package=='configuration':
             title='SampleAnalyzer configuration'
+        elif package=='plotter':
+            title='SampleAnalyzer ROOT plotter'
         elif package=='process':
             title='SampleAnalyzer process'
         elif package=='test_commons':
@@ -171,6 +185,10 @@ class LibraryWriter():
             toRemove.extend(['compilation_fastjet.log','linking_fastjet.log','cleanup_fastjet.log','mrproper_fastjet.log','../Bin/TestFastjet.log'])
         elif package=='configuration':
             toRemove.extend(['compilation.log','linking.log','cleanup.log','mrproper.log'])
+        elif package=='plotter':
+            options.has_root_inc = True
+            options.has_root_lib = True
+            toRemove.extend(['compilation.log','linking.log','cleanup.log','mrproper.log','../Bin/ROOTPlotter.log'])
         elif package=='commons':
             toRemove.extend(['compilation.log','linking.log','cleanup.log','mrproper.log'])
         elif package=='test_commons':
@@ -270,7 +288,7 @@ class LibraryWriter():
             toRemove.extend(['compilation_process.log','linking_process.log','cleanup_process.log','mrproper_process.log','../Bin/TestSampleAnalyzer.log'])
 
         # file pattern
-        if package in ['commons','process','configuration']:
+        if package in ['commons','process','configuration','plotter']:
             cppfiles = ['*/*.cpp']
             hfiles   = ['*/*.h']
         elif package=='test_commons':
@@ -307,6 +325,10 @@ class LibraryWriter():
             isLibrary=False
             ProductName='PortabilityCheckup'
             ProductPath='../Bin/'
+        elif package=='plotter':
+            isLibrary=False
+            ProductName='ROOTPlotter'
+            ProductPath='../Bin/'
         elif package=='test_commons':
             isLibrary=False
             ProductName='TestCommons'
@@ -350,7 +372,7 @@ class LibraryWriter():
             strcores='-j'+str(ncores)
 
         # log file name
-        if package in ['process','commons','test','configuration']:
+        if package in ['process','commons','test','configuration','plotter']:
             logfile = folder+'/compilation.log'
         elif package in ['test_process','test_commons','test_zlib','test_fastjet','test_root','test_delphes','test_delphesMA5tune']:
             logfile = folder+'/compilation_'+package[5:]+'.log'
@@ -358,7 +380,7 @@ class LibraryWriter():
             logfile = folder+'/compilation_'+package+'.log'
 
         # makefile
-        if package in ['process','commons','test','configuration']:
+        if package in ['process','commons','test','configuration','plotter']:
             makefile = 'Makefile'
         elif package in ['test_process','test_commons','test_zlib','test_fastjet','test_root','test_delphes','test_delphesMA5tune']:
             makefile = 'Makefile_'+package[5:]
@@ -385,7 +407,7 @@ class LibraryWriter():
     def Link(self,package,folder):
 
         # log file name
-        if package in ['process','commons','test','configuration']:
+        if package in ['process','commons','test','configuration','plotter']:
             logfile = folder+'/linking.log'
         elif package in ['test_process','test_commons','test_zlib','test_fastjet','test_root','test_delphes','test_delphesMA5tune']:
             logfile = folder+'/linking_'+package[5:]+'.log'
@@ -393,7 +415,7 @@ class LibraryWriter():
             logfile = folder+'/linking_'+package+'.log'
 
         # makefile
-        if package in ['process','commons','test','configuration']:
+        if package in ['process','commons','test','configuration','plotter']:
             makefile = 'Makefile'
         elif package in ['test_process','test_commons','test_zlib','test_fastjet','test_root','test_delphes','test_delphesMA5tune']:
             makefile = 'Makefile_'+package[5:]
@@ -417,7 +439,7 @@ class LibraryWriter():
     def Clean(self,package,folder):
 
         # log file name
-        if package in ['process','commons','configuration','test']:
+        if package in ['process','commons','configuration','test','plotter']:
             logfile = folder+'/cleanup.log'
         elif package in ['test_process','test_commons','test_zlib','test_fastjet','test_root','test_delphes','test_delphesMA5tune']:
             logfile = folder+'/cleanup_'+package[5:]+'.log'
@@ -425,7 +447,7 @@ class LibraryWriter():
             logfile = folder+'/cleanup_'+package+'.log'
 
         # makefile
-        if package in ['process','commons','test','configuration']:
+        if package in ['process','commons','test','configuration','plotter']:
             makefile = 'Makefile'
         elif package in ['test_process','test_commons','test_zlib','test_fastjet','test_root','test_delphes','test_delphesMA5tune']:
             makefile = 'Makefile_'+package[5:]
@@ -449,7 +471,7 @@ class LibraryWriter():
     def MrProper(self,package,folder):
 
         # log file name
-        if package in ['process','commons','configuration']:
+        if package in ['process','commons','configuration','plotter']:
             logfile = folder+'/mrproper.log'
         elif package in ['test_process','test_commons','test_zlib','test_root','test_fastjet','test_delphes','test_delphesMA5tune']:
             logfile = folder+'/mrproper_'+package[5:]+'.log'
@@ -459,7 +481,7 @@ class LibraryWriter():
 
 
         # makefile
-        if package in ['process','commons','test','configuration']:
+        if package in ['process','commons','test','configuration','plotter']:
             makefile = 'Makefile'
         elif package in ['test_process','test_commons','test_zlib','test_root','test_fastjet','test_delphes','test_delphesMA5tune']:
             makefile = 'Makefile_'+package[5:]
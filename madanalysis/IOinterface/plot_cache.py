@@ -0,0 +1,126 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+import hashlib
+import logging
+import os
+import shutil
+
+
+class PlotCache():
+
+    # Version of the cache format (part of every hash)
+    Version = 1
+
+    def __init__(self,histo_path):
+        self.histo_path = histo_path
+        self.filename   = os.path.normpath(histo_path+'/PlotCache.ma5')
+        self.imagedir   = os.path.normpath(histo_path+'/Images')
+        self.entries    = {}
+        self.used       = []
+
+
+    @staticmethod
+    def Hash(renderer,description):
+        # Hash of everything that determines the picture: renderer and
+        # full description of the plot (bin contents, scales, styles, outputs)
+        digest = hashlib.md5()
+        digest.update('MA5PLOT'+str(PlotCache.Version)+'\n'+renderer+'\n')
+        digest.update(description)
+        return digest.hexdigest()
+
+
+    def Load(self):
+        self.entries = {}
+        if not os.path.isfile(self.filename):
+            return True
+        try:
+            input = open(self.filename,'r')
+            for line in input:
+                words = line.split()
+                if len(words)==2:
+                    self.entries[words[0]] = words[1]
+            input.close()
+        except:
+            logging.getLogger('MA5').debug('impossible to read the plot cache '+self.filename)
+            self.entries = {}
+        return True
+
+
+    def Save(self):
+        # Only the plots of the current report are kept
+        entries = {}
+        for name in self.used:
+            if name in self.entries:
+                entries[name] = self.entries[name]
+        try:
+            output = open(self.filename+'.tmp','w')
+            for name in sorted(entries.keys()):
+                output.write(name+'\t'+entries[name]+'\n')
+            output.close()
+            os.rename(self.filename+'.tmp',self.filename)
+        except:
+            logging.getLogger('MA5').warning('impossible to write the plot cache '+self.filename)
+            return False
+        return True
+
+
+    def GetImage(self,outputname):
+        # '../HTML/selection_0.png' -> 'Images/HTML/selection_0.png'
+        words = os.path.normpath(outputname).split('/')
+        return os.path.join(self.imagedir,words[-2],words[-1])
+
+
+    def Restore(self,name,hash,outputnames):
+        # Copying the images of an unchanged plot to the report folders
+        self.used.append(name)
+        if self.entries.get(name)!=hash:
+            return False
+        for outputname in outputnames:
+            if not os.path.isfile(self.GetImage(outputname)):
+                return False
+        try:
+            for outputname in outputnames:
+                shutil.copy(self.GetImage(outputname),\
+                            os.path.normpath(os.path.join(self.histo_path,outputname)))
+        except:
+            return False
+        return True
+
+
+    def Store(self,name,hash,outputnames):
+        # Keeping the images of a plot which has been produced
+        if name in self.entries:
+            del self.entries[name]
+        try:
+            for outputname in outputnames:
+                image = self.GetImage(outputname)
+                if not os.path.isdir(os.path.dirname(image)):
+                    os.makedirs(os.path.dirname(image))
+                shutil.copy(os.path.normpath(os.path.join(self.histo_path,outputname)),image)
+        except:
+            return False
+        self.entries[name] = hash
+        return True
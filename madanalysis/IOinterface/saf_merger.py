@@ -0,0 +1,254 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+import logging
+import math
+
+
+class SafMerger():
+
+    # Blocks whose lines are additive counters
+    NumericBlocks = ['<initialcounter>','<counter>','<statistics>','<data>']
+
+    @staticmethod
+    def SplitLine(line):
+        index=line.find('#')
+        if index==-1:
+            return line.strip(), ''
+        return line[:index].strip(), line[index:].rstrip()
+
+
+    @staticmethod
+    def IsTag(line):
+        words=line.split()
+        return len(words)==1 and words[0][0]=='<' and words[0][-1]=='>'
+
+
+    @staticmethod
+    def ToNumbers(words):
+        numbers = []
+        for word in words:
+            try:
+                numbers.append(int(word))
+            except:
+                try:
+                    numbers.append(float(word))
+                except:
+                    return None
+        return numbers
+
+
+    @staticmethod
+    def FormatNumber(value):
+        if isinstance(value,int) or isinstance(value,long):
+            return str(value)
+        return "%.15e" % value
+
+
+    @staticmethod
+    def FormatLine(numbers,comment,width=15):
+        line=''
+        for value in numbers:
+            line+=SafMerger.FormatNumber(value).ljust(width)+' '
+        if comment!='':
+            line+=comment
+        return line.rstrip()
+
+
+    @staticmethod
+    def ReadBlock(lines,start,endtag):
+        block=[]
+        index=start
+        while index<len(lines):
+            if lines[index].strip().lower()==endtag:
+                return block, index
+            block.append(lines[index])
+            index+=1
+        return block, index
+
+
+    @staticmethod
+    def Merge(inputs,output):
+
+        # Reading the shard files
+        contents = []
+        for filename in inputs:
+            try:
+                input = open(filename,'r')
+                contents.append(input.read().split('\n'))
+                input.close()
+            except:
+                logging.getLogger('MA5').error("impossible to read the SAF file '"+filename+"'")
+                return False
+
+        # Merging
+        reference = contents[0]
+        merged    = []
+        tags      = []
+        indices   = [0]*len(contents)
+        detailed  = []
+        while indices[0]<len(reference):
+            line = reference[indices[0]]
+
+            # Structural tags
+            if SafMerger.IsTag(line):
+                tag = line.strip().lower()
+                for i in range(1,len(contents)):
+                    if indices[i]>=len(contents[i]) or \
+                       contents[i][indices[i]].strip().lower()!=tag:
+                        logging.getLogger('MA5').error("the SAF files '"+inputs[0]+"' and '"+\
+                                                       inputs[i]+"' have different structures")
+                        return False
+
+                # Blocks to concatenate: one line per input file
+                if tag in ['<fileinfo>','<sampledetailedinfo>']:
+                    merged.append(line)
+                    header = []
+                    data   = []
+                    for i in range(len(contents)):
+                        block, indices[i] = SafMerger.ReadBlock(contents[i],indices[i]+1,\
+                                                                tag.replace('<','</'))
+                        for item in block:
+                            value, comment = SafMerger.SplitLine(item)
+                            if value=='':
+                                if i==0 and comment!='':
+                                    header.append(item)
+                                continue
+                            data.append(value)
+                    merged.extend(header)
+                    for i in range(len(data)):
+                        words=data[i].split()
+                        if tag=='<sampledetailedinfo>':
+                            detailed.append(SafMerger.ToNumbers(words))
+                            newline=SafMerger.FormatLine(detailed[-1],'')
+                        else:
+                            newline=data[i].ljust(40)
+                        if i<2 or i>=(len(data)-2):
+                            newline+=' # file '+str(i+1)+' / '+str(len(data))
+                        merged.append(newline)
+                    continue
+
+                # Frequency histograms: data lines are merged label by label
+                if tag=='<data>' and '<histofrequency>' in tags:
+                    merged.append(line)
+                    stack = {}
+                    for i in range(len(contents)):
+                        block, indices[i] = SafMerger.ReadBlock(contents[i],indices[i]+1,'</data>')
+                        for item in block:
+                            value, comment = SafMerger.SplitLine(item)
+                            numbers = SafMerger.ToNumbers(value.split())
+                            if numbers==None or len(numbers)!=3:
+                                continue
+                            if numbers[0] not in stack:
+                                stack[numbers[0]]=[0,0]
+                            stack[numbers[0]][0]+=numbers[1]
+                            stack[numbers[0]][1]+=numbers[2]
+                    labels = sorted(stack.keys())
+                    for i in range(len(labels)):
+                        comment=''
+                        if i<2 or i>=(len(labels)-2):
+                            comment='# bin '+str(i+1)+' / '+str(len(labels))
+                        merged.append(SafMerger.FormatLine([labels[i]]+stack[labels[i]],comment))
+                    continue
+
+                # Opening / closing tags
+                if tag.startswith('</'):
+                    if len(tags)!=0 and tags[-1]==tag.replace('</','<'):
+                        tags.pop()
+                else:
+                    tags.append(tag)
+                merged.append(line)
+                indices = [ x+1 for x in indices ]
+                continue
+
+            # Global info: recomputed from the detailed info at the end
+            if len(tags)!=0 and tags[-1]=='<sampleglobalinfo>':
+                value, comment = SafMerger.SplitLine(line)
+                if value=='':
+                    merged.append(line)
+                else:
+                    merged.append('@GLOBALINFO@')
+                for i in range(len(contents)):
+                    indices[i]+=1
+                continue
+
+            # Additive counters
+            value, comment = SafMerger.SplitLine(line)
+            if len(tags)!=0 and tags[-1] in SafMerger.NumericBlocks and value!='':
+                numbers = SafMerger.ToNumbers(value.split())
+                if numbers!=None:
+                    for i in range(1,len(contents)):
+                        if indices[i]>=len(contents[i]):
+                            numbers=None
+                            break
+                        other,dummy = SafMerger.SplitLine(contents[i][indices[i]])
+                        others = SafMerger.ToNumbers(other.split())
+                        if others==None or len(others)!=len(numbers):
+                            numbers=None
+                            break
+                        numbers = [ numbers[j]+others[j] for j in range(len(numbers)) ]
+                    if numbers==None:
+                        logging.getLogger('MA5').error("the SAF files "+', '.join(inputs)+\
+                                                       " cannot be merged (inconsistent counters)")
+                        return False
+                    merged.append(SafMerger.FormatLine(numbers,comment))
+                    indices = [ x+1 for x in indices ]
+                    continue
+
+            # Anything else (names, descriptions, comments) taken from the first file
+            merged.append(line)
+            indices = [ x+1 for x in indices ]
+
+        # Global info from the detailed info (same convention as SampleAnalyzer)
+        nevents = 0
+        xsection = 0.
+        xerror = 0.
+        sumw_pos = 0.
+        sumw_neg = 0.
+        for item in detailed:
+            if item==None or len(item)!=5:
+                continue
+            nevents  += int(item[2])
+            xsection += item[0]*item[2]
+            xerror   += item[1]*item[1]*item[2]*item[2]
+            sumw_pos += item[3]
+            sumw_neg += item[4]
+        if nevents!=0:
+            xsection /= nevents
+            xerror    = math.sqrt(xerror) / nevents
+        else:
+            xsection = 0.
+            xerror   = 0.
+        globalinfo = SafMerger.FormatLine([xsection,xerror,nevents,sumw_pos,sumw_neg],'')
+        merged = [ globalinfo if x=='@GLOBALINFO@' else x for x in merged ]
+
+        # Writing the merged file
+        try:
+            out = open(output,'w')
+            out.write('\n'.join(merged))
+            out.close()
+        except:
+            logging.getLogger('MA5').error("impossible to write the SAF file '"+output+"'")
+            return False
+        return True
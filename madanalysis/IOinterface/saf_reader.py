@@ -0,0 +1,344 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+import logging
+import os
+import re
+import struct
+import zlib
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SafBlock():
+
+    def __init__(self,tag,numline):
+        self.tag      = tag      # lower-case name, without the brackets
+        self.numline  = numline
+        self.chunks   = []       # raw content: [first line number, text]
+        self.children = []       # sub-blocks, in the order of the file
+        self.tables   = {}       # numerical content, by number of columns
+        self.lines    = None
+
+
+    def Find(self,tag):
+        for child in self.children:
+            if child.tag==tag:
+                return child
+        return None
+
+
+    def FindAll(self,tag):
+        return [ child for child in self.children if child.tag==tag ]
+
+
+    def Lines(self,nwords=None):
+        # Content lines [numline, line, words] without the comments,
+        # tokenized on demand
+        if self.lines==None:
+            self.lines = []
+            # block read from a binary copy: the lines are rebuilt
+            if len(self.chunks)==0 and len(self.tables)!=0:
+                for table in self.tables.values():
+                    for row in table:
+                        words = [ '%.17g' % x for x in row ]
+                        self.lines.append([self.numline+len(self.lines)+1,' '.join(words),words])
+            for numline, text in self.chunks:
+                for line in text.split('\n'):
+                    index=line.find('#')
+                    if index!=-1:
+                        line=line[:index]
+                    words=line.split()
+                    if len(words)!=0:
+                        self.lines.append([numline,line.strip(),words])
+                    numline+=1
+        if nwords==None:
+            return self.lines
+        return [ line for line in self.lines if len(line[2])==nwords ]
+
+
+class SafReader():
+
+    # Binary copy: magic number, blocks whose numerical content is stored
+    # as packed float64 arrays
+    BinaryMagic    = 'MA5SAFB2'
+    BinaryBlocks   = ['data','statistics']
+
+    # Lines made of a single tag (possibly followed by a comment)
+    TagPattern     = re.compile(r'\n[ \t\r]*<(/?)([^<>\s#]+)>[ \t\r]*(?:#[^\n]*)?(?=\n|$)')
+    CommentPattern = re.compile(r'#.*')
+
+    def __init__(self,filename):
+        self.filename = filename
+        self.root     = SafBlock('',0)
+
+
+    @staticmethod
+    def HasNumpy():
+        return numpy is not None
+
+
+    def Read(self):
+
+        # Reading the whole file at once
+        try:
+            input = open(self.filename,'rb')
+            text  = input.read()
+            input.close()
+        except:
+            logging.getLogger('MA5').error("File called '"+self.filename+"' is not found")
+            return False
+
+        # Binary copy written by SampleAnalyzer (--saf_binary), used only
+        # if it has been made from this text
+        if self.ReadBinary(text):
+            return True
+        return self.ReadText(text)
+
+
+    def BinaryName(self):
+        return self.filename+'b'
+
+
+    @staticmethod
+    def BinaryHeader(text):
+        # size and CRC32 of the text file (same convention as SAFWriter)
+        return SafReader.BinaryMagic+struct.pack('<QI',len(text),zlib.crc32(text)&0xffffffff)
+
+
+    def ReadBinary(self,text):
+        if not os.path.isfile(self.BinaryName()):
+            return False
+        try:
+            input = open(self.BinaryName(),'rb')
+            data  = input.read()
+            input.close()
+        except:
+            return False
+        header = SafReader.BinaryHeader(text)
+        if data[:len(header)]!=header:
+            logging.getLogger('MA5').debug('the binary SAF file '+self.BinaryName()+' is not up to date')
+            return False
+
+        # Blocks
+        try:
+            root, offset = SafReader.UnpackBlock(data,len(header))
+        except:
+            logging.getLogger('MA5').debug('corrupted binary SAF file '+self.BinaryName())
+            return False
+        if offset!=len(data):
+            return False
+        self.root = root
+        return True
+
+
+    @staticmethod
+    def UnpackBlock(data,offset):
+        taglength, numline = struct.unpack_from('<HI',data,offset)
+        offset += 6
+        block   = SafBlock(data[offset:offset+taglength],numline)
+        offset += taglength
+
+        # Raw text
+        nchunks = struct.unpack_from('<I',data,offset)[0]
+        offset += 4
+        for i in range(nchunks):
+            numline, length = struct.unpack_from('<II',data,offset)
+            offset += 8
+            block.chunks.append([numline,data[offset:offset+length]])
+            offset += length
+
+        # Numerical content
+        ntables = struct.unpack_from('<I',data,offset)[0]
+        offset += 4
+        for i in range(ntables):
+            ncolumns, nrows = struct.unpack_from('<II',data,offset)
+            offset += 8
+            nvalues = ncolumns*nrows
+            if 8*nvalues>len(data)-offset:
+                raise ValueError('truncated table')
+            if numpy is not None:
+                values = numpy.frombuffer(data,dtype='<f8',count=nvalues,offset=offset)
+                table  = values.astype(float).reshape(nrows,ncolumns)
+            else:
+                values = list(struct.unpack_from('<%dd' % nvalues,data,offset))
+                table  = [ values[j:j+ncolumns] for j in range(0,nvalues,ncolumns) ]
+            block.tables[ncolumns] = table
+            offset += 8*nvalues
+
+        # Sub-blocks
+        nchildren = struct.unpack_from('<I',data,offset)[0]
+        offset += 4
+        for i in range(nchildren):
+            child, offset = SafReader.UnpackBlock(data,offset)
+            block.children.append(child)
+        return block, offset
+
+
+    @staticmethod
+    def PackBlock(block,output):
+        # numerical blocks: packed values instead of the text (if the
+        # conversion is possible)
+        table = None
+        if block.tag in SafReader.BinaryBlocks and len(block.children)==0:
+            ncolumns = SafReader.NumColumns(block)
+            if ncolumns!=0:
+                table = SafReader.Table(block,ncolumns)
+        output.append(struct.pack('<HI',len(block.tag),block.numline)+block.tag)
+        if table is None:
+            output.append(struct.pack('<I',len(block.chunks)))
+            for numline, text in block.chunks:
+                output.append(struct.pack('<II',numline,len(text))+text)
+            output.append(struct.pack('<I',0))
+        else:
+            output.append(struct.pack('<II',0,1))
+            output.append(struct.pack('<II',ncolumns,len(table)))
+            if numpy is not None:
+                output.append(numpy.ascontiguousarray(table,dtype='<f8').tostring())
+            else:
+                values = [ x for row in table for x in row ]
+                output.append(struct.pack('<%dd' % len(values),*values))
+        output.append(struct.pack('<I',len(block.children)))
+        for child in block.children:
+            SafReader.PackBlock(child,output)
+
+
+    # Binary copy of a SAF file written by MadAnalysis itself (merged
+    # outputs), in the format of SampleAnalyzer
+    def WriteBinary(self):
+        try:
+            input = open(self.filename,'rb')
+            text  = input.read()
+            input.close()
+        except:
+            return False
+        self.root = SafBlock('',0)
+        if not self.ReadText(text):
+            return False
+        output = [ SafReader.BinaryHeader(text) ]
+        try:
+            SafReader.PackBlock(self.root,output)
+            tmpname = self.BinaryName()+'.tmp'
+            binary  = open(tmpname,'wb')
+            binary.write(''.join(output))
+            binary.close()
+            os.rename(tmpname,self.BinaryName())
+        except:
+            logging.getLogger('MA5').debug('impossible to write the binary SAF file '+self.BinaryName())
+            return False
+        return True
+
+
+    @staticmethod
+    def NumColumns(block):
+        # number of words of the first content line
+        for numline, text in block.chunks:
+            for line in text.split('\n'):
+                index=line.find('#')
+                if index!=-1:
+                    line=line[:index]
+                words=line.split()
+                if len(words)!=0:
+                    return len(words)
+        return 0
+
+
+    def ReadText(self,text):
+
+        # Only the tag lines are located: the text between two tags is
+        # attached as it is to the innermost opened block
+        # (each chunk starts at the end of the line preceding it)
+        text     = '\n'+text
+        stack    = [self.root]
+        numline  = 0
+        position = 0
+        for match in SafReader.TagPattern.finditer(text):
+            chunk = text[position:match.start()]
+            if chunk!='' and not chunk.isspace():
+                stack[-1].chunks.append([numline,chunk])
+            numline += chunk.count('\n')+1
+            position = match.end()
+            tag = match.group(2).lower()
+            if match.group(1)=='':
+                block=SafBlock(tag,numline)
+                stack[-1].children.append(block)
+                stack.append(block)
+            elif len(stack)>1 and stack[-1].tag==tag:
+                stack.pop()
+            else:
+                logging.getLogger('MA5').warning('Unexpected tag </'+match.group(2)+'> @ "'+\
+                                                 self.filename+'" line='+str(numline))
+        chunk = text[position:]
+        if chunk!='' and not chunk.isspace():
+            stack[-1].chunks.append([numline,chunk])
+
+        # Blocks not closed
+        for block in stack[1:]:
+            logging.getLogger('MA5').warning('Block <'+block.tag+'> opened @ "'+self.filename+\
+                                             '" line='+str(block.numline)+' is not closed')
+        return True
+
+
+    @staticmethod
+    def Table(block,ncolumns):
+        # Numerical content of a block made of lines of ncolumns numbers,
+        # converted at once (None if the block has another structure)
+        if ncolumns in block.tables:
+            return block.tables[ncolumns]
+        if len(block.chunks)==0 and len(block.tables)!=0:
+            return None
+        text = ''.join([ x[1] for x in block.chunks ])
+        if '#' in text:
+            text = SafReader.CommentPattern.sub('',text)
+        text = text.strip()
+        if text=='':
+            nlines = 0
+        else:
+            nlines = text.count('\n')+1
+        try:
+            if numpy is not None:
+                values = numpy.array(text.split(),dtype=float)
+            else:
+                values = list(map(float,text.split()))
+        except:
+            return None
+        if len(values)!=nlines*ncolumns:
+            return None
+        if numpy is not None:
+            table = values.reshape(nlines,ncolumns)
+        else:
+            table = [ values[i:i+ncolumns] for i in range(0,len(values),ncolumns) ]
+        block.tables[ncolumns] = table
+        return table
+
+
+    @staticmethod
+    def Column(table,index):
+        # numpy array (a copy, independent of the table) if numpy is available
+        if numpy is not None and not isinstance(table,list):
+            return table[:,index].copy()
+        return [ float(row[index]) for row in table ]
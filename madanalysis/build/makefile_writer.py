@@ -420,7 +420,7 @@ class MakefileWriter():
         # Check library
         if len(libs)!=0:
             file.write('# Check library\n')
-            file.write('library_check:\n')
+            file.write('library_check: | header\n')
             for ind in range(0,len(libs)):
                 file.write('ifeq ($(wildcard $(REQUIRED'+str(ind+1)+')),)\n')
                 file.write('\t@echo -e $(RED)"The shared library "$(REQUIRED'+str(ind+1)+')" is not found"\n')
@@ -441,7 +441,10 @@ class MakefileWriter():
 
         # Compile_header target
         file.write('# Compile_header target\n')
-        file.write('compile_header:\n')
+        if len(libs)==0:
+            file.write('compile_header: | header\n')
+        else:
+            file.write('compile_header: | header library_check\n')
         file.write('\t@echo -e $(YELLOW)"'+StringTools.Fill('-',50)+'"\n')
         file.write('\t@echo -e "'+StringTools.Center('Compilation',50)+'"\n')
         file.write('\t@echo -e "'+StringTools.Fill('-',50)+'"$(NORMAL)\n')
@@ -449,7 +452,7 @@ class MakefileWriter():
 
         # Linking_header target
         file.write('# Link_header target\n')
-        file.write('link_header:\n')
+        file.write('link_header: $(OBJS)\n')
         file.write('\t@echo -e $(YELLOW)"'+StringTools.Fill('-',50)+'"\n')
         file.write('\t@echo -e "'+StringTools.Center('Linking',50)+'"\n')
         file.write('\t@echo -e "'+StringTools.Fill('-',50)+'"$(NORMAL)\n')
@@ -483,14 +486,17 @@ class MakefileWriter():
 
         # Compile each file
         # TO NOT FORGET HDRS -> handling header dependencies
+        # The order-only prerequisite keeps the headers in front of the
+        # compilation output when several jobs are running (make -j)
         file.write('# Compile each file\n')
+        file.write('$(OBJS): | compile_header\n')
         file.write('%.o: %.cpp $(HDRS)\n')
         file.write('\t$(CXX) $(CXXFLAGS) -o $@ -c $<\n')
         file.write('\n')
 
         # Link
         file.write('# Link target\n')
-        file.write('link: $(OBJS)\n')
+        file.write('link: $(OBJS) | link_header\n')
         if not ProductPath.endswith('/'):
             ProductPath=ProductPath+'/'
         if isLibrary:
@@ -504,7 +510,11 @@ class MakefileWriter():
 
         # Phony target
         file.write('# Phony target\n')
-        file.write('.PHONY: do_clean header compile_header link_header\n')
+        phony = ['all','header','compile_header','link_header','clean_header','mrproper_header',\
+                 'precompile','compile','link','clean','do_clean','mrproper','do_mrproper']
+        if len(libs)!=0:
+            phony.append('library_check')
+        file.write('.PHONY: '+' '.join(phony)+'\n')
         file.write('\n')
 
         # Cleaning
@@ -521,7 +531,7 @@ class MakefileWriter():
         file.write('mrproper: mrproper_header do_mrproper\n')
         file.write('\n')
         file.write('# Do Mr Proper target \n')
-        file.write('do_mrproper: do_clean\n')
+        file.write('do_mrproper: do_clean | mrproper_header\n')
         if isLibrary:
             file.write('\t@rm -f '+ProductPath+'$(LIBRARY)\n')
         else:
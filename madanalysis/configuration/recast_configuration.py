@@ -25,11 +25,16 @@
 from madanalysis.enumeration.ma5_running_type   import MA5RunningType
 from madanalysis.IOinterface.library_writer     import LibraryWriter
 from madanalysis.IOinterface.folder_writer      import FolderWriter
+from madanalysis.misc.cls_calculator            import CLsCalculator, AsymptoticCLsCalculator, CLsCache, FindLimit
 from shell_command import ShellCommand
 import logging
 import shutil
 import os
 import math
+import time
+import copy
+import zlib
+import itertools
 
 def CleanRegionName(mystr):
     newstr = mystr.replace("/",  "_slash_")
@@ -47,59 +52,75 @@ def CleanRegionName(mystr):
     return newstr
 
 def CLs(NumObserved, ExpectedBG, BGError, SigHypothesis, NumToyExperiments):
-    ## testing whether scipy is there
-    try:
-        import scipy.stats
-    except ImportError:
-        logging.getLogger('MA5').warning('scipy is not installed... the CLs module cannot be used.')
-        logging.getLogger('MA5').warning('Please install scipy.')
+    ## testing whether numpy and scipy are there
+    if not CLsCalculator.IsAvailable():
         return False
-    # generate a set of expected-number-of-background-events, one for each toy
-    # experiment, distributed according to a Gaussian with the specified mean
-    # and uncertainty
-    ExpectedBGs = scipy.stats.norm.rvs(loc=ExpectedBG, scale=BGError, size=NumToyExperiments)
-
-    # Ignore values in the tail of the Gaussian extending to negative numbers
-    ExpectedBGs = [value for value in ExpectedBGs if value > 0]
-
-    # For each toy experiment, get the actual number of background events by
-    # taking one value from a Poisson distribution created using the expected
-    # number of events.
-    ToyBGs = scipy.stats.poisson.rvs(ExpectedBGs)
-    ToyBGs = map(float, ToyBGs)
-
-    # The probability for the background alone to fluctutate as LOW as
-    # observed = the fraction of the toy experiments with backgrounds as low as
-    # observed = p_b.
-    # NB (1 - this p_b) corresponds to what is usually called p_b for CLs.
-    p_b = scipy.stats.percentileofscore(ToyBGs, NumObserved, kind='weak')*.01
-
-    # Toy MC for background+signal
-    ExpectedBGandS = [expectedbg + SigHypothesis for expectedbg in ExpectedBGs]
-    ExpectedBGandS = [x for x in ExpectedBGandS if x > 0]
-    if len(ExpectedBGandS)==0:
-        return 0.
-    ToyBplusS = scipy.stats.poisson.rvs(ExpectedBGandS)
-    ToyBplusS = map(float, ToyBplusS)
-
-    # Calculate the fraction of these that are >= the number observed,
-    # giving p_(S+B). Divide by (1 - p_b) a la the CLs prescription.
-    p_SplusB = scipy.stats.percentileofscore(ToyBplusS, NumObserved, kind='weak')*.01
-
-    if p_SplusB>p_b:
-        return 0.
-    else:
-        return 1.-(p_SplusB / p_b) # 1 - CLs
+    ## 1 - CLs for a single signal hypothesis
+    return CLsCalculator(NumObserved,ExpectedBG,BGError,NumToyExperiments)(SigHypothesis)
+
+def CLsTaskSeed(*keys):
+    ## seed of a CLs task, fixed by the task itself (analysis, region, tag)
+    ## so that the results do not depend on the number of workers
+    return zlib.crc32('/'.join([str(x) for x in keys])) & 0x7fffffff
+
+def NewCLsCalculator(nobs,nb,deltanb,method,ntoys,seed=None):
+    ## toys (also used as reference in the comparison mode) or asymptotic formulae
+    if method=="asymptotic":
+        return AsymptoticCLsCalculator(nobs,nb,deltanb)
+    return CLsCalculator(nobs,nb,deltanb,ntoys,seed)
+
+def GetN95(nobs,nb,deltanb,method,ntoys,seed,label):
+    ## 95% CL upper limit on the number of signal events of a region and
+    ## its uncertainty (None if it cannot be computed, [-1,0] if no
+    ## crossing has been found)
+    logger = logging.getLogger('MA5')
+    ## one set of background toys for all the signal hypotheses
+    calculator = NewCLsCalculator(nobs,nb,deltanb,method,ntoys,seed)
+    if not calculator.IsValid():
+        logger.debug('region ' + label + ', no background toy below the observation')
+        return None
+    ## grid around the typical size of the background fluctuations
+    result = FindLimit(calculator,max(nobs,nb+deltanb,1.),0.95)
+    if result is None:
+        logger.debug('region ' + label + ', no 95% CL crossing found')
+        return [-1.,0.]
+    logger.debug('region ' + label + ', n95 = ' + str(result[0]) + ' +- ' + str(result[1]) + ' events')
+    return list(result)
+
+def FormatSig95(n95,nsignal):
+    ## limit on the cross section (in pb) and its uncertainty, nsignal
+    ## being the signal yield for 1 pb
+    if nsignal<=0 or n95 is None:
+        return ["-1","-1"]
+    if n95[0]<0:
+        return ["%.7f" % n95[0],"-1"]
+    return ["%.7f" % (n95[0]/nsignal),"%.7f" % (n95[1]/nsignal)]
+
+def RunCLsTask(task):
+    ## entry point of the worker processes: ('n95'|'scan'|'cls', arguments)
+    kind, args = task
+    if kind=='n95':
+        return GetN95(*args)
+    if kind=='scan':
+        nobs, nb, deltanb, nsignals, method, ntoys, seed = args
+        calculator = NewCLsCalculator(nobs,nb,deltanb,method,ntoys,seed)
+        return [ float(x) for x in calculator.Evaluate(nsignals) ]
+    nobs, nb, deltanb, nsignal, method, ntoys, seed = args
+    return NewCLsCalculator(nobs,nb,deltanb,method,ntoys,seed)(nsignal)
 
 class RecastConfiguration:
 
     default_CLs_numofexps = 100000
+    default_cache_size    = 10
 
     userVariables ={
          "status"        : ["on","off"],\
          "CLs_numofexps" : [str(default_CLs_numofexps)],\
+         "CLs_method"    : ["toys","asymptotic","compare"],\
          "card_path"     : "",\
-         "store_root"    : ["True", "False"]
+         "store_root"    : ["True", "False"],\
+         "cache_size"    : [str(default_cache_size)],\
+         "xsection_scan" : ["none"]
     }
 
     def __init__(self):
@@ -109,6 +130,7 @@ class RecastConfiguration:
         self.pad        = False
         self.padtune    = False
         self.store_root = False
+        self.cache_size = RecastConfiguration.default_cache_size
         self.DelphesDic = {
           "delphes_card_cms_standard.tcl"         : ["cms_sus_14_001_monojet", "cms_sus_13_016", "cms_sus_13_012", "cms_sus_13_011"],
           "delphes_card_cms_sus14004.tcl"         : ["cms_sus_14_001_TopTag"],
@@ -152,7 +174,12 @@ class RecastConfiguration:
         self.delphesruns  = []
         self.analysisruns = []
         self.CLs_numofexps= 100000
+        self.CLs_method   = "toys"
+        self.xsection_scan= []
         self.card_path= ""
+        self.padbuilds    = {}
+        self.clscache     = None
+        self.timings      = []
         self.logger = logging.getLogger('MA5')
 
     def Display(self):
@@ -163,8 +190,11 @@ class RecastConfiguration:
             self.user_DisplayParameter("pad")
             self.user_DisplayParameter("padtune")
             self.user_DisplayParameter("CLs_numofexps")
+            self.user_DisplayParameter("CLs_method")
             self.user_DisplayParameter("card_path")
             self.user_DisplayParameter("store_root")
+            self.user_DisplayParameter("cache_size")
+            self.user_DisplayParameter("xsection_scan")
 
     def user_DisplayParameter(self,parameter):
         if parameter=="status":
@@ -197,12 +227,28 @@ class RecastConfiguration:
         elif parameter=="CLs_numofexps":
             self.logger.info("   * Number of toy experiments for the CLs calculation: "+str(self.CLs_numofexps))
             return
+        elif parameter=="CLs_method":
+            self.logger.info("   * Method for the CLs calculation: "+self.CLs_method)
+            return
         elif parameter=="card_path":
             self.logger.info("   * Path to a recasting card: "+str(self.card_path))
             return
         elif parameter=="store_root":
             self.logger.info("   * Keeping the root files: "+str(self.store_root))
             return
+        elif parameter=="cache_size":
+            if self.cache_size>0:
+                self.logger.info("   * Size of the cache of Delphes outputs: "+str(self.cache_size)+" GB")
+            else:
+                self.logger.info("   * Size of the cache of Delphes outputs: disabled")
+            return
+        elif parameter=="xsection_scan":
+            if len(self.xsection_scan)!=0:
+                self.logger.info("   * Signal cross sections of the CLs scan: "+str(len(self.xsection_scan))+\
+                                 " values from "+str(self.xsection_scan[0])+" to "+str(self.xsection_scan[-1])+" pb")
+            else:
+                self.logger.info("   * Signal cross sections of the CLs scan: none")
+            return
         return
 
     def user_SetParameter(self,parameter,value,level,hasroot,hasdelphes,hasMA5tune,datasets, hasPAD, hasPADtune):
@@ -279,6 +325,16 @@ class RecastConfiguration:
                 return
             self.CLs_numofexps = int(value)
 
+        # CLs calculation method
+        elif parameter=="CLs_method":
+            if self.status!="on":
+                self.logger.error("Please first set the recasting mode to 'on'.")
+                return
+            if value not in RecastConfiguration.userVariables["CLs_method"]:
+                self.logger.error("The CLs method can only be 'toys', 'asymptotic' or 'compare'.")
+                return
+            self.CLs_method = value
+
         # path to a recasting card
         elif parameter=="card_path":
             if self.status!="on":
@@ -304,6 +360,33 @@ class RecastConfiguration:
                 self.logger.error("Do the root files need to be stored? (True/False)")
                 return
 
+        # Size of the cache of Delphes outputs
+        elif parameter=="cache_size":
+            if self.status!="on":
+                self.logger.error("Please first set the recasting mode to 'on'.")
+                return
+            try:
+                tmp = float(value)
+            except:
+                self.logger.error("'cache_size' is a positive number of GB (0 = no cache)")
+                return
+            if tmp<0:
+                self.logger.error("'cache_size' is a positive number of GB (0 = no cache)")
+                return
+            self.cache_size = tmp
+
+        # Signal cross sections for which the CLs are computed
+        elif parameter=="xsection_scan":
+            if self.status!="on":
+                self.logger.error("Please first set the recasting mode to 'on'.")
+                return
+            scan = RecastConfiguration.ParseXsectionScan(value)
+            if scan==None:
+                self.logger.error("'xsection_scan' is either 'none', a comma-separated list of cross sections "+\
+                                  "(in pb) or a range 'min:max:n' of n logarithmically-spaced cross sections")
+                return
+            self.xsection_scan = scan
+
         # other rejection if no algo specified
         else:
             self.logger.error("the recast module has no parameter called '"+parameter+"'")
@@ -311,7 +394,7 @@ class RecastConfiguration:
 
     def user_GetParameters(self):
         if self.status=="on":
-            table = ["CLs_numofexps", "card_path", "store_root"]
+            table = ["CLs_numofexps", "CLs_method", "card_path", "store_root", "cache_size", "xsection_scan"]
         else:
            table = []
         return table
@@ -323,12 +406,45 @@ class RecastConfiguration:
                 table.extend(RecastConfiguration.userVariables["status"])
         elif variable =="CLs_numofexps":
                 table.extend(RecastConfiguration.userVariables["CLs_numofexps"])
+        elif variable =="CLs_method":
+                table.extend(RecastConfiguration.userVariables["CLs_method"])
         elif variable =="card_path":
                 table.extend(RecastConfiguration.userVariables["card_path"])
         elif variable =="store_root":
                 table.extend(RecastConfiguration.userVariables["store_root"])
+        elif variable =="cache_size":
+                table.extend(RecastConfiguration.userVariables["cache_size"])
+        elif variable =="xsection_scan":
+                table.extend(RecastConfiguration.userVariables["xsection_scan"])
         return table
 
+    @staticmethod
+    def ParseXsectionScan(value):
+        ## 'none', 'xs1,xs2,...' or 'min:max:n' (logarithmic spacing);
+        ## None if the value cannot be understood
+        if value.lower()=="none":
+            return []
+        try:
+            if ':' in value:
+                words = value.split(':')
+                if len(words)!=3:
+                    return None
+                xsmin = float(words[0])
+                xsmax = float(words[1])
+                npts  = int(words[2])
+                if xsmin<=0 or xsmax<xsmin or npts<1:
+                    return None
+                if npts==1:
+                    return [xsmin]
+                ratio = math.log(xsmax/xsmin)/(npts-1)
+                return [ xsmin*math.exp(i*ratio) for i in range(npts) ]
+            scan = sorted([ float(x) for x in value.split(',') if x!='' ])
+        except:
+            return None
+        if len(scan)==0 or scan[0]<=0:
+            return None
+        return scan
+
 
     def CreateCard(self,dirname,write=True):
         # using an existing card
@@ -456,15 +572,47 @@ class RecastConfiguration:
         else:
             return thecard
 
-    def UpdatePADMain(self,analysislist,PADdir):
-        ## backuping the main file
+    def GetPADOverlay(self,PADdir,dirname):
+        ## private build directory of the job for a given PAD version
+        return os.path.normpath(dirname+'/PADBuild/'+os.path.basename(os.path.normpath(PADdir)))
+
+    def CreatePADOverlay(self,PADdir,workdir):
+        ## The overlay mirrors the PAD build directory with symbolic links
+        ## (sources, headers, compiled analyses, Makefile). Only the main
+        ## program, the executable, the input list and the outputs are
+        ## private, so that the installed PAD is never modified
+        private = ['Main/main.cpp','Main/main.bak','Main/main.o','MadAnalysis5job']
+        try:
+            for folder in ['Input','Output']:
+                if not os.path.isdir(workdir+'/'+folder):
+                    os.makedirs(workdir+'/'+folder)
+            for root, dirs, files in os.walk(PADdir+'/Build'):
+                relative = os.path.relpath(root,PADdir+'/Build')
+                target   = os.path.normpath(workdir+'/Build/'+relative)
+                if not os.path.isdir(target):
+                    os.makedirs(target)
+                for item in files:
+                    name = os.path.normpath(relative+'/'+item)
+                    if name in private or item.endswith('.log') or \
+                       os.path.lexists(target+'/'+item):
+                        continue
+                    os.symlink(os.path.abspath(root+'/'+item),target+'/'+item)
+        except Exception as err:
+            self.logger.error('Impossible to create the private PAD build directory '+workdir)
+            self.logger.debug(str(err))
+            return False
+        return True
+
+    def UpdatePADMain(self,analysislist,PADdir,workdir):
+        ## template: main file of the installed PAD (main.bak is the
+        ## original file left by older versions which edited it in place)
         self.logger.info("   Updating the PAD main executable")
+        template = PADdir+'/Build/Main/main.cpp'
         if os.path.isfile(PADdir+'/Build/Main/main.bak'):
-            shutil.move(PADdir+'/Build/Main/main.bak',PADdir+'/Build/Main/main.cpp')
-        shutil.move(PADdir+'/Build/Main/main.cpp',PADdir+'/Build/Main/main.bak')
-        ## creating the main file with the desired analyses inside
-        mainfile = open(PADdir+"/Build/Main/main.bak",'r')
-        newfile  = open(PADdir+"/Build/Main/main.cpp",'w')
+            template = PADdir+'/Build/Main/main.bak'
+        ## creating the private main file with the desired analyses inside
+        mainfile = open(template,'r')
+        newfile  = open(workdir+"/Build/Main/main.cpp",'w')
         ignore = False
         for line in mainfile:
             if '// Getting pointer to the analyzer' in line:
@@ -491,24 +639,43 @@ class RecastConfiguration:
         newfile.close()
         return True
 
-    def RestorePADMain(self,PADdir,dirname,main):
-        self.logger.info('   Restoring the PAD in '+PADdir)
-        ## Restoring the main file
-        shutil.move(PADdir+'/Build/Main/main.bak',PADdir+'/Build/Main/main.cpp')
-        self.MakePAD(PADdir,dirname,main,True)
-        return True
+    def PreparePAD(self,PADdir,dirname,main,analysislist):
+        ## The PAD executable only depends on the list of analyses:
+        ## it is compiled once and reused for all the datasets (and cards)
+        workdir = self.GetPADOverlay(PADdir,dirname)
+        key = ' '.join(sorted(analysislist))
+        if self.padbuilds.get(PADdir,None)==key and \
+           os.path.isfile(workdir+'/Build/MadAnalysis5job'):
+            self.logger.info('   Reusing the PAD already compiled in '+workdir)
+            return True
+        start = time.time()
+        if not self.CreatePADOverlay(PADdir,workdir):
+            return False
+        if not self.UpdatePADMain(analysislist,PADdir,workdir):
+            return False
+        self.padbuilds[PADdir]=''
+        result = self.MakePAD(workdir,dirname,main)
+        if result:
+            self.padbuilds[PADdir]=key
+        self.AddTiming('PAD compilation',time.time()-start)
+        return result
+
+    def CleanPADOverlays(self,dirname):
+        ## Removing the private build directories of the job
+        self.padbuilds = {}
+        return FolderWriter.RemoveDirectory(os.path.normpath(dirname+'/PADBuild'))
 
     def MakePAD(self,PADdir,dirname,main,silent=False):
         if not silent:
             self.logger.info('   Compiling the PAD in '+PADdir)
         compiler = LibraryWriter('lib',main)
         ncores = compiler.get_ncores2()
+        command = ['make']
         if ncores>1:
-            strcores='-j'+str(ncores)
-        command = ['make',strcores]
+            command.append('-j'+str(ncores))
         logfile = PADdir+'/Build/PADcompilation.log'
         result, out = ShellCommand.ExecuteWithLog(command,logfile,PADdir+'/Build')
-        if not result:
+        if not result or not os.path.isfile(PADdir+'/Build/MadAnalysis5job'):
             self.logger.error('Impossible to compile the PAD....'+\
               ' For more details, see the log file:')
             self.logger.error(logfile)
@@ -531,6 +698,9 @@ class RecastConfiguration:
         if not ok:
             self.logger.error('Problem with the run of the PAD on the file: '+ eventfile)
             return False
+        if not os.path.isfile(PADdir+'/Output/PADevents.list/PADevents.list.saf'):
+            self.logger.error('The run of the PAD on the file '+eventfile+' has produced no output')
+            return False
         os.remove(PADdir+'/Input/PADevents.list')
         return True
 
@@ -538,9 +708,27 @@ class RecastConfiguration:
         if not os.path.isfile(dirname+'/Output/PADevents.list.saf'):
             shutil.move(PADdir+'/Output/PADevents.list/PADevents.list.saf',dirname+'/Output/'+setname+'.saf')
         for analysis in analysislist:
+            if not os.path.isdir(PADdir+'/Output/PADevents.list/'+analysis+'_0'):
+                self.logger.error('The PAD output of the analysis '+analysis+' has not been found')
+                return False
             shutil.move(PADdir+'/Output/PADevents.list/'+analysis+'_0',dirname+'/Output/'+setname+'/'+analysis)
         return True
 
+    def AddTiming(self,phase,elapsed):
+        for item in self.timings:
+            if item[0]==phase:
+                item[1]+=elapsed
+                return
+        self.timings.append([phase,elapsed])
+
+    def DisplayTimings(self):
+        if len(self.timings)==0:
+            return
+        self.logger.info("   Time spent in the recasting phases:")
+        for phase, elapsed in self.timings:
+            self.logger.info("     - "+phase.ljust(25)+("%.1f" % elapsed)+" s")
+        self.timings = []
+
     def GetDelphesRuns(self,recastcard):
         self.delphesruns=[]
         runcard = open(recastcard,'r')
@@ -619,25 +807,28 @@ class RecastConfiguration:
                 regiondata[child.attrib["id"]] = { "nobs":nobs, "nb":nb, "deltanb":deltanb }
         return lumi, regions, regiondata
 
-    def ReadCutflow(self, dirname,regions,regiondata):
-        for reg in regions:
-            regname = CleanRegionName(reg)
-            ## getting the initial and final number of events
+    def ReadCutflowIndex(self,dirname):
+        ## initial and final sums of weights of all the region SAF files of
+        ## a cutflow directory, read in one pass: {region: [N0,Nf]} (-1 if
+        ## missing)
+        try:
+            filenames = sorted([ x for x in os.listdir(dirname) if x.endswith('.saf') ])
+        except:
+            return {}
+        index = {}
+        for filename in filenames:
+            try:
+                mysaffile = open(dirname+'/'+filename)
+                lines = mysaffile.readlines()
+                mysaffile.close()
+            except:
+                continue
             IsInitial = False
             IsCounter = False
-            N0 = 0.
-            Nf = 0.
-            ## checking if regions must be combined
-            theregs=regname.split(';')
-            for regiontocombine in theregs:
-                if not os.path.isfile(dirname+'/'+regiontocombine+'.saf'):
-                    self.logger.warning('Cannot find a cutflow for the region '+regiontocombine+' in ' + dirname)
-                    self.logger.warning('Skipping the CLs calculation.')
-                    return -1
-                mysaffile = open(dirname+'/'+regiontocombine+'.saf')
-                myN0=-1
-                myNf=-1
-                for line in mysaffile:
+            myN0=-1
+            myNf=-1
+            for line in lines:
+                if '<' in line:
                     if "<InitialCounter>" in line:
                         IsInitial = True
                         continue
@@ -650,11 +841,30 @@ class RecastConfiguration:
                     elif "</Counter>" in line:
                         IsCounter = False
                         continue
-                    if IsInitial and "sum of weights" in line and not '^2' in line:
-                        myN0 = float(line.split()[0])+float(line.split()[1])
-                    if IsCounter and "sum of weights" in line and not '^2' in line:
-                        myNf = float(line.split()[0])+float(line.split()[1])
-                mysaffile.close()
+                if (IsInitial or IsCounter) and "sum of weights" in line and not '^2' in line:
+                    words = line.split()
+                    if IsInitial:
+                        myN0 = float(words[0])+float(words[1])
+                    else:
+                        myNf = float(words[0])+float(words[1])
+            index[filename[:-4]] = [myN0,myNf]
+        return index
+
+    def ReadCutflow(self, dirname,regions,regiondata):
+        index = self.ReadCutflowIndex(dirname)
+        for reg in regions:
+            regname = CleanRegionName(reg)
+            ## getting the initial and final number of events
+            N0 = 0.
+            Nf = 0.
+            ## checking if regions must be combined
+            theregs=regname.split(';')
+            for regiontocombine in theregs:
+                if regiontocombine not in index:
+                    self.logger.warning('Cannot find a cutflow for the region '+regiontocombine+' in ' + dirname)
+                    self.logger.warning('Skipping the CLs calculation.')
+                    return -1
+                myN0, myNf = index[regiontocombine]
                 if myNf==-1 or myN0==-1:
                     self.logger.warning('Invalid cutflow for the region ' + reg +'('+regname+') in ' + dirname)
                     self.logger.warning('Skipping the CLs calculation.')
@@ -670,71 +880,59 @@ class RecastConfiguration:
         return regiondata
 
 
-    def ComputesigCLs(self,regiondata,regions,lumi,tag):
-        for reg in regions:
-            nb      = regiondata[reg]["nb"]
-            if tag == "obs":
-                nobs    = regiondata[reg]["nobs"]
-            elif tag == "exp":
-                nobs    = regiondata[reg]["nb"]
-            deltanb = regiondata[reg]["deltanb"]
-            def GetSig95(xsection):
-                if regiondata[reg]["Nf"]<=0:
-                    return 0
-                nsignal=xsection * lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
-                return CLs(nobs,nb,deltanb,nsignal,self.CLs_numofexps)-0.95
-            nslow = lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
-            nshig = lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
-            if nslow <= 0 and nshig <= 0:
-                if tag == "obs":
-                    regiondata[reg]["s95obs"]="-1"
-                elif tag == "exp":
-                    regiondata[reg]["s95exp"]="-1"
-                continue
-            low = 1.
-            hig = 1.
-            while CLs(nobs,nb,deltanb,nslow,self.CLs_numofexps)>0.95:
-                self.logger.debug('region ' + reg + ', lower bound = ' + str(low))
-                nslow=nslow*0.1
-                low  =  low*0.1
-            while CLs(nobs,nb,deltanb,nshig,self.CLs_numofexps)<0.95:
-                self.logger.debug('region ' + reg + ', upper bound = ' + str(hig))
-                nshig=nshig*10.
-                hig  =  hig*10.
-            ## testing whether scipy is there
-            try:
-                import scipy.stats
-            except ImportError:
-                self.logger.warning('scipy is not installed... the CLs module cannot be used.')
-                self.logger.warning('Please install scipy.')
-                return False
-            try:
-                s95 = scipy.optimize.brentq(GetSig95,low,hig,xtol=low/100.)
-            except:
-                s95=-1
-            self.logger.debug('region ' + reg + ', s95 = ' + str(s95) + ' pb')
-            if tag == "obs":
-                regiondata[reg]["s95obs"]= ("%.7f" % s95)
-            elif tag == "exp":
-                regiondata[reg]["s95exp"]= ("%.7f" % s95)
+    def GetCLsTask(self,regiondata,reg,lumi,tag,method="",analysis="",xsection=0):
+        ## arguments of the CLs calculation of a region ('cls' when a cross
+        ## section is given, 'sig95' otherwise)
+        if method=="":
+            method = self.CLs_method
+        nb      = regiondata[reg]["nb"]
+        deltanb = regiondata[reg]["deltanb"]
+        if tag == "exp":
+            nobs = regiondata[reg]["nb"]
+        else:
+            nobs = regiondata[reg]["nobs"]
+        nsignal = lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
+        if tag == "scan":
+            ## one batch for all the cross sections, with the toys of the
+            ## single cross-section CLs
+            nsignals = [ xs*nsignal for xs in self.xsection_scan ]
+            return ['scan', [nobs,nb,deltanb,nsignals,method,self.CLs_numofexps,CLsTaskSeed(analysis,reg,"CLs")]]
+        seed    = CLsTaskSeed(analysis,reg,tag)
+        if xsection>0:
+            return ['cls', [nobs,nb,deltanb,xsection*nsignal,method,self.CLs_numofexps,seed]]
+        return ['sig95', [nobs,nb,deltanb,nsignal,method,self.CLs_numofexps,seed,reg]]
+
+    def ComputesigCLs(self,regiondata,regions,lumi,tag,method="",analysis=""):
+        ## testing whether numpy and scipy are there
+        if not CLsCalculator.IsAvailable():
+            return False
+        tasks = [ self.GetCLsTask(regiondata,reg,lumi,tag,method,analysis) for reg in regions ]
+        results = self.RunCLsTasks(tasks,[],1)
+        for i in range(len(regions)):
+            if tag in ["exp","obs"]:
+                regiondata[regions[i]]["s95"+tag]        = results[i][0]
+                regiondata[regions[i]]["s95"+tag+"_err"] = results[i][1]
         return regiondata
 
-    def ComputeCLs(self,regiondata,regions,xsection,lumi):
+    def ComputeCLs(self,regiondata,regions,xsection,lumi,method="",analysis="",clsvalues={}):
+        ## testing whether numpy and scipy are there
+        if not CLsCalculator.IsAvailable():
+            return False
         ## computing fi a region belongs to the best expected ones, and derive the CLs in all cases
         bestreg=[]
         rMax = -1
         for reg in regions:
             nsignal = xsection * lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
-            nb      = regiondata[reg]["nb"]
-            nobs    = regiondata[reg]["nobs"]
-            deltanb = regiondata[reg]["deltanb"]
             if nsignal<=0:
                 rSR   = -1
                 myCLs = 0
             else:
                 n95     = float(regiondata[reg]["s95exp"]) * lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
                 rSR     = nsignal/n95
-                myCLs   = CLs(nobs, nb, deltanb, nsignal, self.CLs_numofexps)
+                if reg in clsvalues:
+                    myCLs = clsvalues[reg]
+                else:
+                    myCLs = self.RunCLsTasks([self.GetCLsTask(regiondata,reg,lumi,"CLs",method,analysis,xsection)],[],1)[0]
             regiondata[reg]["rSR"] = rSR
             regiondata[reg]["CLs"]     = myCLs
             if rSR > rMax:
@@ -747,6 +945,99 @@ class RecastConfiguration:
                 regiondata[reg]["best"]=0
         return regiondata
 
+    def RunCLsTasks(self,tasks,labels,ncores):
+        ## CLs tasks of all the analyses and regions, dispatched to a pool
+        ## of processes; one progress line per analysis once it is complete.
+        ## The limits already known (on-disk cache) are not computed again
+        outputs = [None]*len(tasks)
+        jobs    = []
+        for i in range(len(tasks)):
+            kind, args = tasks[i]
+            if kind=='sig95':
+                nobs, nb, deltanb, nsignal, method, ntoys, seed, label = args
+                if nsignal<=0:
+                    outputs[i] = FormatSig95(None,nsignal)
+                    continue
+                key = CLsCache.Key(nobs,nb,deltanb,method,ntoys,seed)
+                if self.clscache is not None and self.clscache.Find(key):
+                    outputs[i] = FormatSig95(self.clscache.Get(key),nsignal)
+                    continue
+                jobs.append([i,['n95',[nobs,nb,deltanb,method,ntoys,seed,label]]])
+            else:
+                jobs.append([i,tasks[i]])
+        remaining = {}
+        for label in labels:
+            remaining[label] = remaining.get(label,0)+1
+        for i in range(len(labels)):
+            if outputs[i] is not None:
+                remaining[labels[i]] -= 1
+                if remaining[labels[i]]==0:
+                    self.logger.info('     - analysis '+labels[i]+': CLs computed (cached)')
+        if ncores>1 and len(jobs)>1:
+            import multiprocessing
+            pool    = multiprocessing.Pool(min(ncores,len(jobs)))
+            results = pool.imap(RunCLsTask,[ x[1] for x in jobs ])
+        else:
+            pool    = None
+            results = itertools.imap(RunCLsTask,[ x[1] for x in jobs ])
+        try:
+            for j, result in enumerate(results):
+                i = jobs[j][0]
+                kind, args = tasks[i]
+                if kind=='sig95':
+                    nobs, nb, deltanb, nsignal, method, ntoys, seed, label = args
+                    if self.clscache is not None:
+                        self.clscache.Set(CLsCache.Key(nobs,nb,deltanb,method,ntoys,seed),result)
+                    result = FormatSig95(result,nsignal)
+                outputs[i] = result
+                if i<len(labels):
+                    remaining[labels[i]] -= 1
+                    if remaining[labels[i]]==0:
+                        self.logger.info('     - analysis '+labels[i]+': CLs computed')
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        return outputs
+
+    def WriteCLsComparison(self,dirname,setname,analysis,regions,toys,asymptotic,xsflag):
+        ## relative difference between the two methods, region by region
+        def RelativeDifference(ref,new):
+            try:
+                ref = float(ref)
+                new = float(new)
+            except:
+                return '-'
+            if ref<=0 or new<=0:
+                return '-'
+            return "%.4f" % ((new-ref)/ref)
+        filename = dirname+'/Output/'+setname+'/CLs_method_comparison.dat'
+        if os.path.isfile(filename):
+            output = open(filename,'a')
+        else:
+            output = open(filename,'w')
+            output.write("# analysis name".ljust(30,' ') + "signal region".ljust(50,' ') + \
+              'sig95(exp) toys'.ljust(18,' ') + 'asymptotic'.ljust(15,' ') + 'rel. diff.'.ljust(12,' ') + \
+              'sig95(obs) toys'.ljust(18,' ') + 'asymptotic'.ljust(15,' ') + 'rel. diff.'.ljust(12,' ') + \
+              'CLs toys'.ljust(12,' ') + 'asymptotic'.ljust(12,' ') + '\n')
+        maxdiff = 0.
+        for reg in regions:
+            diffexp = RelativeDifference(toys[reg]["s95exp"],asymptotic[reg]["s95exp"])
+            diffobs = RelativeDifference(toys[reg]["s95obs"],asymptotic[reg]["s95obs"])
+            for diff in [diffexp,diffobs]:
+                if diff!='-':
+                    maxdiff = max(maxdiff,abs(float(diff)))
+            line = analysis.ljust(30,' ') + reg.ljust(50,' ') + \
+              toys[reg]["s95exp"].ljust(18,' ') + asymptotic[reg]["s95exp"].ljust(15,' ') + diffexp.ljust(12,' ') + \
+              toys[reg]["s95obs"].ljust(18,' ') + asymptotic[reg]["s95obs"].ljust(15,' ') + diffobs.ljust(12,' ')
+            if not xsflag:
+                line += ("%.7f" % toys[reg]["CLs"]).ljust(12,' ') + ("%.7f" % asymptotic[reg]["CLs"]).ljust(12,' ')
+            output.write(line.rstrip()+'\n')
+        output.close()
+        self.logger.info('   '+analysis+': largest relative difference between the toy and '+\
+                         'asymptotic sig95 = '+("%.1f" % (100.*maxdiff))+'%')
+        return True
+
     def WriteCLs(self, dirname, analysis, regions,regiondata, summary, xsflag):
         for reg in regions:
             eff    = (regiondata[reg]["Nf"] / regiondata[reg]["N0"])
@@ -760,20 +1051,61 @@ class RecastConfiguration:
             mytot  = "%.7f" % (math.sqrt(stat**2+syst**2))
             myxsexp = regiondata[reg]["s95exp"]
             myxsobs = regiondata[reg]["s95obs"]
+            ## numerical uncertainties of the limits (toy statistics and interpolation)
+            myerrexp = regiondata[reg]["s95exp_err"]
+            myerrobs = regiondata[reg]["s95obs_err"]
             if not xsflag:
                 mycls  = "%.7f" % regiondata[reg]["CLs"]
                 summary.write(analysis.ljust(30,' ') + reg.ljust(50,' ') +\
                    str(regiondata[reg]["best"]).ljust(10, ' ') +\
-                   myxsexp.ljust(15,' ') + myxsobs.ljust(15,' ') + mycls.ljust(10,' ') + \
+                   myxsexp.ljust(15,' ') + myerrexp.ljust(12,' ') + myxsobs.ljust(15,' ') + \
+                   myerrobs.ljust(12,' ') + mycls.ljust(10,' ') + \
                    ' ||    ' + myeff.ljust(15,' ') + mystat.ljust(15,' ') + mysyst.ljust(15, ' ') +\
                    mytot.ljust(15,' ') + '\n')
             else:
                 summary.write(analysis.ljust(30,' ') + reg.ljust(50,' ') +\
-                   myxsexp.ljust(15,' ') + myxsobs.ljust(15,' ') + \
-                   ' ||    ' + myeff.ljust(15,' ') + mystat.ljust(15,' ') + mysyst.ljust(15, ' ') +\
+                   myxsexp.ljust(15,' ') + myerrexp.ljust(12,' ') + myxsobs.ljust(15,' ') + \
+                   myerrobs.ljust(12,' ') + ' ||    ' + myeff.ljust(15,' ') + mystat.ljust(15,' ') + mysyst.ljust(15, ' ') +\
                    mytot.ljust(15,' ') + '\n')
 
-    def GetCLs(self,PADdir, dirname, analysislist, name,  xsection, setname):
+    def WriteCLsScan(self,dirname,setname,analysis,regions,regiondata,scanvalues):
+        ## the efficiencies do not depend on the cross section: rSR = xs/s95exp
+        ## and the best region is the same for all the points of the scan
+        best = ""
+        rMax = -1
+        for reg in regions:
+            s95 = float(regiondata[reg]["s95exp"])
+            if regiondata[reg]["Nf"]<=0 or s95<=0:
+                continue
+            if 1./s95 > rMax:
+                best = reg
+                rMax = 1./s95
+        filename = dirname+'/Output/'+setname+'/'+analysis+'/CLs_scan.dat'
+        try:
+            output = open(filename,'w')
+        except:
+            self.logger.error('impossible to write the file '+filename)
+            return False
+        output.write("# xsection [pb]".ljust(20,' ') + "signal region".ljust(50,' ') + "best?".ljust(10,' ') + \
+                     'rSR'.ljust(15,' ') + 'CLs'.ljust(15,' ') + '\n')
+        for i in range(len(self.xsection_scan)):
+            xsection = self.xsection_scan[i]
+            for reg in regions:
+                s95 = float(regiondata[reg]["s95exp"])
+                if regiondata[reg]["Nf"]<=0 or s95<=0:
+                    rSR = -1
+                else:
+                    rSR = xsection/s95
+                output.write(("%.7e" % xsection).ljust(20,' ') + reg.ljust(50,' ') + \
+                             str(int(reg==best)).ljust(10,' ') + ("%.7f" % rSR).ljust(15,' ') + \
+                             ("%.7f" % scanvalues[reg][i]).ljust(15,' ') + '\n')
+            output.write('\n')
+        output.close()
+        self.logger.info('   '+analysis+': CLs of the '+str(len(self.xsection_scan))+\
+                         ' cross sections of the scan written')
+        return True
+
+    def GetCLs(self,PADdir, dirname, analysislist, name,  xsection, setname, ncores=1):
         self.logger.info('   Calculation of the exclusion CLs')
         if xsection<=0:
             self.logger.info('   Signal xsection not defined. The 95% excluded xsection will be calculated.')
@@ -785,6 +1117,8 @@ class RecastConfiguration:
             except:
                 self.logger.warning('lxml or xml not available... the CLs module cannot be used')
                 return False
+        if not CLsCalculator.IsAvailable():
+            return False
         ## preparing the output file
         if os.path.isfile(dirname+'/Output/'+setname+'/CLs_output.dat'):
             mysummary=open(dirname+'/Output/'+setname+'/CLs_output.dat','a')
@@ -792,15 +1126,18 @@ class RecastConfiguration:
             mysummary=open(dirname+'/Output/'+setname+'/CLs_output.dat','w')
             if xsection <=0:
                 mysummary.write("# analysis name".ljust(30, ' ') + "signal region".ljust(50,' ') + \
-                 'sig95(exp)'.ljust(15, ' ') + 'sig95(obs)'.ljust(15, ' ') +' ||    ' + 'efficiency'.ljust(15,' ') +\
+                 'sig95(exp)'.ljust(15, ' ') + 'num. unc.'.ljust(12,' ') + 'sig95(obs)'.ljust(15, ' ') +\
+                 'num. unc.'.ljust(12,' ') + ' ||    ' + 'efficiency'.ljust(15,' ') +\
                  "stat. unc.".ljust(15,' ') + "syst. unc.".ljust(15," ") + "tot. unc.".ljust(15," ") + '\n')
 
             else:
                 mysummary.write("# analysis name".ljust(30, ' ') + "signal region".ljust(50,' ') + \
-                 "best?".ljust(10,' ') + 'sig95(exp)'.ljust(15,' ') + 'sig95(obs)'.ljust(15, ' ') +\
+                 "best?".ljust(10,' ') + 'sig95(exp)'.ljust(15,' ') + 'num. unc.'.ljust(12,' ') +\
+                 'sig95(obs)'.ljust(15, ' ') + 'num. unc.'.ljust(12,' ') +\
                  'CLs'.ljust(10,' ') + ' ||    ' + 'efficiency'.ljust(15,' ') +\
                  "stat. unc.".ljust(15,' ') + "syst. unc.".ljust(15," ") + "tot. unc.".ljust(15," ") + '\n')
-        ## running over all analysis
+        ## reading the info files and the cutflows of all the analyses
+        inputs = []
         for analysis in analysislist:
             ## Reading the info file
             if not os.path.isfile(PADdir+'/Build/SampleAnalyzer/User/Analyzer/'+analysis+'.info'):
@@ -822,16 +1159,67 @@ class RecastConfiguration:
             if regiondata==-1:
                 self.logger.warning('Info file for '+analysis+' corrupted. Skipping the CLs calculation.')
                 return False
-            ## performing the calculation
-            regiondata=self.ComputesigCLs(regiondata,regions,lumi,"exp")
-            regiondata=self.ComputesigCLs(regiondata,regions,lumi,"obs")
+            inputs.append([analysis,lumi,regions,regiondata])
+
+        ## performing the calculation: all the regions of all the analyses
+        ## are independent
+        tasks  = []
+        labels = []
+        keys   = []
+        for analysis, lumi, regions, regiondata in inputs:
+            for reg in regions:
+                for tag in ["exp","obs"]:
+                    tasks.append(self.GetCLsTask(regiondata,reg,lumi,tag,"",analysis))
+                    labels.append(analysis)
+                    keys.append([reg,tag])
+                if xsection>0:
+                    tasks.append(self.GetCLsTask(regiondata,reg,lumi,"CLs","",analysis,xsection))
+                    labels.append(analysis)
+                    keys.append([reg,"CLs"])
+                if len(self.xsection_scan)!=0:
+                    tasks.append(self.GetCLsTask(regiondata,reg,lumi,"scan","",analysis))
+                    labels.append(analysis)
+                    keys.append([reg,"scan"])
+        self.clscache = CLsCache(os.path.normpath(os.path.dirname(os.path.normpath(PADdir))+\
+                                 '/tools/CLsCache.ma5'))
+        results = self.RunCLsTasks(tasks,labels,ncores)
+
+        ## running over all analysis
+        index = 0
+        for analysis, lumi, regions, regiondata in inputs:
+            clsvalues  = {}
+            scanvalues = {}
+            while index<len(keys) and labels[index]==analysis:
+                reg, tag = keys[index]
+                if tag=="CLs":
+                    clsvalues[reg] = results[index]
+                elif tag=="scan":
+                    scanvalues[reg] = results[index]
+                else:
+                    regiondata[reg]["s95"+tag]        = results[index][0]
+                    regiondata[reg]["s95"+tag+"_err"] = results[index][1]
+                index += 1
             xsflag=True
             if xsection >0:
                 xsflag=False
-                regiondata=self.ComputeCLs(regiondata,regions,xsection,lumi)
+                regiondata=self.ComputeCLs(regiondata,regions,xsection,lumi,"",analysis,clsvalues)
             ## writing the output file
             self.WriteCLs(dirname,analysis,regions, regiondata,mysummary,xsflag)
             mysummary.write('\n')
+            ## CLs of all the cross sections of the scan
+            if len(self.xsection_scan)!=0:
+                self.WriteCLsScan(dirname,name,analysis,regions,regiondata,scanvalues)
+            ## validation of the asymptotic formulae against the toys
+            if self.CLs_method=="compare":
+                asymptotic = copy.deepcopy(regiondata)
+                asymptotic = self.ComputesigCLs(asymptotic,regions,lumi,"exp","asymptotic",analysis)
+                asymptotic = self.ComputesigCLs(asymptotic,regions,lumi,"obs","asymptotic",analysis)
+                if not xsflag:
+                    asymptotic = self.ComputeCLs(asymptotic,regions,xsection,lumi,"asymptotic",analysis)
+                self.WriteCLsComparison(dirname,setname,analysis,regions,regiondata,asymptotic,xsflag)
+
+        ## limits of this run (including the asymptotic ones of the comparison)
+        self.clscache.Save()
 
         ## closing the output file
         mysummary.close()
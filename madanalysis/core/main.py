@@ -55,10 +55,13 @@ class Main():
     userVariables = { "currentdir"      : [], \
                       "normalize"       : ["none","lumi","lumi_weight"], \
                       "graphic_render"  : ["root","matplotlib","none"], \
+                      "matplotlib_scripts" : ["on","off"], \
                       "lumi"            : [], \
                       "stacking_method" : ["stack","superimpose","normalize2one"], \
                       "outputfile"      : ['"output.lhe.gz"','"output.lhco.gz"'],\
-                      "recast"          : ["on", "off"] \
+                      "recast"          : ["on", "off"], \
+                      "ncores"          : [], \
+                      "nshards"         : [] \
                       }
 
     forced = False
@@ -86,6 +89,8 @@ class Main():
         self.madgraph       = MadGraphInterface()
         self.logger         = logging.getLogger('MA5')
         self.redirectSAlogger = False
+        self.ncores         = 0
+        self.nshards        = 1
 
 
     def ResetParameters(self):
@@ -100,6 +105,7 @@ class Main():
         self.isolation      = IsolationConfiguration()
         self.output         = ""
         self.graphic_render = GraphicRenderType.NONE
+        self.matplotlib_scripts = False
         if self.mode==MA5RunningType.RECO:
             self.normalize = NormalizeType.NONE
         else:
@@ -201,9 +207,12 @@ class Main():
         self.logger.info(" *********************************" )
         self.user_DisplayParameter("currentdir")
         self.user_DisplayParameter("graphic_render")
+        self.user_DisplayParameter("matplotlib_scripts")
         self.user_DisplayParameter("normalize")
         self.user_DisplayParameter("lumi")
         self.user_DisplayParameter("outputfile")
+        self.user_DisplayParameter("ncores")
+        self.user_DisplayParameter("nshards")
         self.fom.Display()
         self.logger.info(" *********************************" )
         allowed, forbidden = self.GetSampleFormat()
@@ -252,6 +261,11 @@ class Main():
             elif self.graphic_render==GraphicRenderType.MATPLOTLIB:
                 word="matplotlib"
             self.logger.info(" graphic renderer = " + word)
+        elif parameter=="matplotlib_scripts":
+            word="off"
+            if self.matplotlib_scripts:
+                word="on"
+            self.logger.info(" standalone matplotlib scripts exported = " + word)
         elif parameter=="outputfile":
             if self.output=="":
                 msg="none"
@@ -262,6 +276,14 @@ class Main():
             self.logger.info(" integrated luminosity = "+str(self.lumi)+" fb^{-1}" )
         elif parameter=="recast":
             self.logger.info(' Recasting mode = "' + self.recasting.status + '"')
+        elif parameter=="ncores":
+            if self.ncores==0:
+                msg="auto ("+str(self.GetNCores())+")"
+            else:
+                msg=str(self.ncores)
+            self.logger.info(" number of cores for compiling and running SampleAnalyzer = "+msg)
+        elif parameter=="nshards":
+            self.logger.info(" number of runs each dataset is split into = "+str(self.nshards))
         else:
             self.logger.error("'main' has no parameter called '"+parameter+"'")
 
@@ -327,6 +349,16 @@ class Main():
                 self.logger.error("'graphic_render' possible values are : 'none', 'root', 'matplotlib'")
                 return False
 
+        # matplotlib_scripts
+        elif parameter=="matplotlib_scripts":
+            if value == "on":
+                self.matplotlib_scripts = True
+            elif value == "off":
+                self.matplotlib_scripts = False
+            else:
+                self.logger.error("'matplotlib_scripts' possible values are : 'on', 'off'")
+                return False
+
         # lumi
         elif (parameter=="lumi"):
             try:
@@ -385,11 +417,43 @@ class Main():
                               ".lhe .lhe.gz .lhco .lhco.gz")
                 return False
 
+        # ncores
+        elif (parameter=="ncores"):
+            try:
+                tmp = int(value)
+            except:
+                self.logger.error("'ncores' is a positive integer value (0 = all the available cores)")
+                return False
+            if (tmp>=0):
+                self.ncores=tmp
+            else:
+                self.logger.error("'ncores' is a positive integer value (0 = all the available cores)")
+                return False
+
+        # nshards
+        elif (parameter=="nshards"):
+            try:
+                tmp = int(value)
+            except:
+                self.logger.error("'nshards' is a strictly positive integer value")
+                return False
+            if (tmp>0):
+                self.nshards=tmp
+            else:
+                self.logger.error("'nshards' is a strictly positive integer value")
+                return False
+
         # other
         else:
             self.logger.error("'main' has no parameter called '"+parameter+"'")
 
 
+    def GetNCores(self):
+        if self.ncores>0:
+            return self.ncores
+        return max(1,self.archi_info.ncores)
+
+
     def get_currentdir(self):
         return os.getcwd()
 
@@ -524,6 +588,7 @@ class Main():
         if self.archi_info.has_root:
             libraries.append(['Root', 'interface to Root', 'root', self.archi_info.ma5dir+'/tools/SampleAnalyzer/Lib/libroot_for_ma5.so',self.archi_info.ma5dir+'/tools/SampleAnalyzer/Interfaces',False])
             libraries.append(['test_root','interface to Root', 'test_root', self.archi_info.ma5dir+'/tools/SampleAnalyzer/Bin/TestRoot',self.archi_info.ma5dir+'/tools/SampleAnalyzer/Test/',True])
+            libraries.append(['plotter','ROOT plotter', 'plotter', self.archi_info.ma5dir+'/tools/SampleAnalyzer/Bin/ROOTPlotter',self.archi_info.ma5dir+'/tools/SampleAnalyzer/Plotter',True])
 
         # Process
         libraries.append(['process', 'SampleAnalyzer core', 'process', self.archi_info.ma5dir+'/tools/SampleAnalyzer/Lib/libprocess_for_ma5.so',self.archi_info.ma5dir+'/tools/SampleAnalyzer/Process',False])
@@ -289,12 +289,12 @@ class CmdImport(CmdBase.CmdBase):
                 return False
 
         self.logger.info("   Extracting data from the output files...")
-        for i in range(0,len(self.main.datasets)):
-            jobber.Extract(self.main.datasets[i],\
-                           layout.cutflow.detail[i],\
-                           layout.merging.detail[i],\
-                           layout.plotflow.detail[i],\
-                           False) #to Fix: False means 'no merging plots'
+        jobber.ExtractDatasets(self.main.datasets,\
+                               layout.cutflow.detail,\
+                               layout.merging.detail,\
+                               layout.plotflow.detail,\
+                               False,\
+                               self.main.GetNCores()) #to Fix: False means 'no merging plots'
         return True    
            
 
@@ -27,6 +27,9 @@ from madanalysis.IOinterface.job_writer                         import JobWriter
 from madanalysis.IOinterface.layout_writer                      import LayoutWriter
 from madanalysis.IOinterface.job_reader                         import JobReader
 from madanalysis.IOinterface.folder_writer                      import FolderWriter
+from madanalysis.IOinterface.build_cache                        import BuildCache
+from madanalysis.IOinterface.delphes_cache                      import DelphesCache
+from madanalysis.selection.instance_name                        import InstanceName
 from madanalysis.enumeration.report_format_type                 import ReportFormatType
 from madanalysis.layout.layout                                  import Layout
 from madanalysis.install.install_manager                        import InstallManager
@@ -104,56 +107,67 @@ class CmdSubmit(CmdBase):
 
         self.main.lastjob_status = False
 
-        # Checking if new plots or cuts have been performed
-        ToReAnalyze = False
-        
-        # Look for the last submit and resubmit
-        last_submit_cmd = -1
-        for i in range(len(history)-1): # Last history entry should be resubmit
-            if history[i].startswith('submit') or history[i].startswith('resubmit'):
-                last_submit_cmd = i
-
-        newhistory = []
-        if last_submit_cmd==-1:
-            ToReAnalyze = True
-        else:
-            for i in range(last_submit_cmd+1,len(history)):
-                newhistory.append(history[i])
-
-        ReAnalyzeCmdList = ['plot','select','reject','set main.clustering',
-                            'set main.merging', 'define', 'set main.recast',
-                            'import', 'set main.isolation']
+        # Without recasting, the job itself determines which datasets must be
+        # analyzed again: the sources are regenerated (unchanged sources hit
+        # the build cache) and only the datasets whose run fingerprint has
+        # changed are analyzed again (see CmdSubmit.submit)
+        if self.main.recasting.status!='on':
+            self.logger.info("   Checking the selection and the datasets for changes...")
+            if not self.submit(self.main.lastjob_name,history):
+                return
+            self.logger.info("   Updating the reports...")
 
-        # Determining if we have to resubmit the job
-        for cmd in newhistory:
+        # With recasting, checking if new plots or cuts have been performed
+        else:
+            ToReAnalyze = False
+
+            # Look for the last submit and resubmit
+            last_submit_cmd = -1
+            for i in range(len(history)-1): # Last history entry should be resubmit
+                if history[i].startswith('submit') or history[i].startswith('resubmit'):
+                    last_submit_cmd = i
+
+            newhistory = []
+            if last_submit_cmd==-1:
+                ToReAnalyze = True
+            else:
+                for i in range(last_submit_cmd+1,len(history)):
+                    newhistory.append(history[i])
+
+            ReAnalyzeCmdList = ['plot','select','reject','set main.clustering',
+                                'set main.merging', 'define', 'set main.recast',
+                                'import', 'set main.isolation']
+
+            # Determining if we have to resubmit the job
+            for cmd in newhistory:
             
-            # Split cmd line into words
-            words = cmd.split()
+                # Split cmd line into words
+                words = cmd.split()
            
-            # Creating a line with one whitespace between each word
-            cmd2 = ''
-            for word in words:
-                if word!='':
-                    cmd2+=word+' '
+                # Creating a line with one whitespace between each word
+                cmd2 = ''
+                for word in words:
+                    if word!='':
+                        cmd2+=word+' '
  
-            # Looping over patterns
-            for pattern in ReAnalyzeCmdList:
-                if cmd2.startswith(pattern): 
-                    ToReAnalyze = True
+                # Looping over patterns
+                for pattern in ReAnalyzeCmdList:
+                    if cmd2.startswith(pattern): 
+                        ToReAnalyze = True
+                        break
+
+                # Found?
+                if ToReAnalyze:
                     break
 
-            # Found?
             if ToReAnalyze:
-                break
-
-        if ToReAnalyze:
-            self.logger.info("   Creating the new histograms and/or applying the new cuts...")
-            # Submission
-            if not self.submit(self.main.lastjob_name,history):
-                return
-            self.logger.info("   Updating the reports...")
-        else:
-            self.logger.info("   No new histogram / cut to account for. Updating the reports...")
+                self.logger.info("   Creating the new histograms and/or applying the new cuts...")
+                # Submission
+                if not self.submit(self.main.lastjob_name,history):
+                    return
+                self.logger.info("   Updating the reports...")
+            else:
+                self.logger.info("   No new histogram / cut to account for. Updating the reports...")
 
         # Reading info from job output
         layout = Layout(self.main)
@@ -307,52 +321,62 @@ class CmdSubmit(CmdBase):
         if not layout.DoPlots(histopath,modes,output_paths):
             return
         
-        # Generating the HTML report
-        self.logger.info("   Generating the HMTL report ...")
-        layout.GenerateReport(history,htmlpath,ReportFormatType.HTML)
-        self.logger.info("     -> To open this HTML report, please type 'open'.")
-
-        # PDF report
-        if self.main.session_info.has_pdflatex:
+        # LaTeX reports: each compilation runs in the background
+        # while the next reports are generated
+        pdfjob = None
+        dvijob = None
+        try:
 
             # Generating the PDF report
-            self.logger.info("   Generating the PDF report ...")
-            layout.GenerateReport(history,pdfpath,ReportFormatType.PDFLATEX)
-            layout.CompileReport(ReportFormatType.PDFLATEX,pdfpath)
-
-            # Displaying message for opening PDF
-            if self.main.currentdir in pdfpath:
-                pdfpath = pdfpath[len(self.main.currentdir):]
-            if pdfpath[0]=='/':
-                pdfpath=pdfpath[1:]
-            self.logger.info("     -> To open this PDF report, please type 'open " + pdfpath + "'.")
-            
-        else:
-            self.logger.warning("pdflatex not installed -> no PDF report.")
-
-        # DVI/PDF report
-        if self.main.session_info.has_latex:
-
-            # Warning message for DVI -> PDF
-            self.logger.info("   Generating the DVI report ...")
-#            if not self.main.session_info.has_dvipdf:
-#               self.logger.warning("dvipdf not installed -> the DVI report will not be converted to a PDF file.")
+            if self.main.session_info.has_pdflatex:
+                self.logger.info("   Generating the PDF report ...")
+                layout.GenerateReport(history,pdfpath,ReportFormatType.PDFLATEX)
+                pdfjob = layout.LaunchReport(ReportFormatType.PDFLATEX,pdfpath)
+            else:
+                self.logger.warning("pdflatex not installed -> no PDF report.")
 
             # Generating the DVI report
-            layout.GenerateReport(history,dvipath,ReportFormatType.LATEX)
-            layout.CompileReport(ReportFormatType.LATEX,dvipath)
+            if self.main.session_info.has_latex:
+                self.logger.info("   Generating the DVI report ...")
+#                if not self.main.session_info.has_dvipdf:
+#                   self.logger.warning("dvipdf not installed -> the DVI report will not be converted to a PDF file.")
+                layout.GenerateReport(history,dvipath,ReportFormatType.LATEX)
+                dvijob = layout.LaunchReport(ReportFormatType.LATEX,dvipath)
+            else:
+                self.logger.warning("latex not installed -> no DVI/PDF report.")
+
+            # Generating the HTML report
+            self.logger.info("   Generating the HMTL report ...")
+            layout.GenerateReport(history,htmlpath,ReportFormatType.HTML)
+            self.logger.info("     -> To open this HTML report, please type 'open'.")
+
+            # Waiting for the LaTeX compilations
+            if pdfjob!=None or dvijob!=None:
+                self.logger.info("   Compiling the LaTeX reports ...")
+                layout.FinishReports([pdfjob,dvijob])
 
-            # Displaying message for opening DVI
-            if self.main.session_info.has_dvipdf:
-                pdfpath = os.path.expanduser(args[0]+'/DVI')
+            # Displaying message for opening PDF
+            if pdfjob!=None:
                 if self.main.currentdir in pdfpath:
                     pdfpath = pdfpath[len(self.main.currentdir):]
                 if pdfpath[0]=='/':
                     pdfpath=pdfpath[1:]
-                self.logger.info("     -> To open the corresponding Latex file, please type 'open " + pdfpath + "'.")
-                
-        else:
-            self.logger.warning("latex not installed -> no DVI/PDF report.")
+                self.logger.info("     -> To open this PDF report, please type 'open " + pdfpath + "'.")
+
+            # Displaying message for opening DVI
+            if dvijob!=None:
+                if self.main.session_info.has_dvipdf:
+                    pdfpath = os.path.expanduser(args[0]+'/DVI')
+                    if self.main.currentdir in pdfpath:
+                        pdfpath = pdfpath[len(self.main.currentdir):]
+                    if pdfpath[0]=='/':
+                        pdfpath=pdfpath[1:]
+                    self.logger.info("     -> To open the corresponding Latex file, please type 'open " + pdfpath + "'.")
+
+        # Stopping the compilers still running (error or keyboard interruption)
+        finally:
+            layout.CancelReport(pdfjob)
+            layout.CancelReport(dvijob)
 
 
 
@@ -390,7 +414,7 @@ class CmdSubmit(CmdBase):
         else:
             os.system(self.main.session_info.editor+" "+dirname+"/Input/recasting_card.dat")
 
-    def submit(self,dirname,history):
+    def submit(self,dirname,history,subset=None,callback=None,pool=None):
         # checking if the needed version of delphes is activated
         forced_bkp = self.main.forced
         self.main.forced=True
@@ -447,13 +471,18 @@ class CmdSubmit(CmdBase):
             ### Second, which delphes run must be performed, and running them
             if not self.main.recasting.GetDelphesRuns(dirname+"/Input/recasting_card.dat"):
                 return False
-            firstv11 = True
-            firstv13 = True
             forced_bkp = self.main.forced
             self.main.forced=True
             if len(self.main.recasting.delphesruns)==0:
                 self.logger.warning('No recasting to do... Please check the recasting card')
                 return False
+            self.main.recasting.timings = []
+            self.main.recasting.padbuilds = {}
+            start = time.time()
+            ## cards of each Delphes version: all the simulations of a version
+            ## are run together
+            v11cards = []
+            v13cards = []
             for mydelphescard in sorted(self.main.recasting.delphesruns):
                 version=mydelphescard[:4]
                 card=mydelphescard[5:]
@@ -461,82 +490,55 @@ class CmdSubmit(CmdBase):
                     if not self.main.recasting.ma5tune:
                         self.logger.error('The DelphesMA5tune library is not present... v1.1 analyses cannot be used')
                         return False
-
-                    if firstv11:
-                        self.logger.info("   **********************************************************")
-                        self.logger.info("   "+StringTools.Center('v1.1 detector simulations',57))
-                        self.logger.info("   **********************************************************")
-                        firstv11=False
-
-                    ## Deactivating delphes
-                    installer=InstallManager(self.main)
-                    if not installer.Deactivate('delphes'):
-                        return False
-
-                    ## Activating and compile the MA5Tune
-                    if installer.Activate('delphesMA5tune')==-1:
-                        return False
-
-                    ## running delphesMA5tune
-                    for item in self.main.datasets:
-                        if not os.path.isfile(dirname + '/Events/' + item.name + '_v1x1_' + \
-                             card.replace('.tcl','')+'.root'):
-                            self.main.recasting.status="off"
-                            self.main.fastsim.package="delphesMA5tune"
-                            self.main.fastsim.clustering=0
-                            self.main.fastsim.delphes=0
-                            self.main.fastsim.delphesMA5tune = DelphesMA5tuneConfiguration()
-                            self.main.fastsim.delphesMA5tune.card = os.path.normpath("../../../../PADForMA5tune/Input/Cards/"+card)
-                            self.submit(dirname+'_DelphesForMa5tuneRun',[])
-                            self.main.recasting.status="on"
-                            self.main.fastsim.package="none"
-                            ## saving the output
-                            shutil.move(dirname+'_DelphesForMa5tuneRun/Output/_'+item.name+'/TheMouth.root',\
-                              dirname+'/Events/'+item.name+'_v1x1_'+card.replace('.tcl','')+'.root')
-                        if not FolderWriter.RemoveDirectory(os.path.normpath(dirname+'_DelphesForMa5tuneRun')):
-                            return False
+                    if card not in v11cards:
+                        v11cards.append(card)
                 elif version in ['v1.2', 'v1.3']:
                     if not self.main.recasting.delphes:
                         self.logger.error('The Delphes library is not present... v1.2+ analyses cannot be used')
                         return False
+                    if card not in v13cards:
+                        v13cards.append(card)
+                else:
+                    self.logger.error('An analysis can only be compatible with ma5 v1.1, v1.2 or v1.3...')
+                    return False
 
-                    if firstv13:
-                        self.logger.info("   **********************************************************")
-                        self.logger.info("   "+StringTools.Center('v1.2+ detector simulations',57))
-                        self.logger.info("   **********************************************************")
-                        firstv13=False
+            if len(v11cards)!=0:
+                self.logger.info("   **********************************************************")
+                self.logger.info("   "+StringTools.Center('v1.1 detector simulations',57))
+                self.logger.info("   **********************************************************")
 
-                    ## Deactivating delphesMA5tune
-                    installer=InstallManager(self.main)
-                    if not installer.Deactivate('delphesMA5tune'):
-                        return False
+                ## Deactivating delphes
+                installer=InstallManager(self.main)
+                if not installer.Deactivate('delphes'):
+                    return False
 
-                    ## Activating and compile Delphes
-                    if installer.Activate('delphes')==-1:
-                        return False
+                ## Activating and compile the MA5Tune
+                if installer.Activate('delphesMA5tune')==-1:
+                    return False
 
-                    ## running delphesMA5tune
-                    for item in self.main.datasets:
-                        if not os.path.isfile(dirname+'/Events/' + item.name +\
-                         '_v1x2_'+card.replace('.tcl','')+'.root'):
-                            self.main.recasting.status="off"
-                            self.main.fastsim.package="delphes"
-                            self.main.fastsim.clustering=0
-                            self.main.fastsim.delphesMA5tune=0
-                            self.main.fastsim.delphes = DelphesConfiguration()
-                            self.main.fastsim.delphes.card = os.path.normpath("../../../../PAD/Input/Cards/"+card)
-                            self.submit(dirname+'_DelphesRun',[])
-                            self.main.recasting.status="on"
-                            self.main.fastsim.package="none"
-                            ## saving the output
-                            shutil.move(dirname+'_DelphesRun/Output/_'+item.name+'/TheMouth.root',\
-                              dirname+'/Events/'+item.name+'_v1x2_'+card.replace('.tcl','')+'.root')
-                        if not FolderWriter.RemoveDirectory(os.path.normpath(dirname+'_DelphesRun')):
-                            return False
-                else:
-                    self.logger.error('An analysis can only be compatible with ma5 v1.1, v1.2 or v1.3...')
+                ## running delphesMA5tune
+                if not self.RunDelphesSimulations(dirname,'delphesMA5tune',v11cards,'v1x1'):
+                    return False
+
+            if len(v13cards)!=0:
+                self.logger.info("   **********************************************************")
+                self.logger.info("   "+StringTools.Center('v1.2+ detector simulations',57))
+                self.logger.info("   **********************************************************")
+
+                ## Deactivating delphesMA5tune
+                installer=InstallManager(self.main)
+                if not installer.Deactivate('delphesMA5tune'):
+                    return False
+
+                ## Activating and compile Delphes
+                if installer.Activate('delphes')==-1:
+                    return False
+
+                ## running delphes
+                if not self.RunDelphesSimulations(dirname,'delphes',v13cards,'v1x2'):
                     return False
             self.main.forced=forced_bkp
+            self.main.recasting.AddTiming('Delphes simulation',time.time()-start)
 
             ### Third, executing the analyses
             if not self.main.recasting.GetAnalysisRuns(dirname+"/Input/recasting_card.dat"):
@@ -587,44 +589,49 @@ class CmdSubmit(CmdBase):
                           tmpanalyses=analysislist
                           break
                 myanalyses = [ x for x in myanalyses if x in tmpanalyses]
+                ## preparing the PAD in a private build directory
+                ## (compiled once for all the datasets)
+                PADwork = self.main.recasting.GetPADOverlay(PADdir,dirname)
+                if not self.main.recasting.PreparePAD(PADdir,dirname,self.main,myanalyses):
+                    self.main.forced=forced_bkp
+                    return False
                 ## event file
                 for myset in self.main.datasets:
                     myevents=os.path.normpath(dirname + '/Events/' + myset.name + '_' +\
                        myversion.replace('.','x')+'_' + mycard.replace('.tcl','')+'.root')
-                    ## preparing and running the PAD
-                    if not self.main.recasting.UpdatePADMain(myanalyses,PADdir):
-                        self.main.forced=forced_bkp
-                        return False
-                    time.sleep(1.);
-                    if not self.main.recasting.MakePAD(PADdir,dirname,self.main):
-                        self.main.forced=forced_bkp
-                        return False
-                    time.sleep(1.);
-                    if not self.main.recasting.RunPAD(PADdir,myevents):
+                    ## running the PAD
+                    start = time.time()
+                    if not self.main.recasting.RunPAD(PADwork,myevents):
                         self.main.forced=forced_bkp
                         return False
-                    time.sleep(1.);
-                    ## Restoring the PAD as it was before
-                    if not self.main.recasting.RestorePADMain(PADdir,dirname,self.main):
-                        self.main.forced=forced_bkp
-                        return False
-                    time.sleep(1.);
+                    self.main.recasting.AddTiming('PAD runs',time.time()-start)
                     ## saving the output
-                    if not self.main.recasting.SavePADOutput(PADdir,dirname,myanalyses,myset.name):
+                    start = time.time()
+                    if not self.main.recasting.SavePADOutput(PADwork,dirname,myanalyses,myset.name):
                         self.main.forced=forced_bkp
                         return False
                     if not self.main.recasting.store_root:
-                        os.remove(os.path.normpath(dirname + '/Events/' + myset.name + '_' +\
-                       myversion.replace('.','x')+'_' + mycard.replace('.tcl','')+'.root'))
-                    time.sleep(1.);
+                        os.remove(myevents)
+                    self.main.recasting.AddTiming('PAD output saving',time.time()-start)
                     ## Running the CLs exclusion script (if available)
-                    if not self.main.recasting.GetCLs(PADdir,dirname,myanalyses,myset.name,myset.xsection,myset.name):
+                    start = time.time()
+                    if not self.main.recasting.GetCLs(PADdir,dirname,myanalyses,myset.name,myset.xsection,myset.name,\
+                                                self.main.GetNCores()):
                         self.main.forced=forced_bkp
                         return False
+                    self.main.recasting.AddTiming('CLs calculation',time.time()-start)
                     ## Saving the results
+            ## Removing the private PAD build directories
+            if not self.main.recasting.CleanPADOverlays(dirname):
+                self.main.forced=forced_bkp
+                return False
+            self.main.recasting.DisplayTimings()
             self.main.forced=forced_bkp
         else:
             self.logger.info("   Inserting your selection into 'SampleAnalyzer'...")
+            if self.resubmit and not jobber.CreateBldDir():
+                self.logger.error("job submission aborted.")
+                return False
             if not jobber.WriteSelectionHeader(self.main):
                 self.logger.error("job submission aborted.")
                 return False
@@ -634,7 +641,7 @@ class CmdSubmit(CmdBase):
 
         self.logger.info("   Writing the list of datasets...")
         for item in self.main.datasets:
-            jobber.WriteDatasetList(item)
+            jobber.WriteDatasetList(item,self.main.nshards)
 
         self.logger.info("   Writing the command line history...")
         jobber.WriteHistory(history,self.main.firstdir)
@@ -658,30 +665,185 @@ class CmdSubmit(CmdBase):
         if self.main.fastsim.package in ["delphes","delphesMA5tune"]:
             self.editDelphesCard(dirname)
 
-        if self.resubmit and not self.main.recasting.status=='on':
-            self.logger.info("   Cleaning 'SampleAnalyzer'...")
-            if not jobber.MrproperJob():
-                self.logger.error("job submission aborted.")
-                return False
-
         if not self.main.recasting.status=='on':
-            self.logger.info("   Compiling 'SampleAnalyzer'...")
-            if not jobber.CompileJob():
-                self.logger.error("job submission aborted.")
-                return False
 
-            self.logger.info("   Linking 'SampleAnalyzer'...")
-            if not jobber.LinkJob():
-                self.logger.error("job submission aborted.")
-                return False
+            # Executable already built from identical sources?
+            cache = BuildCache(self.main,dirname)
+            if cache.Restore():
+                self.logger.info("   Reusing an already compiled 'SampleAnalyzer' (identical sources)...")
+            else:
+                if self.resubmit:
+                    self.logger.info("   Cleaning 'SampleAnalyzer'...")
+                    if not jobber.MrproperJob():
+                        self.logger.error("job submission aborted.")
+                        return False
 
-            for item in self.main.datasets:
-                self.logger.info("   Running 'SampleAnalyzer' over dataset '"
-                             +item.name+"'...")
-                self.logger.info("    *******************************************************")
-                if not jobber.RunJob(item):
+                self.logger.info("   Compiling 'SampleAnalyzer'...")
+                ncores = self.main.GetNCores()
+                self.logger.info("     Number of cores used for the compilation = "+str(ncores))
+                if not jobber.CompileJob(ncores):
+                    self.logger.error("job submission aborted.")
+                    return False
+
+                self.logger.info("   Linking 'SampleAnalyzer'...")
+                if not jobber.LinkJob():
+                    self.logger.error("job submission aborted.")
+                    return False
+
+                cache.Store()
+
+            # Datasets whose inputs and selection are unchanged since the
+            # previous run are not analyzed again
+            previous     = {}
+            fingerprints = {}
+            if self.resubmit:
+                previous = jobber.ReadRunFingerprints()
+                if previous.get(JobWriter.BuildEntry,cache.key)!=cache.key:
+                    self.logger.info("   Selection modified: all the datasets are analyzed again "+\
+                                     "(one event loop fills all the histograms and cuts)")
+            fingerprints[JobWriter.BuildEntry] = cache.key
+            datasets = []
+            if subset is None:
+                subset = self.main.datasets
+            for item in subset:
+                fingerprints[item.name] = jobber.GetRunFingerprint(item,self.main.nshards,cache.key)
+                if previous.get(item.name,'')==fingerprints[item.name] and \
+                   jobber.HasRunOutput(item):
+                    self.logger.info("   Dataset '"+item.name+"' unchanged: previous results kept")
+                else:
+                    datasets.append(item)
+            if len(datasets)==0:
+                self.logger.info("   No new histogram / cut / dataset to account for.")
+                return True
+
+            # Runs left to the caller, together with the ones of other jobs
+            # (see JobWriter.RunSeveralJobs)
+            if pool is not None:
+                pool.append([jobber,datasets,callback,''])
+                return True
+
+            ncores  = self.main.GetNCores()
+            if self.main.nshards==1:
+                ncores = min(ncores,len(datasets))
+            results = jobber.RunJobs(datasets,ncores,callback,nshards=self.main.nshards)
+
+            # Status of each run
+            if ncores>1:
+                self.logger.info("   Status of the runs:")
+            for item, result in results:
+                if not result:
                     self.logger.error("run over '"+item.name+"' aborted.")
-                self.logger.info("    *******************************************************")
+                    del fingerprints[item.name]
+                elif ncores>1:
+                    self.logger.info("     - dataset '"+item.name+"': \x1b[32m[OK]\x1b[0m")
+            jobber.WriteRunFingerprints(fingerprints)
+        return True
+
+
+    def RunDelphesSimulations(self,dirname,package,cards,versiontag):
+
+        # Simulations to perform: (dataset, card) pairs whose event file has
+        # not been produced yet (event files already produced by a previous
+        # recasting are reused)
+        cache = DelphesCache(self.main,int(self.main.recasting.cache_size*1024**3))
+        runs  = []
+        for card in cards:
+            if package=='delphesMA5tune':
+                cardfile = self.main.archi_info.ma5dir+'/PADForMA5tune/Input/Cards/'+card
+            else:
+                cardfile = self.main.archi_info.ma5dir+'/PAD/Input/Cards/'+card
+            tag = card.replace('.tcl','')
+            missing = []
+            for item in self.main.datasets:
+                eventfile = dirname+'/Events/'+item.name+'_'+versiontag+'_'+tag+'.root'
+                if os.path.isfile(eventfile):
+                    continue
+                if cache.Restore(item,cardfile,package,eventfile):
+                    self.logger.info("   Delphes output of '"+item.name+"' with the card '"+card+\
+                                     "' found in the cache")
+                    continue
+                missing.append(item)
+            if len(missing)!=0:
+                runs.append([card,cardfile,tag,missing])
+        if len(runs)==0:
+            return True
+
+        # Moving the event file as soon as the simulation of a dataset is done
+        def SaveEvents(scratchdir,cardfile,tag):
+            def Save(item,result):
+                if not result:
+                    return False
+                eventfile = scratchdir+'/Output/'+InstanceName.Get(item.name)+'/TheMouth.root'
+                if not os.path.isfile(eventfile):
+                    self.logger.error("the Delphes simulation of '"+item.name+"' has produced no event file")
+                    return False
+                shutil.move(eventfile,dirname+'/Events/'+item.name+'_'+versiontag+'_'+tag+'.root')
+                cache.Store(item,cardfile,package,dirname+'/Events/'+item.name+'_'+versiontag+'_'+tag+'.root')
+                return True
+            return Save
+
+        # One scratch job for each card (the card is a setting of the job),
+        # all of them being prepared before any simulation is launched
+        self.main.recasting.status="off"
+        self.main.fastsim.package=package
+        self.main.fastsim.clustering=0
+        resubmit_bkp  = self.resubmit
+        self.resubmit = False
+        pool = []
+        scratchdirs = []
+        ok = True
+        for card, cardfile, tag, missing in runs:
+            if package=='delphesMA5tune':
+                scratchdir = dirname+'_DelphesForMa5tuneRun_'+tag
+            else:
+                scratchdir = dirname+'_DelphesRun_'+tag
+            if os.path.isdir(scratchdir) and \
+               not FolderWriter.RemoveDirectory(os.path.normpath(scratchdir)):
+                ok = False
+                break
+            scratchdirs.append(scratchdir)
+            if package=='delphesMA5tune':
+                self.main.fastsim.delphes=0
+                self.main.fastsim.delphesMA5tune = DelphesMA5tuneConfiguration()
+                self.main.fastsim.delphesMA5tune.card = os.path.normpath("../../../../PADForMA5tune/Input/Cards/"+card)
+            else:
+                self.main.fastsim.delphesMA5tune=0
+                self.main.fastsim.delphes = DelphesConfiguration()
+                self.main.fastsim.delphes.card = os.path.normpath("../../../../PAD/Input/Cards/"+card)
+            njobs = len(pool)
+            if not self.submit(scratchdir,[],missing,SaveEvents(scratchdir,cardfile,tag),pool):
+                ok = False
+                break
+            if len(pool)>njobs:
+                pool[-1][3] = "card '"+card+"'"
+
+        # A single pool of processes for all the (dataset, card) pairs
+        if ok and len(pool)!=0:
+            ncores = min(self.main.GetNCores(),sum([ len(job[1]) for job in pool ]))
+            if len(pool)==1:
+                jobber, datasets, callback, title = pool[0]
+                results = [ jobber.RunJobs(datasets,ncores,callback) ]
+            else:
+                results = JobWriter.RunSeveralJobs(pool,ncores)
+            for job in results:
+                for item, result in job:
+                    if not result:
+                        self.logger.error("run over '"+item.name+"' aborted.")
+        self.resubmit = resubmit_bkp
+        self.main.recasting.status="on"
+        self.main.fastsim.package="none"
+        if not ok:
+            return False
+
+        # Every dataset must have been simulated with every card
+        for card, cardfile, tag, missing in runs:
+            for item in missing:
+                if not os.path.isfile(dirname+'/Events/'+item.name+'_'+versiontag+'_'+tag+'.root'):
+                    self.logger.error("the Delphes simulation of '"+item.name+"' with the card '"+card+"' failed")
+                    return False
+        for scratchdir in scratchdirs:
+            if not FolderWriter.RemoveDirectory(os.path.normpath(scratchdir)):
+                return False
         return True
 
 
@@ -705,18 +867,15 @@ class CmdSubmit(CmdBase):
 
         if self.main.recasting.status!='on':
             self.logger.info("   Extracting data from the output files...")
-            for i in range(0,len(self.main.datasets)):
-                jobber.Extract(self.main.datasets[i],\
-                               layout.cutflow.detail[i],\
-                               0,\
-                               layout.plotflow.detail[i],\
-                               domerging=False)
-                if self.main.merging.enable:
-                    jobber.Extract(self.main.datasets[i],\
-                                   0,\
-                                   layout.merging.detail[i],\
-                                   0,\
-                                   domerging=True)
+            mergings = None
+            if self.main.merging.enable:
+                mergings = layout.merging.detail
+            jobber.ExtractDatasets(self.main.datasets,\
+                                   layout.cutflow.detail,\
+                                   mergings,\
+                                   layout.plotflow.detail,\
+                                   self.main.merging.enable,\
+                                   self.main.GetNCores())
         return True
 
 
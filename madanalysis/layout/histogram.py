@@ -24,6 +24,10 @@
 
 from madanalysis.layout.histogram_core import HistogramCore
 import logging
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class Histogram:
@@ -78,18 +82,30 @@ class Histogram:
         if self.summary.overflow<0:
             self.summary.overflow=0
             
-        # Data
-        data = []
-        for i in range(0,len(self.positive.array)):
-            data.append(self.positive.array[i]-self.negative.array[i])
-            if data[-1]<0:
+        # Data (numpy arrays, as filled by JobReader, if numpy is available)
+        if numpy is not None:
+            data = numpy.asarray(self.positive.array,dtype=float) - \
+                   numpy.asarray(self.negative.array,dtype=float)
+            for i in numpy.flatnonzero(data<0):
                 self.warnings.append(\
                     'dataset='+dataset.name+\
                     ' -> bin '+str(i)+\
                     ' has a negative content : '+\
-                    str(data[-1])+'. This value is set to zero')
-                data[-1]=0
-        self.summary.array = data[:] # [:] -> clone of data
+                    str(float(data[i]))+'. This value is set to zero')
+            data[data<0] = 0.
+            self.summary.array = data
+        else:
+            data = []
+            for i in range(0,len(self.positive.array)):
+                data.append(self.positive.array[i]-self.negative.array[i])
+                if data[-1]<0:
+                    self.warnings.append(\
+                        'dataset='+dataset.name+\
+                        ' -> bin '+str(i)+\
+                        ' has a negative content : '+\
+                        str(data[-1])+'. This value is set to zero')
+                    data[-1]=0
+            self.summary.array = data[:] # [:] -> clone of data
 
         # Integral
         self.positive.ComputeIntegral()
@@ -56,6 +56,9 @@ class HistogramCore:
             self.integral+=self.array[i]
         self.integral += self.overflow
         self.integral += self.underflow
+        # python float (and not numpy.float64): the scales derived from the
+        # integral are written with str() in the plot scripts
+        self.integral = float(self.integral)
         
 
     def Print(self):
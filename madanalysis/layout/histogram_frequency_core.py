@@ -39,6 +39,7 @@ class HistogramFrequencyCore:
         self.integral = 0
         for value in self.array:
             self.integral+=value
+        self.integral = float(self.integral)
 
     def Print(self):
 
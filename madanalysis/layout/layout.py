@@ -36,12 +36,17 @@ from madanalysis.IOinterface.html_report_writer        import HTMLReportWriter
 from madanalysis.IOinterface.latex_report_writer       import LATEXReportWriter
 from madanalysis.IOinterface.histo_root_producer       import HistoRootProducer
 from madanalysis.IOinterface.histo_matplotlib_producer import HistoMatplotlibProducer
+from madanalysis.IOinterface.histo_matplotlib_renderer import HistoMatplotlibRenderer
+from madanalysis.IOinterface.plot_cache                import PlotCache
 from madanalysis.layout.cutflow                        import CutFlow
 from madanalysis.layout.plotflow                       import PlotFlow
 from madanalysis.layout.merging_plots                  import MergingPlots
 from madanalysis.selection.instance_name               import InstanceName
 from math                                              import log10, floor, ceil, isnan, isinf
+from shell_command                                     import ShellCommand
 import os
+import time
+import json
 import shutil
 import logging
 
@@ -163,6 +168,10 @@ class Layout:
     def DoPlots(self,histo_path,modes,output_paths):
 
         ListPlots = []
+
+        # Same object names in the scripts from one report to the next one
+        PlotFlow.counter     = 0
+        MergingPlots.counter = 0
         
         # Header plots
         self.logger.debug('Producing scripts for header plots ...')
@@ -178,18 +187,76 @@ class Layout:
         self.logger.debug('Producing scripts for foot plots ...')
         # to do
 
+        # Images of the plots whose inputs have not changed
+        cache = PlotCache(histo_path)
+        cache.Load()
+        ToProduce = []
+
         # Launching ROOT
         if self.main.graphic_render==GraphicRenderType.ROOT:
-            producer=HistoRootProducer(histo_path,ListPlots)
-            producer.Execute()
+            for item in ListPlots:
+                name    = item.split('/')[-1]
+                hash    = PlotCache.Hash('root',self.GetPlotDescription(item))
+                outputs = self.GetPlotOutputs(name,modes,output_paths)
+                if not cache.Restore(name,hash,outputs):
+                    ToProduce.append([item,name,hash,outputs])
+            if len(ToProduce)!=0:
+                producer=HistoRootProducer(histo_path,[ x[0] for x in ToProduce ],\
+                         self.main.archi_info.ma5dir+'/tools/SampleAnalyzer/Bin/ROOTPlotter')
+                producer.Execute()
+
+        # Launching matplotlib
         elif self.main.graphic_render==GraphicRenderType.MATPLOTLIB:
-            producer=HistoMatplotlibProducer(histo_path,ListPlots)
-            producer.Execute()
+            # Standalone scripts only written for the users (not executed)
+            if self.main.matplotlib_scripts:
+                scripts=[ x for x in ListPlots if os.path.isfile(x+'.py') ]
+                producer=HistoMatplotlibProducer(histo_path,scripts,self.main.GetNCores())
+                producer.WriteMainFile()
+            for plot in self.plotflow.matplotlib_plots:
+                hash    = PlotCache.Hash('matplotlib',json.dumps(plot,sort_keys=True))
+                outputs = self.GetPlotOutputs(plot['name'],modes,output_paths)
+                if not cache.Restore(plot['name'],hash,outputs):
+                    ToProduce.append([plot,plot['name'],hash,outputs])
+            if len(ToProduce)!=0:
+                renderer=HistoMatplotlibRenderer(histo_path)
+                renderer.Execute([ x[0] for x in ToProduce ],self.main.GetNCores())
+
+        # Keeping the images of the new plots
+        if self.main.graphic_render!=GraphicRenderType.NONE:
+            for item, name, hash, outputs in ToProduce:
+                cache.Store(name,hash,outputs)
+            cache.Save()
+            self.logger.info("     - "+str(len(ToProduce))+" plot(s) produced, "+\
+                             str(len(cache.used)-len(ToProduce))+" unchanged")
 
         # Ok
         return True
 
 
+    @staticmethod
+    def GetPlotDescription(filename):
+        # Data file read by the ROOT plotter, or the macro itself
+        for extension in ['.dat','.C']:
+            if os.path.isfile(filename+extension):
+                try:
+                    input = open(filename+extension,'r')
+                    description = input.read()
+                    input.close()
+                    return description
+                except:
+                    break
+        return ''
+
+
+    @staticmethod
+    def GetPlotOutputs(name,modes,output_paths):
+        outputs = []
+        for ind in range(0,len(output_paths)):
+            outputs.append(os.path.normpath(output_paths[ind]+'/'+name+'.'+\
+                           ReportFormatType.convert2filetype(modes[ind])))
+        return outputs
+
+
     def CopyLogo(self,mode,output_path):
         
         # Filename
@@ -854,9 +921,11 @@ class Layout:
 
     def CreateFolders(self,histo_folder,output_paths,modes):
 
-        # Creating histo folder
-        if not FolderWriter.CreateDirectory(histo_folder,True):
-            return False
+        # Creating histo folder (kept from one report to the next one:
+        # it holds the images of the plots which have not changed)
+        if not os.path.isdir(histo_folder):
+            if not FolderWriter.CreateDirectory(histo_folder,True):
+                return False
 
         for ind in range(0,len(output_paths)):
                          
@@ -1047,18 +1116,153 @@ class Layout:
     def CheckLatexLog(file):
         if not os.path.isfile(file):
             return False
-        for line in file:
+        try:
+            input = open(file,'r')
+        except:
+            return False
+        for line in input:
             if line.startswith('!'):
+                input.close()
                 return False
+        input.close()
         return True
 
-    def CompileReport(self,mode,output_path):
-        
-        # ---- LATEX MODE ----
+
+    @staticmethod
+    def ReadLatexFile(file):
+        if not os.path.isfile(file):
+            return ''
+        try:
+            input = open(file,'r')
+            content = input.read()
+            input.close()
+        except:
+            return ''
+        return content
+
+
+    @staticmethod
+    def GetLatexCache(output_path):
+        # Auxiliary files of the previous compilation, kept next to the
+        # plot cache (the report folders are recreated at each submission)
+        histo_path = os.path.normpath(output_path+'/../Histo')
+        if not os.path.isdir(histo_path):
+            return ''
+        return os.path.normpath(histo_path+'/LaTeX/'+os.path.basename(output_path))
+
+
+    def LaunchReport(self,mode,output_path):
+
+        # Compiler
         if mode==ReportFormatType.LATEX:
+            compiler='latex'
+        elif mode==ReportFormatType.PDFLATEX:
+            compiler='pdflatex'
+        else:
+            return None
+
+        # Restoring the auxiliary files of the previous compilation:
+        # if the first pass leaves them unchanged, no second pass is needed
+        cache = Layout.GetLatexCache(output_path)
+        if cache!='':
+            for ext in ['aux','toc','out']:
+                name = cache+'/main.'+ext
+                if os.path.isfile(name):
+                    try:
+                        shutil.copy(name,output_path+'/main.'+ext)
+                    except:
+                        pass
+
+        # Launching the first pass
+        job = { 'mode'   : mode,     'path'  : output_path, 'compiler' : compiler,\
+                'cache'  : cache,    'pass'  : 1,\
+                'aux'    : Layout.ReadLatexFile(output_path+'/main.aux'),\
+                'start'  : time.time() }
+        job['process'] = ShellCommand.Launch([compiler,'-interaction=nonstopmode','main.tex'],\
+                                             output_path+'/latex.log',output_path)
+        if job['process']==None:
+            self.logger.error('impossible to launch '+compiler+' for the report '+output_path)
+            return None
+        return job
+
+
+    def CancelReport(self,job):
+        if job==None or job['process']==None:
+            return
+        if job['process'].poll()==None:
+            try:
+                job['process'].terminate()
+                job['process'].wait()
+            except:
+                pass
+
+
+    def PollReport(self,job):
+
+        # Current pass still running?
+        if job['process'].poll()==None:
+            return True
+        self.logger.debug('   '+job['compiler']+' pass '+str(job['pass'])+' for '+job['path']+\
+                          ': '+str(round(time.time()-job['start'],2))+' s')
+
+        # Second pass, only if the cross-references have changed
+        if job['pass']!=1:
+            return False
+        if Layout.ReadLatexFile(job['path']+'/main.aux')==job['aux']:
+            self.logger.debug('   '+job['compiler']+' for '+job['path']+\
+                              ': auxiliary file unchanged, second pass skipped')
+            return False
+        job['pass']    = 2
+        job['start']   = time.time()
+        job['process'] = ShellCommand.Launch([job['compiler'],'-interaction=nonstopmode','main.tex'],\
+                                             job['path']+'/latex.log',job['path'],mode='a')
+        if job['process']==None:
+            self.logger.error('impossible to launch '+job['compiler']+' for the report '+job['path'])
+            return False
+        return True
+
+
+    def FinishReports(self,jobs):
+
+        # Waiting for all the compilations (the compilers are stopped if interrupted)
+        running = [ job for job in jobs if job!=None ]
+        try:
+            while len(running)!=0:
+                running = [ job for job in running if self.PollReport(job) ]
+                if len(running)!=0:
+                    time.sleep(0.05)
+        except:
+            for job in running:
+                self.CancelReport(job)
+            raise
+
+        # Checking the results
+        return [ self.CheckReport(job) for job in jobs ]
+
 
-            # Launching latex and producing DVI file
-            os.system('cd '+output_path+'; latex -interaction=nonstopmode main.tex > latex.log 2>&1; latex -interaction=nonstopmode main.tex >> latex.log 2>&1')
+    def FinishReport(self,job):
+        return self.FinishReports([job])[0]
+
+
+    def CheckReport(self,job):
+        if job==None or job['process']==None:
+            return False
+        output_path = job['path']
+
+        # Saving the auxiliary files for the next compilation
+        if job['cache']!='':
+            try:
+                if not os.path.isdir(job['cache']):
+                    os.makedirs(job['cache'])
+                for ext in ['aux','toc','out']:
+                    name = output_path+'/main.'+ext
+                    if os.path.isfile(name):
+                        shutil.copy(name,job['cache']+'/main.'+ext)
+            except:
+                self.logger.debug('impossible to save the LaTeX auxiliary files in '+job['cache'])
+
+        # ---- LATEX MODE ----
+        if job['mode']==ReportFormatType.LATEX:
 
             name=os.path.normpath(output_path+'/main.dvi')
             if not os.path.isfile(name):
@@ -1071,7 +1275,7 @@ class Layout:
                 self.logger.error('some errors occured during LATEX compilation')
                 self.logger.error('for more details, have a look to the log file : '+output_path+'/latex.log')
                 return False
-                
+
             # Converting DVI file to PDF file
 #            if self.main.session_info.has_dvipdf:
 #                self.logger.info("     -> Converting the DVI report to a PDF report.")
@@ -1083,12 +1287,9 @@ class Layout:
 #                    self.logger.error('PDF file cannot be produced')
 #                    self.logger.error('Please have a look to the log file '+output_path+'/dvipdf.log')
 #                    return False
-                
-        # ---- PDFLATEX MODE ----
-        elif mode==ReportFormatType.PDFLATEX:
 
-            # Launching latex and producing PDF file
-            os.system('cd '+output_path+'; pdflatex -interaction=nonstopmode main.tex > latex.log 2>&1; pdflatex -interaction=nonstopmode main.tex >> latex.log 2>&1');
+        # ---- PDFLATEX MODE ----
+        elif job['mode']==ReportFormatType.PDFLATEX:
 
             # Checking latex log : are there errors
             if not Layout.CheckLatexLog(output_path+'/latex.log'):
@@ -1100,11 +1301,15 @@ class Layout:
             name=os.path.normpath(output_path+'/main.pdf')
             if not os.path.isfile(name):
                 self.logger.error('PDF file cannot be produced')
-                self.logger.error('Please have a look to the log file '+output_path+'/latex2.log')
+                self.logger.error('Please have a look to the log file '+output_path+'/latex.log')
                 return False
-            
-        
-            
-            
-        
-    
+
+        return True
+
+
+    def CompileReport(self,mode,output_path):
+        job = self.LaunchReport(mode,output_path)
+        if job==None:
+            return False
+        return self.FinishReport(job)
+
@@ -239,7 +239,7 @@ class MergingPlots:
                           ','+str(DJRplots[ind].summary.underflow*scales[ind])+'); // underflow\n')
             for bin in range(1,xnbin+1):
                 outputC.write('  '+histoname+'->SetBinContent('+str(bin)+\
-                              ','+str(DJRplots[ind].summary.array[bin-1]*scales[ind])+');\n')
+                              ','+str(float(DJRplots[ind].summary.array[bin-1])*scales[ind])+');\n')
             nentries=DJRplots[ind].summary.nentries
             outputC.write('  '+histoname+'->SetBinContent('+str(xnbin+1)+\
                           ','+str(DJRplots[ind].summary.overflow*scales[ind])+'); // overflow\n')
@@ -36,6 +36,10 @@ import madanalysis.enumeration.color_hex
 import time
 import copy
 import logging
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class PlotFlow:
@@ -47,6 +51,7 @@ class PlotFlow:
     def __init__(self,main):
         self.main               = main
         self.detail             = []
+        self.matplotlib_plots   = []
         for i in range(0,len(main.datasets)):
             self.detail.append(PlotFlowForDataset(main,main.datasets[i]))
 
@@ -115,8 +120,12 @@ class PlotFlow:
 
             # save result
             # PS: [:] -> clone the arrays
-            histo[ihisto].positive.array = array_positive[:]
-            histo[ihisto].negative.array = array_negative[:]
+            if numpy is not None:
+                histo[ihisto].positive.array = numpy.array(array_positive,dtype=float)
+                histo[ihisto].negative.array = numpy.array(array_negative,dtype=float)
+            else:
+                histo[ihisto].positive.array = array_positive[:]
+                histo[ihisto].negative.array = array_negative[:]
             histo[ihisto].labels         = newlabels[:]
 
 
@@ -137,6 +146,9 @@ class PlotFlow:
 
     def DrawAll(self,histo_path,modes,output_paths,ListROOTplots):
 
+        # Plots for the in-process matplotlib renderer
+        self.matplotlib_plots = []
+
         # Loop on each histo type
         irelhisto=0
         for iabshisto in range(0,len(self.main.selection)):
@@ -169,10 +181,12 @@ class PlotFlow:
             self.DrawROOT(histos,scales,self.main.selection[iabshisto],\
                           irelhisto,filenameC,output_files)
             
-            logging.getLogger('MA5').debug('Producing file '+filenamePy+' ...')
-            self.DrawMATPLOTLIB\
-                         (histos,scales,self.main.selection[iabshisto],\
-                          irelhisto,filenamePy,output_files)
+            plot=self.GetMatplotlibPlot(histos,scales,self.main.selection[iabshisto],\
+                                        'selection_'+str(irelhisto),output_files)
+            self.matplotlib_plots.append(plot)
+            if self.main.matplotlib_scripts:
+                logging.getLogger('MA5').debug('Producing file '+filenamePy+' ...')
+                self.DrawMATPLOTLIB(plot,filenamePy)
                   
             irelhisto+=1
 
@@ -217,6 +231,9 @@ class PlotFlow:
             logging.getLogger('MA5').error('Impossible to write the file: '+filenameC)
             return False
 
+        # Description of the plot for the ROOT plotter (one keyword per line)
+        data = ['# MadAnalysis 5 plot description (read by ROOTPlotter)']
+
         # File header
         function_name = filenameC[:-2]
         function_name = function_name.split('/')[-1]
@@ -236,6 +253,7 @@ class PlotFlow:
         if legendmode:
             widthx=1000
         outputC.write('  TCanvas* canvas = new TCanvas("'+canvas_name+'","'+canvas_name+'",0,0,'+str(widthx)+',500);\n')
+        data.append('canvas '+canvas_name+' '+str(widthx)+' 500')
         outputC.write('  gStyle->SetOptStat(0);\n')
         outputC.write('  gStyle->SetOptTitle(0);\n')
         outputC.write('  canvas->SetHighLightColor(2);\n')
@@ -252,6 +270,7 @@ class PlotFlow:
         if legendmode:
             margin=0.3
         outputC.write('  canvas->SetRightMargin('+str(margin)+');\n')
+        data.append('rightmargin '+str(margin))
         outputC.write('  canvas->SetBottomMargin(0.15);\n')
         outputC.write('  canvas->SetTopMargin(0.05);\n')
         outputC.write('\n')
@@ -261,11 +280,14 @@ class PlotFlow:
         if logxhisto:
             outputC.write('  // Histo binning\n')
             outputC.write('  Double_t xBinning['+str(xnbin+1)+'] = {')
+            edges=[]
             for bin in range(1,xnbin+2):
                 if bin!=1:
                     outputC.write(',')
                 outputC.write(str(histos[0].GetBinLowEdge(bin)))
+                edges.append(str(histos[0].GetBinLowEdge(bin)))
             outputC.write('};\n')
+            data.append('binning '+' '.join(edges))
             outputC.write('\n')
 
         # Loop over datasets and histos
@@ -285,18 +307,26 @@ class PlotFlow:
                                histoname+'",'+str(xnbin)+','+\
                                str(xmin)+','+str(xmax)+');\n')
 
+            data.append('histo '+histoname+' '+str(xnbin)+' '+str(xmin)+' '+str(xmax))
+
             # TH1F content
             outputC.write('  // Content\n')
             outputC.write('  '+histoname+'->SetBinContent(0'+\
                           ','+str(histos[ind].summary.underflow*scales[ind])+'); // underflow\n')
+            contents=[str(histos[ind].summary.underflow*scales[ind])]
             for bin in range(1,xnbin+1):
-                ntot+= histos[ind].summary.array[bin-1]*scales[ind]
+                value = float(histos[ind].summary.array[bin-1])*scales[ind]
+                ntot+= value
                 outputC.write('  '+histoname+'->SetBinContent('+str(bin)+\
-                              ','+str(histos[ind].summary.array[bin-1]*scales[ind])+');\n')
+                              ','+str(value)+');\n')
+                contents.append(str(value))
             nentries=histos[ind].summary.nentries
             outputC.write('  '+histoname+'->SetBinContent('+str(xnbin+1)+\
                           ','+str(histos[ind].summary.overflow*scales[ind])+'); // overflow\n')
             outputC.write('  '+histoname+'->SetEntries('+str(nentries)+');\n')
+            contents.append(str(histos[ind].summary.overflow*scales[ind]))
+            data.append('content '+' '.join(contents))
+            data.append('entries '+str(nentries))
 
             # reset
             linecolor=0
@@ -410,15 +440,21 @@ class PlotFlow:
             outputC.write('  '+histoname+'->SetLineWidth('+str(linewidth)+');\n')
             outputC.write('  '+histoname+'->SetFillColor('+str(backcolor)+');\n')
             outputC.write('  '+histoname+'->SetFillStyle('+str(backstyle)+');\n')
+            data.append('style '+' '.join([str(linecolor),str(linestyle),str(linewidth),\
+                                           str(backcolor),str(backstyle)]))
             if frequencyhisto:
                 outputC.write('  '+histoname+'->SetBarWidth(0.8);\n')
                 outputC.write('  '+histoname+'->SetBarOffset(0.1);\n')
+                data.append('bar 0.8 0.1')
+            if legendmode:
+                data.append('legend '+PlotFlow.NiceTitle(self.main.datasets[ind].title))
             outputC.write('\n')
         
         # Creating the THStack
         outputC.write('  // Creating a new THStack\n')
         PlotFlow.counter+=1
         outputC.write('  THStack* stack = new THStack("mystack_'+str(PlotFlow.counter)+'","mystack");\n')
+        data.append('stack mystack_'+str(PlotFlow.counter))
         # Loop over datasets and histos
         for ind in range(0,len(histos)):
             histoname=histos[ind].name+'_'+str(ind)
@@ -430,6 +466,7 @@ class PlotFlow:
         if frequencyhisto:
             drawoptions.append('bar1')
         outputC.write('  stack->Draw("'+''.join(drawoptions)+'");\n')
+        data.append('drawoption '+''.join(drawoptions))
         outputC.write('\n')
         
         # Setting Y axis label
@@ -464,6 +501,8 @@ class PlotFlow:
         outputC.write('  stack->GetYaxis()->SetTitleFont(22);\n')
         outputC.write('  stack->GetYaxis()->SetTitleOffset(1);\n')
         outputC.write('  stack->GetYaxis()->SetTitle("'+axis_titleY+'");\n')
+        data.append('ytitlesize '+str(titlesize))
+        data.append('ytitle '+axis_titleY)
 
         outputC.write('\n')
         outputC.write('  // X axis\n')
@@ -481,10 +520,12 @@ class PlotFlow:
         outputC.write('  stack->GetXaxis()->SetTitleFont(22);\n')
         outputC.write('  stack->GetXaxis()->SetTitleOffset(1);\n')
         outputC.write('  stack->GetXaxis()->SetTitle("'+axis_titleX+'");\n')
+        data.append('xtitle '+axis_titleX)
         if frequencyhisto:
             for bin in range(1,xnbin+1):
                  outputC.write('  stack->GetXaxis()->SetBinLabel('+str(bin)+','\
                                '"'+str(histos[ind].stringlabels[bin-1])+'");\n')
+                 data.append('binlabel '+str(bin)+' '+str(histos[ind].stringlabels[bin-1]))
         outputC.write('\n')
 
         # Setting Log scale
@@ -497,6 +538,8 @@ class PlotFlow:
             logy=1
         outputC.write('  canvas->SetLogx('+str(logx)+');\n')
         outputC.write('  canvas->SetLogy('+str(logy)+');\n')
+        data.append('logx '+str(logx))
+        data.append('logy '+str(logy))
         outputC.write('\n')
         
         # Displaying a legend
@@ -518,6 +561,7 @@ class PlotFlow:
         outputC.write('  // Saving the image\n')
         for outputname in outputnames:
             outputC.write('  canvas->SaveAs("'+outputname+'");\n')
+            data.append('output '+outputname)
         outputC.write('\n')
 
         # File foot
@@ -530,17 +574,34 @@ class PlotFlow:
             logging.getLogger('MA5').error('Impossible to close the file: '+outputC)
             return False
 
+        # Plot description for the ROOT plotter
+        filenameData = filenameC[:-2]+'.dat'
+        try:
+            outputData = open(filenameData,'w')
+            outputData.write('\n'.join(data)+'\n')
+            outputData.close()
+        except:
+            logging.getLogger('MA5').error('Impossible to write the file: '+filenameData)
+            return False
+
         # Ok
         return True
 
 
 
-    def DrawMATPLOTLIB(self,histos,scales,ref,irelhisto,filenamePy,outputnames):
+    def GetMatplotlibPlot(self,histos,scales,ref,name,outputnames):
+
+        # Description of the plot, shared by the in-process renderer
+        # and by the standalone scripts
+        plot = {}
+        plot['name']    = name
+        plot['outputs'] = outputnames[:]
 
         # Is there any legend?
         legendmode = False
         if len(self.main.datasets)>1:
             legendmode = True
+        plot['legend'] = legendmode
 
         # Type of histogram
         frequencyhisto = True
@@ -560,120 +621,51 @@ class PlotFlow:
            ( ref.stack==StackingMethodType.AUTO and \
              self.main.stack==StackingMethodType.STACK ):
             stackmode=True
-
-
-        # Open the file in write-mode
-        try:
-            outputPy = file(filenamePy,'w')
-        except:
-            logging.getLogger('MA5').error('Impossible to write the file: '+filenamePy)
-            return False
-
-        # File header
-        function_name = filenamePy[:-3]
-        function_name = function_name.split('/')[-1]
-        outputPy.write('def '+function_name+'():\n')
-        outputPy.write('\n')
-
-        # Import Libraries
-        outputPy.write('    # Library import\n')
-        outputPy.write('    import numpy\n')
-        outputPy.write('    import matplotlib\n')
-#        outputPy.write("    matplotlib.use('Agg')\n")
-        outputPy.write('    import matplotlib.pyplot   as plt\n')
-        outputPy.write('    import matplotlib.gridspec as gridspec\n')
-        outputPy.write('\n')
-
-        # Matplotlib & numpy version
-        outputPy.write('    # Library version\n')
-        outputPy.write('    matplotlib_version = matplotlib.__version__\n')
-        outputPy.write('    numpy_version      = numpy.__version__\n')
-        outputPy.write('\n')
+        plot['stack'] = stackmode
 
         # Binning
-        # Loop over datasets and histos
         xnbin=histos[0].nbins
-        xmin =histos[0].xmin
-        xmax =histos[0].xmax
-        outputPy.write('    # Histo binning\n')
+        plot['nbins'] = xnbin
+        plot['xmin']  = histos[0].xmin
+        plot['xmax']  = histos[0].xmax
+        plot['binning'] = None
         if logxhisto:
-            outputPy.write('    xBinning = [')
+            plot['binning'] = []
             for bin in range(1,xnbin+2):
-                if bin!=1:
-                    outputPy.write(',')
-                outputPy.write(str(histos[0].GetBinLowEdge(bin)))
-            outputPy.write(']\n')
-            outputPy.write('\n')
-        else:
-            outputPy.write('    xBinning = numpy.linspace('+\
-                           str(xmin)+','+str(xmax)+','+str(xnbin+1)+\
-                           ',endpoint=True)\n')
-        outputPy.write('\n')
+                plot['binning'].append(histos[0].GetBinLowEdge(bin))
 
-
-        # Data
-        outputPy.write('    # Creating data sequence: middle of each bin\n')
-        outputPy.write('    xData = numpy.array([')
+        # Data: middle of each bin
+        plot['xdata'] = []
         for bin in range(0,xnbin):
-            if bin!=0:
-                outputPy.write(',')
-            outputPy.write(str(histos[0].GetBinMean(bin)))
-        outputPy.write('])\n\n')
-        
-        # Loop over datasets and histos
+            plot['xdata'].append(histos[0].GetBinMean(bin))
+
+        # Weights of each histo
         ntot = 0
+        plot['names']   = []
+        plot['weights'] = []
         for ind in range(0,len(histos)):
-
-            # Ntot
-
-            # Creating a new histo
-            histoname=histos[ind].name+'_'+str(ind)
-            outputPy.write('    # Creating weights for histo: '+histoname+'\n')
-            outputPy.write('    '+histoname+'_weights = numpy.array([')
+            plot['names'].append(histos[ind].name+'_'+str(ind))
+            weights = []
             for bin in range(1,xnbin+1):
-                ntot+=histos[ind].summary.array[bin-1]*scales[ind]
-                if bin!=1:
-                    outputPy.write(',')
-                outputPy.write(str(histos[ind].summary.array[bin-1]*scales[ind]))
-            outputPy.write('])\n\n')
-
-
+                value = float(histos[ind].summary.array[bin-1])*scales[ind]
+                ntot+=value
+                weights.append(value)
+            plot['weights'].append(weights)
+        plot['ntot'] = ntot
 
         # Canvas
-        outputPy.write('    # Creating a new Canvas\n')
-        dpi=80
-        height=500
-        widthx=700
+        plot['dpi']    = 80
+        plot['height'] = 500
+        plot['width']  = 700
         if legendmode:
-            widthx=1000
-        outputPy.write('    fig   = plt.figure(figsize=('+\
-                       str(widthx/dpi)+','+str(height/dpi)+\
-                       '),dpi='+str(dpi)+')\n')
-        if not legendmode:
-            outputPy.write('    frame = gridspec.GridSpec(1,1)\n')
-        else:
-            outputPy.write('    frame = gridspec.GridSpec(1,1,right=0.7)\n')
-        # subplot argument: nrows, ncols, plot_number
-        # outputPy.write('    pad = fig.add_subplot(111)\n')
-        outputPy.write('    pad   = fig.add_subplot(frame[0])\n')
-        outputPy.write('\n')
+            plot['width'] = 1000
 
-        # Stack
-        outputPy.write('    # Creating a new Stack\n')
+        # Stack (drawn from the last histo to the first one)
+        plot['series'] = []
         for ind in range(len(histos)-1,-1,-1):
-            myweight = histos[ind].name+'_'+str(ind)+'_weights'
-            mytitle  = '"'+PlotFlow.NiceTitleMatplotlib(self.main.datasets[ind].title)+'"'
+            mytitle  = PlotFlow.NiceTitleMatplotlib(self.main.datasets[ind].title)
             mytitle  = mytitle.replace('_','\_')
 
-            if not stackmode:
-                myweights=histos[ind].name+'_'+str(ind)+'_weights'
-            else:
-                myweights=''
-                for ind2 in range(0,ind+1):
-                    if ind2>=1:
-                        myweights+='+'
-                    myweights+=histos[ind2].name+'_'+str(ind2)+'_weights'
-
             # reset
             linecolor=0
             linestyle=0
@@ -756,57 +748,24 @@ class PlotFlow:
                 linecolor=self.color
                 self.color += 1
 
-            # lineStyle
-            linestyle=LineStyleType.convert2code(self.main.datasets[ind].linestyle)
-
-            # linewidth
-            linewidth=self.main.datasets[ind].linewidth
-
             # background color
             if self.main.datasets[ind].backcolor!=ColorType.AUTO:
                 backcolor=ColorType.convert2root( \
                           self.main.datasets[ind].backcolor,\
                           self.main.datasets[ind].backshade)
 
-            # background style
-            if self.main.datasets[ind].backstyle!=BackStyleType.AUTO:
-                backstyle=BackStyleType.convert2matplotlib( \
-                          self.main.datasets[ind].backstyle)
-
-            mylinecolor  = '"'+madanalysis.enumeration.color_hex.color_hex[linecolor]+'"'
-            mybackcolor  = '"'+madanalysis.enumeration.color_hex.color_hex[backcolor]+'"'
-
-            filledmode='"stepfilled"'
-            rWidth=1.
-            if backcolor==0: #invisible
-                filledmode='"step"'
-                mybackcolor = 'None'
-#            if frequencyhisto:
-#                filledmode='"bar"'
-#                rWidth=0.8
-            mylinewidth  = self.main.datasets[ind].linewidth
-            mylinestyle  = LineStyleType.convert2matplotlib(self.main.datasets[ind].linestyle)
+            # background color: 0 = invisible
+            mybackcolor = None
+            if backcolor!=0:
+                mybackcolor = madanalysis.enumeration.color_hex.color_hex[backcolor]
 
-                
-            outputPy.write('    pad.hist('+\
-                               'x=xData, '+\
-                               'bins=xBinning, '+\
-                               'weights='+myweights+',\\\n'+\
-                               '             label='+mytitle+', ')
-            if ntot!=0:
-                outputPy.write('histtype='+filledmode+', ')
-            outputPy.write(    'rwidth='+str(rWidth)+',\\\n'+\
-                               '             color='+mybackcolor+', '+\
-                               'edgecolor='+mylinecolor+', '+\
-                               'linewidth='+str(mylinewidth)+', '+\
-                               'linestyle='+mylinestyle+',\\\n'+\
-                               '             bottom=None, '+\
-                               'cumulative=False, normed=False, align="mid", orientation="vertical")\n\n')
-        outputPy.write('\n')
-
-        # Label
-        outputPy.write('    # Axis\n')
-        outputPy.write("    plt.rc('text',usetex=False)\n")
+            plot['series'].append( { \
+                'index'     : ind, \
+                'title'     : mytitle, \
+                'linecolor' : madanalysis.enumeration.color_hex.color_hex[linecolor], \
+                'backcolor' : mybackcolor, \
+                'linewidth' : self.main.datasets[ind].linewidth, \
+                'linestyle' : LineStyleType.convert2matplotlib(self.main.datasets[ind].linestyle)[1:-1] } )
 
         # X-axis
         if ref.titleX=="": 
@@ -815,8 +774,7 @@ class PlotFlow:
             axis_titleX = ref.titleX
         axis_titleX = axis_titleX.replace('#DeltaR','#Delta R')
         axis_titleX = axis_titleX.replace('#','\\')
-        outputPy.write('    plt.xlabel(r"'+axis_titleX+'",\\\n')
-        outputPy.write('               fontsize=16,color="black")\n')
+        plot['xtitle'] = axis_titleX
 
         # Y-axis
         axis_titleY = ref.GetYaxis_Matplotlib()
@@ -839,54 +797,154 @@ class PlotFlow:
         if ref.titleY!="": 
             axis_titleY = PlotFlow.NiceTitle(ref.titleY)
         axis_titleY = axis_titleY.replace('#','\\')
-        outputPy.write('    plt.ylabel(r"'+axis_titleY+'",\\\n')
-        outputPy.write('               fontsize=16,color="black")\n')
-        outputPy.write('\n')
+        plot['ytitle'] = axis_titleY
 
         # Tag Log/Linear
-        is_logx=False
+        plot['logx'] = False
         if ref.logX and ntot != 0:
-            is_logx=True
-        is_logy=False
+            plot['logx'] = True
+        plot['logy'] = False
         if ref.logY and ntot != 0:
-            is_logy=True
+            plot['logy'] = True
+
+        # Labels
+        plot['xlabels'] = None
+        if frequencyhisto:
+            plot['xlabels'] = []
+            for bin in range(0,xnbin):
+                plot['xlabels'].append(str(histos[0].stringlabels[bin]).replace('_','\_'))
+
+        return plot
+
+
+    def DrawMATPLOTLIB(self,plot,filenamePy):
+
+        # Open the file in write-mode
+        try:
+            outputPy = file(filenamePy,'w')
+        except:
+            logging.getLogger('MA5').error('Impossible to write the file: '+filenamePy)
+            return False
+
+        # File header
+        function_name = filenamePy[:-3]
+        function_name = function_name.split('/')[-1]
+        outputPy.write('def '+function_name+'():\n')
+        outputPy.write('\n')
+
+        # Import Libraries
+        outputPy.write('    # Library import\n')
+        outputPy.write('    import numpy\n')
+        outputPy.write('    import matplotlib\n')
+#        outputPy.write("    matplotlib.use('Agg')\n")
+        outputPy.write('    import matplotlib.pyplot   as plt\n')
+        outputPy.write('    import matplotlib.gridspec as gridspec\n')
+        outputPy.write('\n')
+
+        # Matplotlib & numpy version
+        outputPy.write('    # Library version\n')
+        outputPy.write('    matplotlib_version = matplotlib.__version__\n')
+        outputPy.write('    numpy_version      = numpy.__version__\n')
+        outputPy.write('\n')
+
+        # Binning
+        outputPy.write('    # Histo binning\n')
+        if plot['binning']!=None:
+            outputPy.write('    xBinning = ['+','.join([str(x) for x in plot['binning']])+']\n')
+            outputPy.write('\n')
+        else:
+            outputPy.write('    xBinning = numpy.linspace('+\
+                           str(plot['xmin'])+','+str(plot['xmax'])+','+str(plot['nbins']+1)+\
+                           ',endpoint=True)\n')
+        outputPy.write('\n')
+
+        # Data
+        outputPy.write('    # Creating data sequence: middle of each bin\n')
+        outputPy.write('    xData = numpy.array(['+','.join([str(x) for x in plot['xdata']])+'])\n\n')
+        
+        # Loop over datasets and histos
+        for ind in range(0,len(plot['names'])):
+            histoname=plot['names'][ind]
+            outputPy.write('    # Creating weights for histo: '+histoname+'\n')
+            outputPy.write('    '+histoname+'_weights = numpy.array(['+\
+                           ','.join([str(x) for x in plot['weights'][ind]])+'])\n\n')
+
+        # Canvas
+        outputPy.write('    # Creating a new Canvas\n')
+        outputPy.write('    fig   = plt.figure(figsize=('+\
+                       str(plot['width']/plot['dpi'])+','+str(plot['height']/plot['dpi'])+\
+                       '),dpi='+str(plot['dpi'])+')\n')
+        if not plot['legend']:
+            outputPy.write('    frame = gridspec.GridSpec(1,1)\n')
+        else:
+            outputPy.write('    frame = gridspec.GridSpec(1,1,right=0.7)\n')
+        # subplot argument: nrows, ncols, plot_number
+        # outputPy.write('    pad = fig.add_subplot(111)\n')
+        outputPy.write('    pad   = fig.add_subplot(frame[0])\n')
+        outputPy.write('\n')
+
+        # Stack
+        outputPy.write('    # Creating a new Stack\n')
+        for serie in plot['series']:
+            ind = serie['index']
+            if not plot['stack']:
+                myweights=plot['names'][ind]+'_weights'
+            else:
+                myweights='+'.join([ x+'_weights' for x in plot['names'][:ind+1] ])
+
+            filledmode='"stepfilled"'
+            rWidth=1.
+            mybackcolor='"'+str(serie['backcolor'])+'"'
+            if serie['backcolor']==None: #invisible
+                filledmode='"step"'
+                mybackcolor = 'None'
+#            if frequencyhisto:
+#                filledmode='"bar"'
+#                rWidth=0.8
+
+            outputPy.write('    pad.hist('+\
+                               'x=xData, '+\
+                               'bins=xBinning, '+\
+                               'weights='+myweights+',\\\n'+\
+                               '             label="'+serie['title']+'", ')
+            if plot['ntot']!=0:
+                outputPy.write('histtype='+filledmode+', ')
+            outputPy.write(    'rwidth='+str(rWidth)+',\\\n'+\
+                               '             color='+mybackcolor+', '+\
+                               'edgecolor="'+serie['linecolor']+'", '+\
+                               'linewidth='+str(serie['linewidth'])+', '+\
+                               'linestyle="'+serie['linestyle']+'",\\\n'+\
+                               '             bottom=None, '+\
+                               'cumulative=False, normed=False, align="mid", orientation="vertical")\n\n')
+        outputPy.write('\n')
+
+        # Label
+        outputPy.write('    # Axis\n')
+        outputPy.write("    plt.rc('text',usetex=False)\n")
+        outputPy.write('    plt.xlabel(r"'+plot['xtitle']+'",\\\n')
+        outputPy.write('               fontsize=16,color="black")\n')
+        outputPy.write('    plt.ylabel(r"'+plot['ytitle']+'",\\\n')
+        outputPy.write('               fontsize=16,color="black")\n')
+        outputPy.write('\n')
 
         # Bound y
         outputPy.write('    # Boundary of y-axis\n')
-        myweights=''
-        if stackmode:
-            for ind in range(0,len(histos)):
-                if ind>=1:
-                    myweights+='+'
-                myweights+=histos[ind].name+'_'+str(ind)+'_weights'
+        if plot['stack']:
+            myweights='+'.join([ x+'_weights' for x in plot['names'] ])
         else:
-            myweights='numpy.array(['
-            for ind in range(0,len(histos)):
-                if ind>=1:
-                    myweights+=','
-                myweights+=histos[ind].name+'_'+str(ind)+'_weights.max()'
-            myweights+='])'
+            myweights='numpy.array(['+','.join([ x+'_weights.max()' for x in plot['names'] ])+'])'
         outputPy.write('    ymax=('+myweights+').max()*1.1\n')
         outputPy.write('    ')
-        if is_logy:
+        if plot['logy']:
             outputPy.write('#')
         outputPy.write('ymin=0 # linear scale\n')
 
-        myweights=''
-        if stackmode:
-            for ind in range(0,len(histos)):
-                if ind>=1:
-                    myweights+='+'
-                myweights+=histos[ind].name+'_'+str(ind)+'_weights'
+        if plot['stack']:
+            myweights='+'.join([ x+'_weights' for x in plot['names'] ])
         else:
-            myweights='numpy.array(['
-            for ind in range(0,len(histos)):
-                if ind>=1:
-                    myweights+=','
-                myweights+=histos[ind].name+'_'+str(ind)+'_weights.min()'
-            myweights+='])'
+            myweights='numpy.array(['+','.join([ x+'_weights.min()' for x in plot['names'] ])+'])'
         outputPy.write('    ')
-        if not is_logy:
+        if not plot['logy']:
             outputPy.write('#')
         outputPy.write('ymin=min(1e-2, min(x for x in ('+myweights+') if x)/100.) # log scale\n')
         outputPy.write('    plt.gca().set_ylim(ymin,ymax)\n')
@@ -896,12 +954,12 @@ class PlotFlow:
         outputPy.write('    # Log/Linear scale for X-axis\n')
         # - Linear
         outputPy.write('    ')
-        if is_logx:
+        if plot['logx']:
             outputPy.write('#')
         outputPy.write('plt.gca().set_xscale("linear")\n')
         # - Log
         outputPy.write('    ')
-        if not is_logx:
+        if not plot['logx']:
             outputPy.write('#')
         outputPy.write('plt.gca().set_xscale("log",nonposx="clip")\n')
         outputPy.write('\n')
@@ -911,26 +969,22 @@ class PlotFlow:
         outputPy.write('    # Log/Linear scale for Y-axis\n')
         # - Linear
         outputPy.write('    ')
-        if is_logy:
+        if plot['logy']:
             outputPy.write('#')
         outputPy.write('plt.gca().set_yscale("linear")\n')
         # - Log
         outputPy.write('    ')
-        if not is_logy:
+        if not plot['logy']:
             outputPy.write('#')
         outputPy.write('plt.gca().set_yscale("log",nonposy="clip")\n')
         outputPy.write('\n')
 
  
         # Labels
-        if frequencyhisto:
+        if plot['xlabels']!=None:
             outputPy.write('    # Labels for x-Axis\n')
-            outputPy.write('    xLabels = numpy.array([')
-            for bin in range(0,xnbin):
-                if bin>=1:
-                    outputPy.write(',')
-                outputPy.write('"'+str(histos[0].stringlabels[bin]).replace('_','\_')+'"')
-            outputPy.write('])\n')
+            outputPy.write('    xLabels = numpy.array(['+\
+                           ','.join([ '"'+x+'"' for x in plot['xlabels'] ])+'])\n')
             outputPy.write('    plt.xticks(xData, xLabels, rotation="vertical")\n')
             outputPy.write('\n')
 
@@ -941,7 +995,7 @@ class PlotFlow:
 #        outputPy.write('\n')
 
         # Legend
-        if legendmode:
+        if plot['legend']:
 
             # Reminder for 'loc'
             # -'best'         : 0, (only implemented for axes legends)
@@ -964,7 +1018,7 @@ class PlotFlow:
                            
         # Producing the image
         outputPy.write('    # Saving the image\n')
-        for outputname in outputnames:
+        for outputname in plot['outputs']:
             outputPy.write("    plt.savefig('"+outputname+"')\n")
         outputPy.write('\n')
 
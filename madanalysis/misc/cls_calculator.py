@@ -0,0 +1,332 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+import logging
+import math
+import os
+import time
+
+
+class CLsCalculator():
+
+    # Maximum number of (signal hypothesis, toy) pairs evaluated at once
+    ChunkSize = 5000000
+
+    def __init__(self,NumObserved,ExpectedBG,BGError,NumToyExperiments,seed=None):
+        import numpy
+        import scipy.special
+        self.numpy    = numpy
+        self.pdtr     = scipy.special.pdtr
+        self.nobs     = numpy.floor(NumObserved)
+        self.random   = numpy.random.RandomState(seed)
+
+        # Expected numbers of background events, one for each toy experiment,
+        # distributed according to a Gaussian with the specified mean and
+        # uncertainty (the tail extending to negative numbers is ignored)
+        ExpectedBGs = self.random.normal(loc=ExpectedBG,scale=BGError,size=int(NumToyExperiments))
+        self.ExpectedBGs = ExpectedBGs[ExpectedBGs>0]
+
+        # Common random numbers: the Poisson fluctuation of each toy is driven
+        # by the same uniform number for all signal hypotheses. A toy with the
+        # expected yield mu fluctuates as low as observed if u <= P(N<=nobs|mu)
+        self.uniforms = self.random.uniform(size=len(self.ExpectedBGs))
+
+        # The probability for the background alone to fluctuate as LOW as
+        # observed = p_b (computed once for all the signal hypotheses)
+        self.p_b = self.Probability(self.ExpectedBGs[self.numpy.newaxis,:])[0]
+
+        # CLs values already computed (the root finding may come back to
+        # the same signal yield several times)
+        self.memo = {}
+
+
+    def Probability(self,expected):
+        # Fraction of the toys (last axis) with a yield lower or equal to the
+        # observed number of events (toys with a negative yield are ignored)
+        numpy  = self.numpy
+        valid  = expected>0
+        cdf    = self.pdtr(self.nobs,numpy.where(valid,expected,1.))
+        ntoys  = numpy.sum(valid,axis=-1)
+        nbelow = numpy.sum((self.uniforms<=cdf) & valid,axis=-1)
+        return numpy.where(ntoys>0,nbelow/numpy.maximum(ntoys,1.),-1.)
+
+
+    def Evaluate(self,SigHypotheses):
+        # 1-CLs for a whole vector of signal yields
+        numpy   = self.numpy
+        signals = numpy.atleast_1d(numpy.asarray(SigHypotheses,dtype=float))
+        results = numpy.zeros(len(signals))
+        if len(self.ExpectedBGs)==0 or self.p_b<=0:
+            return results
+        step = max(1,int(CLsCalculator.ChunkSize/len(self.ExpectedBGs)))
+        for begin in range(0,len(signals),step):
+            chunk    = signals[begin:begin+step]
+            expected = self.ExpectedBGs[numpy.newaxis,:] + chunk[:,numpy.newaxis]
+            p_SplusB = self.Probability(expected)
+            results[begin:begin+step] = numpy.where((p_SplusB<0) | (p_SplusB>self.p_b),\
+                                                    0.,1.-p_SplusB/self.p_b)
+        return results
+
+
+    def IsValid(self):
+        # No toy with a background fluctuating as low as observed: the
+        # CLs cannot be computed
+        return len(self.ExpectedBGs)!=0 and self.p_b>0
+
+
+    def __call__(self,SigHypothesis):
+        if SigHypothesis not in self.memo:
+            self.memo[SigHypothesis] = float(self.Evaluate([SigHypothesis])[0])
+        return self.memo[SigHypothesis]
+
+
+    def Uncertainty(self,SigHypothesis):
+        # Statistical uncertainty on 1-CLs due to the finite number of toys
+        # (binomial uncertainties on p_(s+b) and p_b added in quadrature)
+        ntoys = len(self.ExpectedBGs)
+        if ntoys==0 or self.p_b<=0:
+            return 0.
+        CLs = 1.-self(SigHypothesis)
+        p_SplusB = CLs*self.p_b
+        if p_SplusB<=0:
+            return 0.
+        return CLs*math.sqrt((1.-p_SplusB)/(ntoys*p_SplusB)+(1.-self.p_b)/(ntoys*self.p_b))
+
+
+    @staticmethod
+    def IsAvailable():
+        try:
+            import numpy
+            import scipy.special
+        except ImportError:
+            logging.getLogger('MA5').warning('numpy and/or scipy are not installed... '+\
+                                             'the CLs module cannot be used.')
+            logging.getLogger('MA5').warning('Please install numpy and scipy.')
+            return False
+        return True
+
+
+class AsymptoticCLsCalculator():
+
+    def __init__(self,NumObserved,ExpectedBG,BGError):
+        import numpy
+        import scipy.special
+        self.numpy = numpy
+        self.ndtr  = scipy.special.ndtr
+        self.nobs  = float(NumObserved)
+        self.nb    = float(ExpectedBG)
+        self.sigma = abs(float(BGError))
+        self.memo  = {}
+
+
+    def ProfiledBackground(self,nobs,signals):
+        # Background maximizing Pois(n|s+b) x Gauss(nb|b,sigma) for a fixed
+        # signal s: positive root of t^2 + t(sigma^2-s-nb) - n sigma^2 = 0
+        # with t = s+b
+        numpy = self.numpy
+        if self.sigma==0:
+            return numpy.zeros(len(signals))+self.nb
+        sigma2 = self.sigma**2
+        c = sigma2-signals-self.nb
+        t = 0.5*(-c+numpy.sqrt(c*c+4.*nobs*sigma2))
+        return numpy.maximum(t-signals,0.)
+
+
+    def TestStatistic(self,nobs,signals):
+        # One-sided profile likelihood ratio q_s for upper limits
+        # (signal-like fluctuations, i.e. n-nb > s, give q_s = 0)
+        numpy  = self.numpy
+        bhat   = self.ProfiledBackground(nobs,signals)
+        mu     = numpy.maximum(signals+bhat,1e-300)
+        q = 2.*(mu-nobs)
+        if nobs>0:
+            q += 2.*nobs*numpy.log(nobs/mu)
+        if self.sigma>0:
+            q += (bhat-self.nb)**2/self.sigma**2
+        q = numpy.maximum(q,0.)
+        return numpy.where(nobs-self.nb>signals,0.,q)
+
+
+    def Evaluate(self,SigHypotheses):
+        # 1-CLs for a whole vector of signal yields, using the asymptotic
+        # formulae of Cowan, Cranmer, Gross and Vitells (arXiv:1007.1727):
+        # CLs = (1-Phi(sqrt(q))) / Phi(sqrt(q_A)-sqrt(q)), q_A being the
+        # test statistic of the background-only Asimov dataset (n = nb)
+        numpy   = self.numpy
+        signals = numpy.atleast_1d(numpy.asarray(SigHypotheses,dtype=float))
+        sqrtq   = numpy.sqrt(self.TestStatistic(self.nobs,signals))
+        sqrtqA  = numpy.sqrt(self.TestStatistic(self.nb,signals))
+        p_SplusB  = 1.-self.ndtr(sqrtq)
+        one_m_p_b = self.ndtr(sqrtqA-sqrtq)
+        CLs = numpy.where(one_m_p_b>0,p_SplusB/numpy.maximum(one_m_p_b,1e-300),1.)
+        return numpy.where(signals>0,1.-numpy.minimum(CLs,1.),0.)
+
+
+    def IsValid(self):
+        return self.nb>=0
+
+
+    def __call__(self,SigHypothesis):
+        if SigHypothesis not in self.memo:
+            self.memo[SigHypothesis] = float(self.Evaluate([SigHypothesis])[0])
+        return self.memo[SigHypothesis]
+
+
+    def Uncertainty(self,SigHypothesis):
+        # Closed formulae: no statistical uncertainty
+        return 0.
+
+
+def FindLimit(calculator,scale,CL=0.95,NumPerDecade=2,NumRefined=6,NumLevels=3):
+    # Signal yield for which 1-CLs = CL, with its uncertainty. 1-CLs is
+    # evaluated in one batch on a coarse logarithmic grid of signal yields
+    # around 'scale' (1-CLs is monotonic in the signal yield), the grid is
+    # shifted if the crossing is outside, and the bracketing interval is
+    # refined by a few small batches before a linear interpolation.
+    # Returns None if no crossing is found.
+    import numpy
+    low  = -2.
+    high = 2.
+    for trial in range(10):
+        grid   = scale*10.**numpy.linspace(low,high,int((high-low)*NumPerDecade)+1)
+        values = calculator.Evaluate(grid)
+        above  = numpy.nonzero(values>=CL)[0]
+        if len(above)==0:
+            low, high = high, high+4.
+        elif above[0]==0:
+            low, high = low-4., low
+        else:
+            break
+    else:
+        return None
+
+    # Refining the bracketing interval
+    x0, x1 = grid[above[0]-1], grid[above[0]]
+    y0, y1 = values[above[0]-1], values[above[0]]
+    for level in range(NumLevels):
+        fine   = numpy.linspace(x0,x1,NumRefined+1)
+        values = calculator.Evaluate(fine[1:-1])
+        values = numpy.concatenate(([y0],values,[y1]))
+        index  = max(numpy.nonzero(values>=CL)[0][0],1)
+        slope  = (y1-y0)/(x1-x0)
+        x0, x1 = fine[index-1], fine[index]
+        y0, y1 = values[index-1], values[index]
+    if y1>y0:
+        limit = x0+(CL-y0)*(x1-x0)/(y1-y0)
+    else:
+        limit = x1
+
+    # Uncertainty: statistical uncertainty on 1-CLs propagated through the
+    # slope of the curve, and interpolation uncertainty (half a step)
+    error = 0.5*(x1-x0)
+    if slope>0:
+        error = math.sqrt(error**2+(calculator.Uncertainty(limit)/slope)**2)
+    return float(limit), float(error)
+
+
+class CLsCache():
+
+    # Maximum number of limits kept on disk
+    MaxEntries = 100000
+
+    def __init__(self,filename):
+        self.filename = filename
+        self.entries  = {}
+        self.modified = False
+        self.Load()
+
+
+    @staticmethod
+    def Key(nobs,nb,deltanb,method,ntoys,seed):
+        # The limits are expressed in numbers of signal events: they only
+        # depend on the region statistics and on the toy generation (the
+        # 'compare' mode runs the same toys as 'toys', and the asymptotic
+        # formulae use no toys)
+        if method=="asymptotic":
+            return "asymptotic %.10g %.10g %.10g" % (nobs,nb,deltanb)
+        return "toys %.10g %.10g %.10g %d %d" % (nobs,nb,deltanb,ntoys,seed)
+
+
+    def Load(self):
+        if not os.path.isfile(self.filename):
+            return
+        try:
+            input = open(self.filename,'r')
+            for line in input:
+                words = line.rstrip('\n').split('\t')
+                if len(words)!=4:
+                    continue
+                if words[1]=='None':
+                    value = None
+                else:
+                    value = [float(words[1]),float(words[2])]
+                self.entries[words[0]] = [value,float(words[3])]
+            input.close()
+        except:
+            logging.getLogger('MA5').debug('the CLs cache '+self.filename+' is corrupted: ignored')
+            self.entries = {}
+
+
+    def Find(self,key):
+        return key in self.entries
+
+
+    def Get(self,key):
+        self.entries[key][1] = time.time()
+        self.modified = True
+        return self.entries[key][0]
+
+
+    def Set(self,key,value):
+        self.entries[key] = [value,time.time()]
+        self.modified = True
+
+
+    def Save(self):
+        if not self.modified:
+            return True
+
+        # Eviction of the least recently used limits
+        keys = sorted(self.entries.keys(),key=lambda x: self.entries[x][1],reverse=True)
+        for key in keys[CLsCache.MaxEntries:]:
+            del self.entries[key]
+
+        # Writing a temporary file first: several jobs may share the cache
+        try:
+            tmpname = self.filename+'.'+str(os.getpid())
+            output  = open(tmpname,'w')
+            for key in keys[:CLsCache.MaxEntries]:
+                value = self.entries[key][0]
+                if value is None:
+                    value = [None,None]
+                output.write(key+'\t'+repr(value[0])+'\t'+repr(value[1])+'\t'+\
+                             repr(self.entries[key][1])+'\n')
+            output.close()
+            os.rename(tmpname,self.filename)
+        except:
+            logging.getLogger('MA5').debug('impossible to write the CLs cache '+self.filename)
+            return False
+        self.modified = False
+        return True
@@ -0,0 +1,169 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+
+# Timing of the extraction of a large SAF file (python2):
+#   - line-by-line JobReader of MadAnalysis 5, before the shared SafReader
+#     (taken from the git history, if available)
+#   - JobReader with SafReader, parsing the text
+#   - JobReader with SafReader, reading the binary copy (.safb)
+#
+# usage: python2 tests/benchmark_saf_reader.py [nhistos] [nbins] [repeat]
+
+import imp
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOTDIR = os.path.normpath(os.path.dirname(os.path.abspath(__file__))+'/..')
+sys.path.insert(0,ROOTDIR)
+from madanalysis.IOinterface.job_reader import JobReader, ExtractionResult
+from madanalysis.IOinterface.saf_reader import SafReader
+
+
+def WriteSaf(filename,nhistos,nbins):
+    random.seed(12345)
+    output = open(filename,'w')
+    output.write('<SAFheader>\n</SAFheader>\n\n')
+    info = '1.000000e+00   1.000000e-01       10000       1.000000e+04    0.000000e+00   \n'
+    output.write('<SampleGlobalInfo>\n# xsection     xsection_error     nevents     sum_weight+     sum_weight-    \n'+\
+                 info+'</SampleGlobalInfo>\n\n')
+    output.write('<FileInfo>\n"sample.lhe"     # file 1 / 1\n</FileInfo>\n\n')
+    output.write('<SampleDetailedInfo>\n# xsection     xsection_error     nevents     sum_weight+     sum_weight-    \n'+\
+                 info+'</SampleDetailedInfo>\n\n')
+    output.write('<Selection>\n')
+    output.write('<InitialCounter>\n"Initial number of events"      #\n10000 0 # nentries\n'+\
+                 '1.000000e+04 0.000000e+00 # sum of weights\n1.000000e+04 0.000000e+00 # sum of weights^2\n'+\
+                 '</InitialCounter>\n\n')
+    for ihisto in range(nhistos):
+        output.write('<Counter>\n"cut'+str(ihisto)+'"                          # cut\n5000 0 # nentries\n'+\
+                     '5.000000e+03 0.000000e+00 # sum of weights\n5.000000e+03 0.000000e+00 # sum of weights^2\n'+\
+                     '</Counter>\n\n')
+        output.write('<Histo>\n<Description>\n"histo'+str(ihisto)+'"\n# nbins      xmin         xmax\n'+\
+                     str(nbins)+'            0            1000\n</Description>\n')
+        output.write('<Statistics>\n5000 0 # nevents\n5000 0 # sum of event-weights over events\n'+\
+                     '5000 0 # nentries\n5000 0 # sum of event-weights over entries\n'+\
+                     '5000 0 # sum weights^2\n2.500000e+06 0 # sum value*weight\n'+\
+                     '1.250000e+09 0 # sum value^2*weight\n</Statistics>\n')
+        output.write('<Data>\n')
+        for ibin in range(nbins+2):
+            output.write('%e   %e\n' % (random.random()*100.,random.random()))
+        output.write('</Data>\n</Histo>\n\n')
+    output.write('</Selection>\n\n<SAFfooter>\n</SAFfooter>\n')
+    output.close()
+
+
+def OldJobReader(tmpdir):
+    # job_reader.py of the commit preceding the introduction of saf_reader.py
+    try:
+        devnull = open(os.devnull,'w')
+        commits = subprocess.check_output(['git','log','--format=%H','--diff-filter=A','--',\
+                                           'madanalysis/IOinterface/saf_reader.py'],\
+                                          cwd=ROOTDIR,stderr=devnull).split()
+        source  = subprocess.check_output(['git','show',commits[-1]+'^:madanalysis/IOinterface/job_reader.py'],\
+                                          cwd=ROOTDIR,stderr=devnull)
+        devnull.close()
+    except Exception:
+        return None
+    filename = tmpdir+'/old_job_reader.py'
+    output = open(filename,'w')
+    output.write(source)
+    output.close()
+    return imp.load_source('old_job_reader',filename).JobReader
+
+
+def Time(reader,name,repeat):
+    # best time over several extractions
+    best = None
+    for i in range(repeat):
+        result = ExtractionResult(name)
+        start  = time.time()
+        reader.Extract(result,result,0,result,False)
+        elapsed = time.time()-start
+        if best is None or elapsed<best:
+            best = elapsed
+    return best, result
+
+
+def Contents(result):
+    return [ [ float(x) for x in histo.positive.array ] for histo in result.histos ]
+
+
+def main():
+    nhistos = 200
+    nbins   = 1000
+    repeat  = 3
+    if len(sys.argv)>1:
+        nhistos = int(sys.argv[1])
+    if len(sys.argv)>2:
+        nbins   = int(sys.argv[2])
+    if len(sys.argv)>3:
+        repeat  = int(sys.argv[3])
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        name     = 'bench'
+        filename = tmpdir+'/Output/_'+name+'/MadAnalysis5job.saf'
+        os.makedirs(os.path.dirname(filename))
+        WriteSaf(filename,nhistos,nbins)
+        print 'SAF file: '+str(nhistos)+' histograms of '+str(nbins)+' bins, '+\
+              '%.1f MB, numpy: %s' % (os.path.getsize(filename)/1e6,SafReader.HasNumpy())
+
+        results = []
+        oldreader = OldJobReader(tmpdir)
+        if oldreader is None:
+            print '%-36s: not available (no git history)' % 'line-by-line reader'
+        else:
+            elapsed, result = Time(oldreader(tmpdir),name,repeat)
+            results.append(result)
+            print '%-36s: %8.3f s' % ('line-by-line reader',elapsed)
+
+        elapsed, result = Time(JobReader(tmpdir),name,repeat)
+        results.append(result)
+        print '%-36s: %8.3f s' % ('SafReader (text)',elapsed)
+
+        start = time.time()
+        SafReader(filename).WriteBinary()
+        print '%-36s: %8.3f s' % ('writing the binary copy (python)',time.time()-start)
+        elapsed, result = Time(JobReader(tmpdir),name,repeat)
+        results.append(result)
+        print '%-36s: %8.3f s' % ('SafReader (binary copy)',elapsed)
+
+        for result in results[1:]:
+            if Contents(result)!=Contents(results[0]):
+                print 'ERROR: the histogram contents differ'
+                return 1
+        print 'same histogram contents for all the readers'
+    finally:
+        shutil.rmtree(tmpdir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0,os.path.normpath(os.path.dirname(os.path.abspath(__file__))+'/..'))
+sys.path.insert(0,os.path.normpath(os.path.dirname(os.path.abspath(__file__))+\
+                                   '/../tools/ReportGenerator/Services'))
+
+try:
+    import numpy
+    import scipy.optimize
+    import scipy.special
+    import scipy.stats
+    HasScipy = True
+except ImportError:
+    HasScipy = False
+
+from madanalysis.misc.cls_calculator import CLsCalculator, AsymptoticCLsCalculator, FindLimit
+
+
+def ReferenceCLs(NumObserved,ExpectedBG,BGError,SigHypothesis,NumToyExperiments):
+    # 1-CLs as computed before the vectorized toy engine (one set of toys
+    # for each signal hypothesis, numpy global random state)
+    ExpectedBGs = scipy.stats.norm.rvs(loc=ExpectedBG,scale=BGError,size=NumToyExperiments)
+    ExpectedBGs = [value for value in ExpectedBGs if value > 0]
+    ToyBGs = map(float,scipy.stats.poisson.rvs(ExpectedBGs))
+    p_b = scipy.stats.percentileofscore(ToyBGs,NumObserved,kind='weak')*.01
+    ExpectedBGandS = [expectedbg + SigHypothesis for expectedbg in ExpectedBGs]
+    ExpectedBGandS = [x for x in ExpectedBGandS if x > 0]
+    if len(ExpectedBGandS)==0:
+        return 0.
+    ToyBplusS = map(float,scipy.stats.poisson.rvs(ExpectedBGandS))
+    p_SplusB = scipy.stats.percentileofscore(ToyBplusS,NumObserved,kind='weak')*.01
+    if p_SplusB>p_b:
+        return 0.
+    return 1.-(p_SplusB/p_b)
+
+
+def ReferenceN95(nobs,nb,deltanb,ntoys):
+    # 95% CL limit as found before: bracketing by factors of 10, then
+    # Brent's method on the noisy toy CLs
+    function = lambda s: ReferenceCLs(nobs,nb,deltanb,s,ntoys)-0.95
+    low  = 1.
+    high = 1.
+    while function(low)>0:
+        low *= 0.1
+    while function(high)<0:
+        high *= 10.
+    return scipy.optimize.brentq(function,low,high,xtol=low/100.)
+
+
+def ExactN95(nobs,nb):
+    # Known background: CLs = P(n<=nobs|s+b) / P(n<=nobs|b)
+    function = lambda s: 0.05-scipy.special.pdtr(nobs,s+nb)/scipy.special.pdtr(nobs,nb)
+    return scipy.optimize.brentq(function,1e-6,1e3,xtol=1e-10)
+
+
+def ProfiledQ(nobs,nb,sigma,s):
+    # One-sided profile likelihood ratio, the nuisance parameter being
+    # profiled numerically (independent of the closed formulae)
+    def NLL(s,b):
+        mu = s+b
+        value = 2.*mu
+        if nobs>0:
+            value -= 2.*nobs*math.log(mu)
+        if sigma>0:
+            value += (b-nb)**2/sigma**2
+        return value
+    def Profile(s):
+        if sigma==0:
+            return NLL(s,nb)
+        result = scipy.optimize.minimize_scalar(lambda b: NLL(s,b),\
+                                                bounds=(max(1e-9,1e-9-s),nb+20.*sigma),\
+                                                method='bounded',options={'xatol':1e-10})
+        return result.fun
+    # q_s of arXiv:1007.1727 (unconstrained signal estimate, s^ = n-nb)
+    if nobs-nb>s:
+        return 0.
+    return max(Profile(s)-Profile(nobs-nb),0.)
+
+
+def AsymptoticN95(nobs,nb,sigma):
+    # CLs = (1-Phi(sqrt(q))) / Phi(sqrt(q_A)-sqrt(q)) = 0.05
+    def function(s):
+        sqrtq  = math.sqrt(ProfiledQ(nobs,nb,sigma,s))
+        sqrtqA = math.sqrt(ProfiledQ(nb,nb,sigma,s))
+        return 0.05-(1.-scipy.special.ndtr(sqrtq))/scipy.special.ndtr(sqrtqA-sqrtq)
+    return scipy.optimize.brentq(function,1e-3,1e3,xtol=1e-8)
+
+
+@unittest.skipUnless(HasScipy,'numpy and scipy are required')
+class TestToyCLs(unittest.TestCase):
+
+    NumToys = 100000
+
+    def Limit(self,nobs,nb,deltanb,seed=12345):
+        calculator = CLsCalculator(nobs,nb,deltanb,self.NumToys,seed)
+        return FindLimit(calculator,max(nobs,nb+deltanb,1.),0.95)
+
+    def test_against_previous_implementation(self):
+        # s95 of the vectorized engine and of the previous bisection on
+        # independent toys: the differences are of the order of 1%
+        numpy.random.seed(1)
+        for nobs, nb, deltanb in [(5,3.,0.),(10,10.,2.),(100,100.,10.)]:
+            limit, error = self.Limit(nobs,nb,deltanb)
+            reference    = ReferenceN95(nobs,nb,deltanb,self.NumToys)
+            self.assertTrue(abs(limit-reference)<0.03*reference,\
+                            str((nobs,nb,deltanb,limit,reference)))
+
+    def test_cls_against_previous_implementation(self):
+        numpy.random.seed(2)
+        calculator = CLsCalculator(10,10.,2.,self.NumToys,12345)
+        for signal in [4.,9.,13.]:
+            reference = ReferenceCLs(10,10.,2.,signal,self.NumToys)
+            self.assertTrue(abs(calculator(signal)-reference)<5*calculator.Uncertainty(signal)+0.002,\
+                            str((signal,calculator(signal),reference)))
+
+    def test_known_background(self):
+        # Without uncertainty, the toys estimate the exact Poisson CLs
+        # (nobs=0 and b=0: s95 = -ln(0.05) = 2.996)
+        self.assertAlmostEqual(ExactN95(0,1e-9),-math.log(0.05),places=6)
+        for nobs, nb in [(0,1e-9),(5,3.),(20,25.)]:
+            limit, error = self.Limit(nobs,nb,0.)
+            exact = ExactN95(nobs,nb)
+            self.assertTrue(abs(limit-exact)<4*error,str((nobs,nb,limit,error,exact)))
+
+    def test_fixed_seed(self):
+        self.assertEqual(self.Limit(10,10.,2.,seed=7),self.Limit(10,10.,2.,seed=7))
+
+
+@unittest.skipUnless(HasScipy,'numpy and scipy are required')
+class TestAsymptoticCLs(unittest.TestCase):
+
+    def Limit(self,nobs,nb,deltanb):
+        calculator = AsymptoticCLsCalculator(nobs,nb,deltanb)
+        return FindLimit(calculator,max(nobs,nb+deltanb,1.),0.95)
+
+    def test_expected_limit_known_background(self):
+        # Asimov dataset, known background: CLs = 2(1-Phi(sqrt(q_A))) with
+        # q_A = 2(s - b ln(1+s/b)), i.e. s - b ln(1+s/b) = 1.95996^2/2
+        for nb in [1.,10.,100.]:
+            target = scipy.special.ndtri(0.975)**2/2.
+            known  = scipy.optimize.brentq(lambda s: s-nb*math.log(1.+s/nb)-target,1e-6,1e3,xtol=1e-12)
+            limit, error = self.Limit(nb,nb,0.)
+            self.assertTrue(abs(limit-known)<max(error,1e-3*known),str((nb,limit,known)))
+
+    def test_against_profile_likelihood(self):
+        for nobs, nb, deltanb in [(10,10.,2.),(100,100.,10.),(3,5.,1.),(15,10.,3.)]:
+            limit, error = self.Limit(nobs,nb,deltanb)
+            reference    = AsymptoticN95(nobs,nb,deltanb)
+            self.assertTrue(abs(limit-reference)<max(error,1e-3*reference),\
+                            str((nobs,nb,deltanb,limit,reference)))
+
+    def test_large_counts_agree_with_toys(self):
+        limit, error = self.Limit(100,100.,10.)
+        toys = FindLimit(CLsCalculator(100,100.,10.,100000,12345),110.,0.95)
+        self.assertTrue(abs(limit-toys[0])<0.05*toys[0],str((limit,toys)))
+
+
+@unittest.skipUnless(HasScipy,'numpy and scipy are required')
+class TestFindLimit(unittest.TestCase):
+
+    class Flat():
+        def Evaluate(self,signals):
+            return numpy.zeros(len(signals))
+        def Uncertainty(self,signal):
+            return 0.
+
+    def test_no_crossing(self):
+        # GetN95 turns this into a limit of -1 (no limit)
+        self.assertTrue(FindLimit(TestFindLimit.Flat(),10.,0.95) is None)
+
+    def test_monotonic_interpolation(self):
+        # Exact CLs with a known background: the grid search converges to
+        # the root found by Brent's method
+        class Exact():
+            def Evaluate(self,signals):
+                return 1.-scipy.special.pdtr(5,numpy.asarray(signals)+3.)/scipy.special.pdtr(5,3.)
+            def Uncertainty(self,signal):
+                return 0.
+        limit, error = FindLimit(Exact(),5.,0.95)
+        self.assertTrue(abs(limit-ExactN95(5,3.))<=error+1e-9,str((limit,error,ExactN95(5,3.))))
+
+
+class TestCLsOutput(unittest.TestCase):
+
+    def test_limit_uncertainties_are_written(self):
+        # sig95 and its numerical uncertainty, for the expected and the
+        # observed limits
+        from madanalysis.configuration.recast_configuration import RecastConfiguration
+        import StringIO
+        regiondata = { 'SR1': { 'Nf': 50., 'N0': 100., \
+                                's95exp': '1.5000000', 's95exp_err': '0.0100000', \
+                                's95obs': '2.0000000', 's95obs_err': '0.0200000' } }
+        output = StringIO.StringIO()
+        RecastConfiguration().WriteCLs('','ana',['SR1'],regiondata,output,True)
+        self.assertEqual(output.getvalue().split()[:6],\
+                         ['ana','SR1','1.5000000','0.0100000','2.0000000','0.0200000'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0,os.path.normpath(os.path.dirname(os.path.abspath(__file__))+'/..'))
+from madanalysis.IOinterface.delphes_cache import DelphesCache
+
+
+class ArchiInfo():
+    def __init__(self,ma5dir):
+        self.ma5dir = ma5dir
+
+
+class Main():
+    def __init__(self,ma5dir):
+        self.archi_info = ArchiInfo(ma5dir)
+
+
+class TestDelphesCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(self.folder+'/tools')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def WriteFile(self,name,text):
+        output = open(self.folder+'/'+name,'w')
+        output.write(text)
+        output.close()
+        return self.folder+'/'+name
+
+    def Index(self):
+        input = open(self.folder+'/tools/DelphesCache/hashes.ma5')
+        lines = [ line.split('\t')[0].rsplit(' ',2)[0] for line in input ]
+        input.close()
+        return lines
+
+    def test_eviction_prunes_the_hash_index(self):
+        cache = DelphesCache(Main(self.folder),1)
+        kept    = self.WriteFile('kept.lhe','kept')
+        removed = self.WriteFile('removed.lhe','removed')
+        cache.HashFile(kept)
+        cache.HashFile(removed)
+        self.assertEqual(self.Index(),[kept,removed])
+
+        # An entry larger than the cache is evicted when the cache is cleaned
+        os.remove(removed)
+        os.makedirs(cache.cache+'/entry')
+        self.WriteFile('tools/DelphesCache/entry/'+DelphesCache.EventFile,'events')
+        cache.Clean()
+        self.assertFalse(os.path.isdir(cache.cache+'/entry'))
+        self.assertEqual(self.Index(),[kept])
+        self.assertEqual(list(DelphesCache(Main(self.folder),1).hashes.keys()),\
+                         list(cache.hashes.keys()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0,os.path.normpath(os.path.dirname(os.path.abspath(__file__))+'/..'))
+sys.path.insert(0,os.path.normpath(os.path.dirname(os.path.abspath(__file__))+\
+                                   '/../tools/ReportGenerator/Services'))
+from madanalysis.IOinterface.job_writer import JobWriter
+
+
+class Dataset():
+    def __init__(self,name):
+        self.name = name
+
+
+class Job():
+    # Stand-in for a JobWriter: each run writes its dataset name in its own
+    # folder of the job, fails if the name starts with 'bad'
+    def __init__(self,path):
+        self.path = path
+        self.logs = []
+
+    def GetNumberOfShards(self,dataset,nshards):
+        return 1
+
+    def GetRunCommands(self,dataset,shard=-1):
+        folder = self.path+'/'+dataset.name
+        os.makedirs(folder)
+        if dataset.name.startswith('bad'):
+            return ['sh','-c','exit 1'], folder
+        return ['sh','-c','sleep 0.2; echo '+dataset.name+' > output'], folder
+
+    def DumpRunLog(self,label,logfile,elapsed):
+        self.logs.append(label)
+
+
+class TestRunSeveralJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_runs_of_all_the_jobs(self):
+        # two jobs (two detector cards), each one with its own folder
+        jobs = [ Job(self.tmpdir+'/card1'), Job(self.tmpdir+'/card2') ]
+        done = []
+        def Callback(item,result):
+            done.append(item.name)
+            return result
+        datasets = [ Dataset('a'), Dataset('bad'), Dataset('c') ]
+        results  = JobWriter.RunSeveralJobs([ [jobs[0],datasets,Callback,"card 'card1'"],\
+                                              [jobs[1],datasets[:1],None,"card 'card2'"] ],3)
+        self.assertEqual([ [ [x[0].name,x[1]] for x in job ] for job in results ],\
+                         [ [['a',True],['bad',False],['c',True]], [['a',True]] ])
+        self.assertEqual(sorted(done),['a','bad','c'])
+        self.assertTrue("dataset 'a' (card 'card2')" in jobs[1].logs)
+        for job in jobs:
+            self.assertEqual(open(job.path+'/a/output').read().strip(),'a')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0,os.path.normpath(os.path.dirname(os.path.abspath(__file__))+'/..'))
+sys.path.insert(0,os.path.normpath(os.path.dirname(os.path.abspath(__file__))+\
+                                   '/../tools/ReportGenerator/Services'))
+from madanalysis.IOinterface.saf_merger import SafMerger
+from madanalysis.IOinterface.job_writer import JobWriter
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))+'/fixtures/saf'
+
+
+def ReadValues(filename):
+    # Content lines without the comments: numbers when the line is numerical
+    values = []
+    input  = open(filename,'r')
+    for line in input:
+        value, comment = SafMerger.SplitLine(line)
+        if value=='':
+            continue
+        numbers = SafMerger.ToNumbers(value.split())
+        if numbers is None:
+            values.append(value)
+        else:
+            values.append(numbers)
+    input.close()
+    return values
+
+
+class TestSafMerger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def Merge(self,inputs):
+        output = self.tmpdir+'/merged.saf'
+        result = SafMerger.Merge([ FIXTURES+'/'+x for x in inputs ],output)
+        return result, output
+
+    def test_shards_match_unsharded_run(self):
+        # Two shards (files f1+f2 and f3) against the hand-computed output
+        # of a single run over the three files
+        result, output = self.Merge(['shard0.saf','shard1.saf'])
+        self.assertTrue(result)
+        merged    = ReadValues(output)
+        reference = ReadValues(FIXTURES+'/unsharded.saf')
+        self.assertEqual(len(merged),len(reference))
+        for i in range(len(reference)):
+            if isinstance(reference[i],list):
+                self.assertTrue(isinstance(merged[i],list),merged[i])
+                self.assertEqual(len(merged[i]),len(reference[i]))
+                for x, y in zip(merged[i],reference[i]):
+                    # the reference is written with 7 significant digits
+                    self.assertTrue(abs(x-y)<=1e-6*max(abs(y),1.),\
+                                    str(merged[i])+' != '+str(reference[i]))
+            else:
+                self.assertEqual(merged[i],reference[i])
+
+    def test_single_shard_is_unchanged(self):
+        result, output = self.Merge(['shard1.saf'])
+        self.assertTrue(result)
+        self.assertEqual(ReadValues(output),ReadValues(FIXTURES+'/shard1.saf'))
+
+    def test_different_structures_are_not_merged(self):
+        other = self.tmpdir+'/other.saf'
+        input = open(FIXTURES+'/shard1.saf','r')
+        text  = input.read().replace('<HistoFrequency>','<HistoLogX>')\
+                            .replace('</HistoFrequency>','</HistoLogX>')
+        input.close()
+        output = open(other,'w')
+        output.write(text)
+        output.close()
+        self.assertFalse(SafMerger.Merge([FIXTURES+'/shard0.saf',other],self.tmpdir+'/merged.saf'))
+
+
+class TestMergeShards(unittest.TestCase):
+
+    class Main():
+        output  = ''
+        fastsim = None
+        merging = None
+
+    class Dataset():
+        name = 'd'
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for shard in ['shard0','shard1']:
+            os.makedirs(self.tmpdir+'/Output/_d.'+shard)
+            shutil.copy(FIXTURES+'/'+shard+'.saf',self.tmpdir+'/Output/_d.'+shard+'/MadAnalysis5job.saf')
+        self.jobber = JobWriter(TestMergeShards.Main(),self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shards_are_merged(self):
+        self.assertTrue(self.jobber.MergeShards(TestMergeShards.Dataset(),2))
+        self.assertTrue(os.path.isfile(self.tmpdir+'/Output/_d/MadAnalysis5job.saf'))
+        self.assertFalse(os.path.isdir(self.tmpdir+'/Output/_d.shard0'))
+
+    def test_missing_selection_output(self):
+        # the first shard has failed: no partial result
+        os.remove(self.tmpdir+'/Output/_d.shard0/MadAnalysis5job.saf')
+        self.assertFalse(self.jobber.MergeShards(TestMergeShards.Dataset(),2))
+        self.assertFalse(os.path.isfile(self.tmpdir+'/Output/_d/MadAnalysis5job.saf'))
+        self.assertTrue(os.path.isdir(self.tmpdir+'/Output/_d.shard1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
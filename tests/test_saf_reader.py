@@ -0,0 +1,114 @@
+################################################################################
+#
+#  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://launchpad.net/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0,os.path.normpath(os.path.dirname(os.path.abspath(__file__))+'/..'))
+from madanalysis.IOinterface.saf_reader import SafReader
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))+'/fixtures/saf'
+
+
+def Dump(block):
+    # Tags, line numbers and content of a block tree (numerical content of
+    # the <Data> and <Statistics> blocks, lines of the other blocks)
+    result = [block.tag,block.numline]
+    if block.tag in SafReader.BinaryBlocks:
+        for ncolumns in [2,3]:
+            table = SafReader.Table(block,ncolumns)
+            if table is not None:
+                break
+        result.append([ list(row) for row in table ])
+    else:
+        result.append([ line[2] for line in block.Lines() ])
+    result.append([ Dump(child) for child in block.children ])
+    return result
+
+
+class TestSafReader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name in ['shard0.saf','unsharded.saf']:
+            shutil.copy(FIXTURES+'/'+name,self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def Read(self,filename):
+        reader = SafReader(filename)
+        self.assertTrue(reader.Read())
+        return reader
+
+    def test_binary_copy_gives_the_text_content(self):
+        filename = self.tmpdir+'/shard0.saf'
+        text = Dump(self.Read(filename).root)
+        self.assertTrue(SafReader(filename).WriteBinary())
+        reader = SafReader(filename)
+        input = open(filename,'rb')
+        self.assertTrue(reader.ReadBinary(input.read()))
+        input.close()
+        self.assertEqual(Dump(reader.root),text)
+
+    def test_binary_copy_of_sampleanalyzer(self):
+        # unsharded.safb has been written by SAFWriter::WriteBinary (C++):
+        # the python writer gives the same bytes
+        filename = self.tmpdir+'/unsharded.saf'
+        self.assertTrue(SafReader(filename).WriteBinary())
+        input = open(filename+'b','rb')
+        data  = input.read()
+        input.close()
+        input = open(FIXTURES+'/unsharded.safb','rb')
+        self.assertEqual(data,input.read())
+        input.close()
+
+    def test_outdated_binary_copy_is_ignored(self):
+        filename = self.tmpdir+'/shard0.saf'
+        self.assertTrue(SafReader(filename).WriteBinary())
+        before = Dump(self.Read(filename).root)
+
+        # same size and modification time, other content
+        input = open(filename,'rb')
+        text  = input.read()
+        input.close()
+        stat  = os.stat(filename)
+        output = open(filename,'wb')
+        output.write(text.replace('1.000000e+00','2.000000e+00',1))
+        output.close()
+        os.utime(filename,(stat.st_atime,stat.st_mtime))
+
+        after = Dump(self.Read(filename).root)
+        self.assertNotEqual(after,before)
+        os.remove(filename+'b')
+        self.assertEqual(Dump(self.Read(filename).root),after)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -152,16 +152,12 @@ class Main():
                 return False
 
         logging.getLogger('MA5').info("   Extracting data from the output files...")
-        for i in range(0,len(self.main.datasets)):
-            jobber.Extract(self.main.datasets[i],\
-                           layout.cutflow.detail[i],\
-                           0,\
-                           layout.plotflow.detail[i],\
-                           domerging=False)
-            if self.main.merging.enable:
-                jobber.Extract(self.main.datasets[i],\
-                               0,\
-                               layout.merging.detail[i],\
-                               0,\
-                               domerging=True)
+        mergings = None
+        if self.main.merging.enable:
+            mergings = layout.merging.detail
+        jobber.ExtractDatasets(self.main.datasets,\
+                               layout.cutflow.detail,\
+                               mergings,\
+                               layout.plotflow.detail,\
+                               self.main.merging.enable)
         return True    
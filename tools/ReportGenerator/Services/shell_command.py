@@ -105,6 +105,34 @@ class ShellCommand():
         return (result.returncode==0)
 
 
+    @staticmethod
+    def Launch(theCommands,logfile,path,silent=False,mode='w'):
+
+        # Open the log file ('a' to append to the log of a previous command)
+        try:
+            output = open(logfile,mode)
+        except:
+            if not silent:
+                logging.getLogger('MA5').error('impossible to write the file '+logfile)
+            return None
+
+        # Launching the commands without waiting for them
+        # (stdout and stderr are redirected to the log file)
+        try:
+            result=subprocess.Popen(theCommands, stdout=output, stderr=subprocess.STDOUT, cwd=path)
+        except:
+            if not silent:
+                logging.getLogger('MA5').error('impossible to execute the commands: '+' '.join(theCommands))
+            output.close()
+            return None
+
+        # The child process keeps its own copy of the file descriptor
+        output.close()
+
+        # Return the process handler
+        return result
+
+
     @staticmethod
     def ExecuteWithMA5Logging(theCommands,path,silent=False):
         logging.getLogger('MA5')
@@ -58,6 +58,8 @@ void Configuration::PrintSyntax()
        << endmsg;
   INFO << "   --no_event_weight  : the event weights are not used"
        << endmsg;
+  INFO << "   --saf_binary       : a binary copy of the SAF files is also written"
+       << endmsg;
   INFO << endmsg;
 }
 
@@ -106,6 +108,9 @@ bool Configuration::Initialize(int &argc, char *argv[], const bool &useRSM)
     // weighted event
     else if (option=="--no_event_weight") no_event_weight_ = true;
 
+    // binary copy of the SAF files
+    else if (option=="--saf_binary") saf_binary_ = true;
+
     // version
     else if (option.find("--ma5_version=")==0)
     {
@@ -167,7 +172,7 @@ void Configuration::Display()
   INFO << "      - general: ";
 
   // Is there option ?
-  if (!check_event_ && !no_event_weight_)
+  if (!check_event_ && !no_event_weight_ && !saf_binary_)
   {
     INFO << "everything is default." << endmsg;
     return;
@@ -182,4 +187,6 @@ void Configuration::Display()
     INFO << "     -> checking the event file format." << endmsg;
   if (no_event_weight_) 
     INFO << "     -> event weights are not used." << endmsg;
+  if (saf_binary_) 
+    INFO << "     -> binary copies of the SAF files are written." << endmsg;
 }
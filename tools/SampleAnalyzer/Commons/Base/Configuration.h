@@ -60,6 +60,9 @@ class Configuration
     /// option : veto to event weights
     MAbool no_event_weight_;
 
+    /// option : binary copy of the SAF files
+    MAbool saf_binary_;
+
     /// input list name
     std::string input_list_name_;
 
@@ -136,6 +139,7 @@ class Configuration
     void Reset()
     {
       no_event_weight_ = false;
+      saf_binary_      = false;
       check_event_     = false;
       input_list_name_ = "";
     }
@@ -148,6 +152,10 @@ class Configuration
     MAbool IsNoEventWeight() const
     { return no_event_weight_; }
 
+    /// Accessor to SafBinary
+    MAbool IsSafBinary() const
+    { return saf_binary_; }
+
     /// Accessor to CheckEvent
     MAbool IsCheckEvent() const
     { return check_event_; }
@@ -0,0 +1,382 @@
+////////////////////////////////////////////////////////////////////////////////
+//  
+//  Copyright (C) 2012-2016 Eric Conte, Benjamin Fuks
+//  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+//  
+//  This file is part of MadAnalysis 5.
+//  Official website: <https://launchpad.net/madanalysis5>
+//  
+//  MadAnalysis 5 is free software: you can redistribute it and/or modify
+//  it under the terms of the GNU General Public License as published by
+//  the Free Software Foundation, either version 3 of the License, or
+//  (at your option) any later version.
+//  
+//  MadAnalysis 5 is distributed in the hope that it will be useful,
+//  but WITHOUT ANY WARRANTY; without even the implied warranty of
+//  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+//  GNU General Public License for more details.
+//  
+//  You should have received a copy of the GNU General Public License
+//  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+//  
+////////////////////////////////////////////////////////////////////////////////
+
+
+// STL headers
+#include <iostream>
+#include <fstream>
+#include <sstream>
+#include <string>
+#include <vector>
+
+// ROOT headers
+#include <TAxis.h>
+#include <TH1F.h>
+#include <TLegend.h>
+#include <TCanvas.h>
+#include <THStack.h>
+#include <TStyle.h>
+#include <TList.h>
+#include <TMath.h>
+#include <TROOT.h>
+
+
+// -----------------------------------------------------------------------
+// Description of a histogram (one per dataset)
+// -----------------------------------------------------------------------
+struct HistoDescription
+{
+  std::string         name;
+  unsigned int        nbins;
+  double              xmin;
+  double              xmax;
+  std::vector<double> contents;  // underflow, bins, overflow
+  double              entries;
+  int                 linecolor;
+  int                 linestyle;
+  int                 linewidth;
+  int                 fillcolor;
+  int                 fillstyle;
+  bool                bar;
+  double              barwidth;
+  double              baroffset;
+  bool                haslegend;
+  std::string         legend;
+
+  HistoDescription()
+  {
+    nbins=0; xmin=0.; xmax=0.; entries=0.;
+    linecolor=0; linestyle=0; linewidth=1; fillcolor=0; fillstyle=0;
+    bar=false; barwidth=0.; baroffset=0.; haslegend=false;
+  }
+};
+
+
+// -----------------------------------------------------------------------
+// Description of a plot (written by PlotFlow.DrawROOT)
+// -----------------------------------------------------------------------
+struct PlotDescription
+{
+  std::string                   canvas;
+  unsigned int                  width;
+  unsigned int                  height;
+  double                        rightmargin;
+  std::vector<double>           binning;
+  std::vector<HistoDescription> histos;
+  std::string                   stack;
+  std::string                   drawoption;
+  double                        ytitlesize;
+  std::string                   xtitle;
+  std::string                   ytitle;
+  std::vector<int>              binindices;
+  std::vector<std::string>      binlabels;
+  int                           logx;
+  int                           logy;
+  std::vector<std::string>      outputs;
+
+  PlotDescription()
+  {
+    width=700; height=500; rightmargin=0.05; ytitlesize=0.06;
+    stack="mystack"; logx=0; logy=0;
+  }
+};
+
+
+// -----------------------------------------------------------------------
+// Rest of a line after the keyword
+// -----------------------------------------------------------------------
+std::string RestOfLine(std::istringstream& str)
+{
+  std::string rest;
+  std::getline(str,rest);
+  std::size_t first = rest.find_first_not_of(" \t");
+  if (first==std::string::npos) return "";
+  std::size_t last = rest.find_last_not_of(" \t\r");
+  return rest.substr(first,last-first+1);
+}
+
+
+// -----------------------------------------------------------------------
+// Reading a plot description
+// -----------------------------------------------------------------------
+bool ReadPlot(const std::string& filename, PlotDescription& plot)
+{
+  std::ifstream input(filename.c_str());
+  if (!input)
+  {
+    std::cout << "ERROR: impossible to read the file '" << filename << "'" << std::endl;
+    return false;
+  }
+
+  std::string line;
+  unsigned int numline=0;
+  while (std::getline(input,line))
+  {
+    numline++;
+    std::istringstream str(line);
+    std::string keyword;
+    if (!(str >> keyword)) continue;
+    if (keyword[0]=='#') continue;
+
+    bool ok = true;
+    if (keyword=="canvas")
+      ok = !(str >> plot.canvas >> plot.width >> plot.height).fail();
+    else if (keyword=="rightmargin")
+      ok = !(str >> plot.rightmargin).fail();
+    else if (keyword=="binning")
+    {
+      double value;
+      while (str >> value) plot.binning.push_back(value);
+    }
+    else if (keyword=="histo")
+    {
+      plot.histos.push_back(HistoDescription());
+      ok = !(str >> plot.histos.back().name >> plot.histos.back().nbins
+                >> plot.histos.back().xmin >> plot.histos.back().xmax).fail();
+    }
+    else if (keyword=="stack")
+      ok = !(str >> plot.stack).fail();
+    else if (keyword=="drawoption")
+      plot.drawoption = RestOfLine(str);
+    else if (keyword=="ytitlesize")
+      ok = !(str >> plot.ytitlesize).fail();
+    else if (keyword=="xtitle")
+      plot.xtitle = RestOfLine(str);
+    else if (keyword=="ytitle")
+      plot.ytitle = RestOfLine(str);
+    else if (keyword=="binlabel")
+    {
+      int bin;
+      ok = !(str >> bin).fail();
+      plot.binindices.push_back(bin);
+      plot.binlabels.push_back(RestOfLine(str));
+    }
+    else if (keyword=="logx")
+      ok = !(str >> plot.logx).fail();
+    else if (keyword=="logy")
+      ok = !(str >> plot.logy).fail();
+    else if (keyword=="output")
+      plot.outputs.push_back(RestOfLine(str));
+
+    // Keywords related to the last histogram
+    else if (plot.histos.empty())
+      ok = false;
+    else if (keyword=="content")
+    {
+      double value;
+      while (str >> value) plot.histos.back().contents.push_back(value);
+    }
+    else if (keyword=="entries")
+      ok = !(str >> plot.histos.back().entries).fail();
+    else if (keyword=="style")
+      ok = !(str >> plot.histos.back().linecolor >> plot.histos.back().linestyle
+                >> plot.histos.back().linewidth >> plot.histos.back().fillcolor
+                >> plot.histos.back().fillstyle).fail();
+    else if (keyword=="bar")
+    {
+      plot.histos.back().bar = true;
+      ok = !(str >> plot.histos.back().barwidth >> plot.histos.back().baroffset).fail();
+    }
+    else if (keyword=="legend")
+    {
+      plot.histos.back().haslegend = true;
+      plot.histos.back().legend    = RestOfLine(str);
+    }
+    else ok = false;
+
+    if (!ok)
+    {
+      std::cout << "ERROR: wrong line " << numline << " in the file '"
+                << filename << "': " << line << std::endl;
+      return false;
+    }
+  }
+
+  // Checking the consistency
+  if (plot.histos.empty())
+  {
+    std::cout << "ERROR: no histogram found in the file '" << filename << "'" << std::endl;
+    return false;
+  }
+  for (unsigned int i=0;i<plot.histos.size();i++)
+  {
+    if (plot.histos[i].contents.size()!=plot.histos[i].nbins+2 ||
+        (!plot.binning.empty() && plot.binning.size()!=plot.histos[i].nbins+1))
+    {
+      std::cout << "ERROR: wrong binning for the histogram '" << plot.histos[i].name
+                << "' in the file '" << filename << "'" << std::endl;
+      return false;
+    }
+  }
+  return true;
+}
+
+
+// -----------------------------------------------------------------------
+// Drawing a plot (same settings as the macros written by PlotFlow.DrawROOT)
+// -----------------------------------------------------------------------
+bool DrawPlot(const PlotDescription& plot)
+{
+  // Creating a new TCanvas
+  TCanvas* canvas = new TCanvas(plot.canvas.c_str(),plot.canvas.c_str(),0,0,plot.width,plot.height);
+  gStyle->SetOptStat(0);
+  gStyle->SetOptTitle(0);
+  canvas->SetHighLightColor(2);
+  canvas->SetFillColor(0);
+  canvas->SetBorderMode(0);
+  canvas->SetBorderSize(3);
+  canvas->SetFrameBorderMode(0);
+  canvas->SetFrameBorderSize(0);
+  canvas->SetTickx(1);
+  canvas->SetTicky(1);
+  canvas->SetLeftMargin(0.14);
+  canvas->SetRightMargin(plot.rightmargin);
+  canvas->SetBottomMargin(0.15);
+  canvas->SetTopMargin(0.05);
+
+  // Creating the TH1F
+  std::vector<TH1F*> histos;
+  for (unsigned int i=0;i<plot.histos.size();i++)
+  {
+    const HistoDescription& desc = plot.histos[i];
+    TH1F* histo = 0;
+    if (plot.binning.empty())
+      histo = new TH1F(desc.name.c_str(),desc.name.c_str(),desc.nbins,desc.xmin,desc.xmax);
+    else
+      histo = new TH1F(desc.name.c_str(),desc.name.c_str(),desc.nbins,&plot.binning[0]);
+
+    // Content
+    for (unsigned int bin=0;bin<desc.contents.size();bin++)
+      histo->SetBinContent(bin,desc.contents[bin]);
+    histo->SetEntries(desc.entries);
+
+    // Style
+    histo->SetLineColor(desc.linecolor);
+    histo->SetLineStyle(desc.linestyle);
+    histo->SetLineWidth(desc.linewidth);
+    histo->SetFillColor(desc.fillcolor);
+    histo->SetFillStyle(desc.fillstyle);
+    if (desc.bar)
+    {
+      histo->SetBarWidth(desc.barwidth);
+      histo->SetBarOffset(desc.baroffset);
+    }
+    histos.push_back(histo);
+  }
+
+  // Creating the THStack
+  THStack* stack = new THStack(plot.stack.c_str(),"mystack");
+  for (unsigned int i=0;i<histos.size();i++) stack->Add(histos[i]);
+  stack->Draw(plot.drawoption.c_str());
+
+  // Y axis
+  stack->GetYaxis()->SetLabelSize(0.04);
+  stack->GetYaxis()->SetLabelOffset(0.005);
+  stack->GetYaxis()->SetTitleSize(plot.ytitlesize);
+  stack->GetYaxis()->SetTitleFont(22);
+  stack->GetYaxis()->SetTitleOffset(1);
+  stack->GetYaxis()->SetTitle(plot.ytitle.c_str());
+
+  // X axis
+  stack->GetXaxis()->SetLabelSize(0.04);
+  stack->GetXaxis()->SetLabelOffset(0.005);
+  stack->GetXaxis()->SetTitleSize(0.06);
+  stack->GetXaxis()->SetTitleFont(22);
+  stack->GetXaxis()->SetTitleOffset(1);
+  stack->GetXaxis()->SetTitle(plot.xtitle.c_str());
+  for (unsigned int i=0;i<plot.binlabels.size();i++)
+    stack->GetXaxis()->SetBinLabel(plot.binindices[i],plot.binlabels[i].c_str());
+
+  // Finalizing the TCanvas
+  canvas->SetLogx(plot.logx);
+  canvas->SetLogy(plot.logy);
+
+  // Creating a TLegend
+  TLegend* legend = 0;
+  for (unsigned int i=0;i<plot.histos.size();i++)
+  {
+    if (!plot.histos[i].haslegend) continue;
+    if (legend==0) legend = new TLegend(.73,.5,.97,.95);
+    legend->AddEntry(histos[i],plot.histos[i].legend.c_str());
+  }
+  if (legend!=0)
+  {
+    legend->SetFillColor(0);
+    legend->SetTextSize(0.05);
+    legend->SetTextFont(22);
+    legend->SetY1(TMath::Max(0.15,0.97-0.10*legend->GetListOfPrimitives()->GetSize()));
+    legend->Draw();
+  }
+
+  // Saving the image
+  for (unsigned int i=0;i<plot.outputs.size();i++)
+    canvas->SaveAs(plot.outputs[i].c_str());
+
+  // Cleaning
+  delete canvas;
+  delete legend;
+  delete stack;
+  for (unsigned int i=0;i<histos.size();i++) delete histos[i];
+  return true;
+}
+
+
+// -----------------------------------------------------------------------
+// main program
+// -----------------------------------------------------------------------
+int main(int argc, char *argv[])
+{
+  // Without any plot description: checking that the program can be run
+  if (argc<2)
+  {
+    std::cout << "BEGIN-SAMPLEANALYZER-TEST" << std::endl;
+    std::cout << "Usage: ROOTPlotter selection_0.dat [selection_1.dat ...]" << std::endl;
+    std::cout << "END-SAMPLEANALYZER-TEST" << std::endl;
+    return 0;
+  }
+
+  // The histograms are owned by the program, not by the current directory
+  gROOT->SetBatch(kTRUE);
+  TH1::AddDirectory(kFALSE);
+
+  // Producing the plots one by one
+  std::cout << "BEGIN-STAMP" << std::endl;
+  unsigned int nfailed=0;
+  for (int i=1;i<argc;i++)
+  {
+    PlotDescription plot;
+    std::string filename = argv[i];
+    std::string name = filename.substr(filename.find_last_of('/')+1);
+    name = name.substr(0,name.find_last_of('.'));
+    if (ReadPlot(filename,plot) && DrawPlot(plot))
+      std::cout << "PLOT-OK " << name << std::endl;
+    else
+    {
+      std::cout << "PLOT-FAILED " << name << std::endl;
+      nfailed++;
+    }
+  }
+  std::cout << "END-STAMP" << std::endl;
+
+  return (nfailed==0)?0:1;
+}
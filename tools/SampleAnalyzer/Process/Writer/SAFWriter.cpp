@@ -22,11 +22,49 @@
 ////////////////////////////////////////////////////////////////////////////////
 
 
+// STL headers
+#include <cctype>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+
 // SampleHeader headers
 #include "SampleAnalyzer/Process/Writer/SAFWriter.h"
+#include "SampleAnalyzer/Commons/Service/LogService.h"
+#include "SampleAnalyzer/Commons/Base/ReaderBase.h"
 
 using namespace MA5;
 
+
+// -----------------------------------------------------------------------------
+// Initialize
+// -----------------------------------------------------------------------------
+bool SAFWriter::Initialize(const Configuration* cfg,
+                           const std::string& rawfilename)
+{
+  filename_ = rawfilename;
+  ReaderBase::CleanFilename(filename_);
+  return WriterTextBase::Initialize(cfg,rawfilename);
+}
+
+
+// -----------------------------------------------------------------------------
+// Finalize
+// -----------------------------------------------------------------------------
+bool SAFWriter::Finalize()
+{
+  if (!WriterTextBase::Finalize()) return false;
+
+  // Binary copy of the text file
+  if (cfg_!=0 && cfg_->IsSafBinary() && !rfio_ && !compress_)
+  {
+    if (!WriteBinary(filename_))
+      WARNING << "the binary copy of the file " << filename_
+              << " cannot be written" << endmsg;
+  }
+  return true;
+}
+
 // -----------------------------------------------------------------------------
 // WriteHeader
 // -----------------------------------------------------------------------------
@@ -221,3 +259,280 @@ bool SAFWriter::WriteFoot()
   *output_ << "</SAFfooter>" << std::endl;
   return true;
 }
+
+
+// -----------------------------------------------------------------------------
+// Binary copy
+// -----------------------------------------------------------------------------
+namespace
+{
+  // whitespace characters of the python reader
+  bool IsBlankChar(char c)
+  {
+    return c==' ' || c=='\t' || c=='\n' || c=='\r' || c=='\f' || c=='\v';
+  }
+
+  bool IsBlank(const std::string& text)
+  {
+    for (unsigned int i=0;i<text.size();i++)
+      if (!IsBlankChar(text[i])) return false;
+    return true;
+  }
+
+  // Line made of a single tag, possibly followed by a comment
+  bool IsTagLine(const std::string& line, bool& close, std::string& tag)
+  {
+    std::size_t pos=0;
+    while (pos<line.size() && (line[pos]==' ' || line[pos]=='\t' || line[pos]=='\r')) pos++;
+    if (pos>=line.size() || line[pos]!='<') return false;
+    pos++;
+    close = (pos<line.size() && line[pos]=='/');
+    if (close) pos++;
+    std::size_t begin=pos;
+    while (pos<line.size() && line[pos]!='<' && line[pos]!='>' && 
+           line[pos]!='#' && !IsBlankChar(line[pos])) pos++;
+    if (pos==begin)
+    {
+      if (!close) return false;
+      close=false;
+      begin--;
+    }
+    if (pos>=line.size() || line[pos]!='>') return false;
+    tag = line.substr(begin,pos-begin);
+    pos++;
+    while (pos<line.size() && (line[pos]==' ' || line[pos]=='\t' || line[pos]=='\r')) pos++;
+    return (pos==line.size() || line[pos]=='#');
+  }
+
+  // Line without its comment, split into words
+  void SplitWords(const std::string& text, std::vector<std::string>& words)
+  {
+    std::size_t pos=0;
+    while (pos<text.size())
+    {
+      while (pos<text.size() && IsBlankChar(text[pos])) pos++;
+      std::size_t begin=pos;
+      while (pos<text.size() && !IsBlankChar(text[pos])) pos++;
+      if (pos>begin) words.push_back(text.substr(begin,pos-begin));
+    }
+  }
+
+  std::string RemoveComments(const std::string& text)
+  {
+    std::string result;
+    std::size_t pos=0;
+    while (pos<text.size())
+    {
+      std::size_t comment = text.find('#',pos);
+      if (comment==std::string::npos) { result+=text.substr(pos); break; }
+      result += text.substr(pos,comment-pos);
+      pos = text.find('\n',comment);
+    }
+    return result;
+  }
+
+  // number conversion accepted by the python reader
+  bool ToDouble(const std::string& word, MAdouble64& value)
+  {
+    if (word.find_first_of("xX(")!=std::string::npos) return false;
+    char* end=0;
+    value = std::strtod(word.c_str(),&end);
+    return (end==word.c_str()+word.size());
+  }
+
+  // little-endian packing
+  void PackUInt(std::string& output, MAuint64 value, unsigned int nbytes)
+  {
+    for (unsigned int i=0;i<nbytes;i++)
+      output += static_cast<char>((value>>(8*i))&0xFF);
+  }
+
+  void PackDouble(std::string& output, MAdouble64 value)
+  {
+    MAuint64 bits=0;
+    std::memcpy(&bits,&value,sizeof(value));
+    PackUInt(output,bits,8);
+  }
+}
+
+
+MAuint32 SAFWriter::CRC32(const std::string& text)
+{
+  static MAuint32 table[256];
+  static bool initialized=false;
+  if (!initialized)
+  {
+    for (MAuint32 i=0;i<256;i++)
+    {
+      MAuint32 c=i;
+      for (unsigned int k=0;k<8;k++) c = (c&1) ? (0xEDB88320UL^(c>>1)) : (c>>1);
+      table[i]=c;
+    }
+    initialized=true;
+  }
+  MAuint32 crc=0xFFFFFFFFUL;
+  for (unsigned int i=0;i<text.size();i++)
+    crc = table[(crc^static_cast<unsigned char>(text[i]))&0xFF]^(crc>>8);
+  return (crc^0xFFFFFFFFUL)&0xFFFFFFFFUL;
+}
+
+
+// Same splitting as the python reader: the text between two tag lines is
+// attached as it is to the innermost opened block (each chunk starts at the
+// end of the line preceding it)
+bool SAFWriter::Parse(const std::string& rawtext, SafBlock& root)
+{
+  std::string text = "\n"+rawtext;
+  std::vector<SafBlock*> stack(1,&root);
+  MAuint32 numline=0;
+  std::size_t position=0;
+  std::size_t pos=0;
+  while (pos<text.size())
+  {
+    std::size_t end = text.find('\n',pos+1);
+    if (end==std::string::npos) end=text.size();
+    bool close=false;
+    std::string tag;
+    if (IsTagLine(text.substr(pos+1,end-pos-1),close,tag))
+    {
+      std::string chunk = text.substr(position,pos-position);
+      if (!chunk.empty() && !IsBlank(chunk))
+        stack.back()->chunks.push_back(std::make_pair(numline,chunk));
+      for (unsigned int i=0;i<chunk.size();i++) if (chunk[i]=='\n') numline++;
+      numline++;
+      position=end;
+      for (unsigned int i=0;i<tag.size();i++) 
+        if (tag[i]>='A' && tag[i]<='Z') tag[i]=tag[i]-'A'+'a';
+      if (!close)
+      {
+        SafBlock block;
+        block.tag=tag;
+        block.numline=numline;
+        stack.back()->children.push_back(block);
+        stack.push_back(&(stack.back()->children.back()));
+      }
+      // unexpected tag: the text file is left to the python reader
+      else if (stack.size()>1 && stack.back()->tag==tag) stack.pop_back();
+      else return false;
+    }
+    pos=end;
+  }
+  std::string chunk = text.substr(position);
+  if (!chunk.empty() && !IsBlank(chunk))
+    stack.back()->chunks.push_back(std::make_pair(numline,chunk));
+  return (stack.size()==1);
+}
+
+
+// Numerical content of a block made of lines of ncolumns numbers
+bool SAFWriter::Table(const SafBlock& block, MAuint32& ncolumns,
+                      std::vector<MAdouble64>& values)
+{
+  // number of words of the first content line
+  ncolumns=0;
+  std::string text;
+  for (unsigned int i=0;i<block.chunks.size();i++) text+=block.chunks[i].second;
+  text = RemoveComments(text);
+  std::size_t pos=0;
+  while (pos<text.size() && ncolumns==0)
+  {
+    std::size_t end = text.find('\n',pos);
+    if (end==std::string::npos) end=text.size();
+    std::vector<std::string> words;
+    SplitWords(text.substr(pos,end-pos),words);
+    ncolumns=words.size();
+    pos=end+1;
+  }
+  if (ncolumns==0) return false;
+
+  // number of lines (blank lines included)
+  std::size_t begin = 0;
+  while (begin<text.size() && IsBlankChar(text[begin])) begin++;
+  std::size_t last = text.size();
+  while (last>begin && IsBlankChar(text[last-1])) last--;
+  MAuint32 nlines=1;
+  for (std::size_t i=begin;i<last;i++) if (text[i]=='\n') nlines++;
+
+  // values
+  std::vector<std::string> words;
+  SplitWords(text,words);
+  if (words.size()!=nlines*ncolumns) return false;
+  values.resize(words.size());
+  for (unsigned int i=0;i<words.size();i++)
+    if (!ToDouble(words[i],values[i])) return false;
+  return true;
+}
+
+
+void SAFWriter::PackBlock(const SafBlock& block, std::string& output)
+{
+  PackUInt(output,block.tag.size(),2);
+  PackUInt(output,block.numline,4);
+  output += block.tag;
+
+  // numerical blocks: packed values instead of the text
+  MAuint32 ncolumns=0;
+  std::vector<MAdouble64> values;
+  if ((block.tag=="data" || block.tag=="statistics") && block.children.empty() &&
+      Table(block,ncolumns,values))
+  {
+    PackUInt(output,0,4);
+    PackUInt(output,1,4);
+    PackUInt(output,ncolumns,4);
+    PackUInt(output,values.size()/ncolumns,4);
+    for (unsigned int i=0;i<values.size();i++) PackDouble(output,values[i]);
+  }
+  else
+  {
+    PackUInt(output,block.chunks.size(),4);
+    for (unsigned int i=0;i<block.chunks.size();i++)
+    {
+      PackUInt(output,block.chunks[i].first,4);
+      PackUInt(output,block.chunks[i].second.size(),4);
+      output += block.chunks[i].second;
+    }
+    PackUInt(output,0,4);
+  }
+
+  // sub-blocks
+  PackUInt(output,block.children.size(),4);
+  for (unsigned int i=0;i<block.children.size();i++)
+    PackBlock(block.children[i],output);
+}
+
+
+bool SAFWriter::WriteBinary(const std::string& filename)
+{
+  // Reading the text file
+  std::ifstream input(filename.c_str(),std::ios::in|std::ios::binary);
+  if (!input.good()) return false;
+  std::stringstream buffer;
+  buffer << input.rdbuf();
+  input.close();
+  std::string text = buffer.str();
+
+  // Blocks
+  SafBlock root;
+  root.numline=0;
+  if (!Parse(text,root)) return false;
+
+  // Header: magic number, size and CRC32 of the text file
+  std::string output = "MA5SAFB2";
+  PackUInt(output,text.size(),8);
+  PackUInt(output,CRC32(text),4);
+  PackBlock(root,output);
+
+  // Writing (a partial file is never left under the final name)
+  std::string binaryname = filename+"b";
+  std::string tmpname    = binaryname+".tmp";
+  std::ofstream binary(tmpname.c_str(),std::ios::out|std::ios::binary);
+  if (!binary.good()) return false;
+  binary.write(output.data(),output.size());
+  binary.close();
+  if (binary.fail() || std::rename(tmpname.c_str(),binaryname.c_str())!=0)
+  {
+    std::remove(tmpname.c_str());
+    return false;
+  }
+  return true;
+}
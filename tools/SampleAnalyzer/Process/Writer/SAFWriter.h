@@ -29,6 +29,8 @@
 #include <fstream>
 #include <iostream>
 #include <sstream>
+#include <string>
+#include <vector>
 
 // SampleAnalyzer headers
 #include "SampleAnalyzer/Process/Writer/WriterTextBase.h"
@@ -44,6 +46,9 @@ class SAFWriter : public WriterTextBase
   // -------------------------------------------------------------
  protected:
 
+  /// Name of the text file (binary copy written next to it)
+  std::string filename_;
+
 
   // -------------------------------------------------------------
   //                       method members
@@ -58,6 +63,13 @@ class SAFWriter : public WriterTextBase
   virtual ~SAFWriter()
   { }
 
+  /// Initialize
+  virtual bool Initialize(const Configuration* cfg,
+                          const std::string& filename);
+
+  /// Finalize (closing the text file and writing its binary copy)
+  virtual bool Finalize();
+
   /// Read the sample (virtual pure)
   virtual bool WriteHeader(const SampleFormat& mySample);
   virtual bool WriteHeader();
@@ -76,7 +88,31 @@ class SAFWriter : public WriterTextBase
   /// Getting stream
   std::ostream* GetStream()
   { return output_; }
- 
+
+  /// Binary copy of a SAF file: the same blocks, with the content of the
+  /// <Data> and <Statistics> blocks stored as packed float64 arrays. The
+  /// header holds the size and the CRC32 of the text file, checked by the
+  /// python reader before using the copy.
+  static bool WriteBinary(const std::string& filename);
+
+  /// CRC32 (same polynomial as zlib)
+  static MAuint32 CRC32(const std::string& text);
+
+ private:
+
+  /// Packing a block (content between two tag lines) and its sub-blocks
+  struct SafBlock
+  {
+    std::string tag;
+    MAuint32 numline;
+    std::vector< std::pair<MAuint32,std::string> > chunks;
+    std::vector<SafBlock> children;
+  };
+  static bool Parse(const std::string& text, SafBlock& root);
+  static void PackBlock(const SafBlock& block, std::string& output);
+  static bool Table(const SafBlock& block, MAuint32& ncolumns,
+                    std::vector<MAdouble64>& values);
+
 };
 
 }